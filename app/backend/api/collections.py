@@ -5,16 +5,14 @@ from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, status,
 from fastapi.responses import JSONResponse
 from typing import List, Dict, Any
 from datetime import datetime
-import json
-from datasets import load_dataset
 from chromadb.utils import embedding_functions
-import requests
-import re
-import hashlib
-import tiktoken
 
-from scripts.index_miriad import index_miriad_dataset
-from scripts.nice_index import index_nice_knowledge
+from app.core import http_client
+from app.core.bulkhead import wait_for_capacity
+from app.retrieval.catalog import invalidate_collection_catalog
+from app.retrieval.lexical import index_chunks_lexically, save_lexical_index
+from app.retrieval.retrieve import retrieval_cache
+from app.retrieval.snapshot import SNAPSHOT_COLLECTIONS, export_collection_snapshot, get_vector_snapshot
 
 
 CHROMA_HOST = os.getenv("CHROMA_HOST", "chromadb_service")
@@ -31,16 +29,39 @@ router = APIRouter(
     tags=["Collections"],
 )
 
-# Initialize Chroma client
-chroma_client = chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
+# Chroma client, created on first use so the API starts (and serves other routes) while Chroma is down
+chroma_client = None
+
+
+def get_chroma_client():
+    global chroma_client
+    if chroma_client is None:
+        chroma_client = chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
+    return chroma_client
+
+
+# The dataset library and the NICE indexer are heavy to import and only needed by the update
+# endpoints, so they are imported on first call.
+def load_dataset(*args, **kwargs):
+    from datasets import load_dataset as _load_dataset
+    return _load_dataset(*args, **kwargs)
+
+
+def index_nice_knowledge():
+    from scripts.nice_index import index_nice_knowledge as _index_nice_knowledge
+    return _index_nice_knowledge()
+
 
 def tei_embedding_function(texts):
     tei_url = f"http://{TEI_HOST}:{TEI_PORT}/embed"
-    response = requests.post(tei_url, json={"inputs": texts})
+    # Bulk indexing queues for TEI capacity instead of failing part-way
+    with wait_for_capacity():
+        response = http_client.post("tei", tei_url, json={"inputs": texts})
     response.raise_for_status()
     return response.json()
 
 def tokenize_and_chunk(text: str, max_tokens: int, overlap: int):
+    import tiktoken
     encoder = tiktoken.get_encoding("cl100k_base")
     tokens = encoder.encode(text)
     chunks = []
@@ -61,13 +82,13 @@ def get_collections_metadata() -> Dict[str, Any]:
     Get metadata for all collections including last_updated timestamps.
     """
     try:
-        collections = chroma_client.list_collections()
+        collections = get_chroma_client().list_collections()
         metadata = {}
         
         for collection in collections:
             try:
                 # Get collection metadata
-                collection_obj = chroma_client.get_collection(name=collection.name)
+                collection_obj = get_chroma_client().get_collection(name=collection.name)
                 # Try to get last_updated from metadata
                 last_updated = None
                 if hasattr(collection_obj, 'metadata') and collection_obj.metadata:
@@ -85,17 +106,58 @@ def get_collections_metadata() -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/retrieval_cache")
+def get_retrieval_cache_stats() -> Dict[str, Any]:
+    """
+    Hit/miss counters and size of the in-process retrieval result cache.
+    """
+    return retrieval_cache.stats()
+
+
+def refresh_vector_snapshot(collection, collection_name: str):
+    """Re-exports the memory-mapped snapshot of a rebuilt collection, if one is in use."""
+    if get_vector_snapshot(collection_name) is None:
+        return
+    try:
+        export_collection_snapshot(collection, collection_name)
+    except Exception as e:
+        print(f"Warning: Could not refresh vector snapshot for '{collection_name}': {e}")
+
+
+@router.post("/export_snapshots")
+def export_snapshots() -> Dict[str, Any]:
+    """
+    Exports the read-only knowledge collections (SNAPSHOT_COLLECTIONS) to memory-mapped
+    snapshots that retrieval searches in-process instead of querying ChromaDB.
+    """
+    exported = {}
+    for collection_name in SNAPSHOT_COLLECTIONS:
+        try:
+            collection = get_chroma_client().get_collection(name=collection_name)
+        except chromadb.errors.NotFoundError:
+            print(f"Collection '{collection_name}' not found. Skipping snapshot export.")
+            continue
+        try:
+            exported[collection_name] = export_collection_snapshot(collection, collection_name)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to export '{collection_name}': {e}")
+
+    invalidate_collection_catalog()
+    return {"exported": exported}
+
+
 @router.post("/update_miriad")
 def update_miriad() -> Dict[str, str]:
     collection_name = "miriad_knowledge"
     try:
-        chroma_client.get_collection(name=collection_name)
+        get_chroma_client().get_collection(name=collection_name)
         return {"message": f"Collection '{collection_name}' already exists. Skipping indexing."}
     except chromadb.errors.NotFoundError:
-        collection = chroma_client.create_collection(
+        collection = get_chroma_client().create_collection(
             name=collection_name,
             embedding_function=embedding_functions.SentenceTransformerEmbeddingFunction(model_name=EMBEDDING_MODEL)
         )
+        invalidate_collection_catalog()
 
     try:
         dataset = load_dataset("miriad/miriad-5.8M", split="train[:20000]")
@@ -117,11 +179,14 @@ def update_miriad() -> Dict[str, str]:
             if len(current_batch_docs) >= MAX_DOCS_PER_BATCH:
                 embeddings = tei_embedding_function(current_batch_docs)
                 collection.add(documents=current_batch_docs, embeddings=embeddings, ids=current_batch_ids)
+                index_chunks_lexically(collection_name, current_batch_ids, current_batch_docs, persist=False)
                 current_batch_docs, current_batch_ids = [], []
 
     if current_batch_docs:
         embeddings = tei_embedding_function(current_batch_docs)
         collection.add(documents=current_batch_docs, embeddings=embeddings, ids=current_batch_ids)
+        index_chunks_lexically(collection_name, current_batch_ids, current_batch_docs, persist=False)
+    save_lexical_index(collection_name)
     
     # Update collection metadata with last_updated timestamp
     try:
@@ -134,7 +199,11 @@ def update_miriad() -> Dict[str, str]:
     except Exception as e:
         print(f"Warning: Could not update collection metadata: {e}")
         # Continue without failing the entire operation
-    
+
+    refresh_vector_snapshot(collection, collection_name)
+
+    # Pick up the finished collection and its new metadata on the next retrieval
+    invalidate_collection_catalog()
     return {"message": f"Indexing complete! Total chunks added: {document_counter}"}
 
 
@@ -143,9 +212,10 @@ def refresh_nice_index():
     """Fetch all NICE guidance and store it in ChromaDB."""
     try:
         indexed_docs = index_nice_knowledge()
+        invalidate_collection_catalog()
         try:
             # Get the collection and update its last_updated metadata
-            collection = chroma_client.get_collection(name="nice_knowledge")
+            collection = get_chroma_client().get_collection(name="nice_knowledge")
             
             # Update collection metadata with last_updated timestamp
             try:
@@ -157,7 +227,9 @@ def refresh_nice_index():
             except Exception as e:
                 print(f"Warning: Could not update collection metadata: {e}")
                 # Continue without failing the entire operation
-                
+
+            refresh_vector_snapshot(collection, "nice_knowledge")
+            invalidate_collection_catalog()
             return {"message": f"Indexing complete! Total chunks added: {len(indexed_docs)}"}
         except Exception as e:
             return {"message": f"Indexing complete but failed to update metadata: {str(e)}"}
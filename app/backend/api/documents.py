@@ -1,13 +1,21 @@
 #app/backend/api/documents.py
 import os
+import shutil
+import tempfile
 import chromadb
-from fastapi import APIRouter, UploadFile, File, HTTPException, status, Query
-from typing import List, Dict, Any
-from datetime import datetime
+from fastapi import APIRouter, UploadFile, File, HTTPException, status, Query, Response
+from fastapi.responses import JSONResponse
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.bulkhead import wait_for_capacity
+from app.core.jobs import JobManager, InMemoryJobStore, JobQueueFull
+from app.core.pipeline import run_incremental_ingestion_pipeline, run_in_pipeline_executor
+from app.data_ingestion.manifest import drop_ingestion_manifest
+from app.embed_and_store.store import USER_UPLOAD_COLLECTION
+from app.retrieval.catalog import invalidate_collection_catalog
+from app.retrieval.lexical import drop_lexical_index
+from app.retrieval.snapshot import drop_vector_snapshot
 
-from app.core.pipeline import run_ingestion_pipeline, run_embedding_and_storage_pipeline
-
-USER_UPLOAD_COLLECTION = "documents"
 MIRIAD_COLLECTION = "miriad_knowledge"
 NICE_COLLECTION = "nice_knowledge"
 
@@ -19,6 +27,25 @@ router = APIRouter(
 CHROMA_HOST = os.getenv("CHROMA_HOST", "chromadb_service")
 CHROMA_PORT = os.getenv("CHROMA_PORT", "8000")
 
+# Each upload request gets its own scratch directory under UPLOAD_TEMP_DIR (the system temp
+# dir by default). Files are copied there in UPLOAD_CHUNK_SIZE pieces, never read whole.
+UPLOAD_TEMP_DIR = os.getenv("UPLOAD_TEMP_DIR") or None
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# Uploads are ingested as background jobs on a small pool of their own; at most
+# INGESTION_JOB_QUEUE_SIZE uploads wait or run at once.
+INGESTION_JOB_WORKERS = int(os.getenv("INGESTION_JOB_WORKERS", "2"))
+INGESTION_JOB_QUEUE_SIZE = int(os.getenv("INGESTION_JOB_QUEUE_SIZE", "100"))
+INGESTION_JOB_TTL = float(os.getenv("INGESTION_JOB_TTL", "3600"))
+INGESTION_JOB_RETRY_AFTER_SECONDS = 30
+
+ingestion_jobs = JobManager(
+    InMemoryJobStore(max_jobs=INGESTION_JOB_QUEUE_SIZE * 2, ttl=INGESTION_JOB_TTL),
+    max_workers=INGESTION_JOB_WORKERS,
+    max_pending=INGESTION_JOB_QUEUE_SIZE,
+    name="ingestion-job",
+)
+
 def get_client() -> chromadb.HttpClient:
     return chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
 
@@ -58,53 +85,109 @@ def list_user_documents() -> List[Dict[str, Any]]:
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _spool_upload(file: UploadFile, directory: str) -> str:
+    """Copies an uploaded file into `directory` in chunks and returns its path."""
+    # Only the base name is used, so a client-supplied path cannot escape the scratch dir
+    file_name = os.path.basename((file.filename or "").replace("\\", "/")) or "upload"
+    file_path = os.path.join(directory, file_name)
+    file.file.seek(0)
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer, UPLOAD_CHUNK_SIZE)
+    print(f"File '{file.filename}' saved to '{file_path}'")
+    return file_path
+
+
+def _spool_uploads(files: List[UploadFile]) -> str:
+    """Copies one request's files into a new private scratch directory and returns it."""
+    temp_dir = tempfile.mkdtemp(prefix="rag-upload-", dir=UPLOAD_TEMP_DIR)
+    try:
+        for file in files:
+            _spool_upload(file, temp_dir)
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    return temp_dir
+
+
+def _ingest_directory(temp_dir: str, progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+    """
+    Chunks, embeds and stores the files spooled into `temp_dir`, then removes it. Files
+    that were ingested before are skipped, and only new chunks of changed files are embedded.
+    Blocking; runs on an ingestion job worker or the pipeline pool.
+    """
+    try:
+        result = run_incremental_ingestion_pipeline(temp_dir, progress=progress)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    # Changed files that produced no chunks failed to load; no supported files at all is an error too
+    changed_files_unchunked = result["files"] > 0 and result["chunks"] == 0
+    no_supported_files = result["files"] == 0 and result["skipped_files"] == 0
+    if changed_files_unchunked or no_supported_files:
+        raise ValueError("Failed to process documents into chunks.")
+    return result
+
+
+def _run_ingestion_job(temp_dir: str, progress: Callable[..., None]) -> Dict[str, Any]:
+    # No client is waiting on the job, so it queues for TEI/Chroma capacity
+    with wait_for_capacity():
+        return _ingest_directory(temp_dir, progress=progress)
+
+
 @router.post("/upload/")
-async def upload_documents(files: List[UploadFile] = File(...)):
+async def upload_documents(
+    response: Response,
+    files: List[UploadFile] = File(...),
+    wait: bool = Query(False, description="Ingest before responding instead of queueing a job")
+):
     """
     Uploads new documents for ingestion into the RAG system.
     These documents will be chunked, embedded, and stored in ChromaDB.
+
+    By default the files are queued as an ingestion job and the response (202) carries its
+    job_id; poll GET /documents/jobs/{job_id} for progress. With ?wait=true the request
+    returns only once the documents are stored.
     """
     if not files:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No files uploaded.")
 
-    temp_dir = "./temp_uploaded_docs"
-    os.makedirs(temp_dir, exist_ok=True)
-    uploaded_file_paths = []
-
     try:
-        for file in files:
-            file_path = os.path.join(temp_dir, file.filename)
-            with open(file_path, "wb") as buffer:
-                buffer.write(await file.read())
-            uploaded_file_paths.append(file_path)
-            print(f"File '{file.filename}' saved to '{file_path}'")
-
-        # Store upload timestamp to add to metadata later
-        upload_timestamp = datetime.utcnow().isoformat()
-        
-        chunks = run_ingestion_pipeline(temp_dir)
-        if not chunks:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to process documents into chunks.")
-
-        # Add upload_date to all chunks before storing
-        for chunk in chunks:
-            if hasattr(chunk, 'metadata') and chunk.metadata:
-                chunk.metadata['upload_date'] = upload_timestamp
-            else:
-                chunk.metadata = {'upload_date': upload_timestamp}
-
-        run_embedding_and_storage_pipeline(chunks)
-
-        return {"message": f"Successfully processed {len(files)} files and added them to ChromaDB."}
+        # The upload objects are closed with the request, so copy them out before queueing
+        temp_dir = await run_in_pipeline_executor(_spool_uploads, files)
+        if wait:
+            await run_in_pipeline_executor(_ingest_directory, temp_dir)
+            return {"message": f"Successfully processed {len(files)} files and added them to ChromaDB."}
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error processing files: {str(e)}")
-    finally:
-        for file_path in uploaded_file_paths:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        if os.path.exists(temp_dir) and not os.listdir(temp_dir):
-            os.rmdir(temp_dir)
-            print(f"Cleaned up temporary directory: {temp_dir}")
+
+    try:
+        job_id = ingestion_jobs.submit(_run_ingestion_job, temp_dir)
+    except JobQueueFull as e:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": f"Too many uploads pending: {e}"},
+            headers={"Retry-After": str(INGESTION_JOB_RETRY_AFTER_SECONDS)},
+        )
+    response.status_code = status.HTTP_202_ACCEPTED
+    return {
+        "message": f"Queued {len(files)} files for ingestion.",
+        "job_id": job_id,
+        "status": ingestion_jobs.get(job_id)["status"],
+    }
+
+
+@router.get("/jobs/{job_id}")
+def get_ingestion_job(job_id: str):
+    """
+    Returns an upload's ingestion status and its stages ("load", "split", "embed", "store")
+    with their durations, counts (files and pages loaded, chunks produced, batches
+    embedded, chunks stored) and per-second throughput.
+    """
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
 
 @router.get("/collections")
 def list_collections():
@@ -158,6 +241,9 @@ def delete_user_upload_collection():
     try:
         client = get_client()
         client.delete_collection(name=USER_UPLOAD_COLLECTION)
+        invalidate_collection_catalog()
+        drop_lexical_index(USER_UPLOAD_COLLECTION)
+        drop_ingestion_manifest(USER_UPLOAD_COLLECTION)
         return {"message": f"Collection '{USER_UPLOAD_COLLECTION} deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -171,6 +257,10 @@ def delete_miriad_collection():
     try:
         client = get_client()
         client.delete_collection(name=MIRIAD_COLLECTION)
+        invalidate_collection_catalog()
+        drop_lexical_index(MIRIAD_COLLECTION)
+        drop_ingestion_manifest(MIRIAD_COLLECTION)
+        drop_vector_snapshot(MIRIAD_COLLECTION)
         return {"message": f"Collection '{MIRIAD_COLLECTION}' deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -184,6 +274,10 @@ def delete_nice_collection():
     try:
         client = get_client()
         client.delete_collection(name=NICE_COLLECTION)
+        invalidate_collection_catalog()
+        drop_lexical_index(NICE_COLLECTION)
+        drop_ingestion_manifest(NICE_COLLECTION)
+        drop_vector_snapshot(NICE_COLLECTION)
         return {"message": f"Collection '{NICE_COLLECTION}' deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
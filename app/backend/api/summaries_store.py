@@ -3,6 +3,9 @@ from pydantic import BaseModel
 from typing import Optional
 import uuid
 
+from app.core.bulkhead import get_bulkhead
+from app.generation.generate_summary import summary_writer
+
 # Reuse the SQLAlchemy setup and model from scripts.save_summary
 try:
     from scripts.save_summary import SessionLocal, Summary
@@ -31,37 +34,42 @@ def save_or_update_summary(payload: SaveSummaryRequest):
             detail="Database is not configured correctly."
         )
 
-    db = SessionLocal()
-    try:
-        if payload.id:
-            existing = db.query(Summary).filter(Summary.id == payload.id).first()
-            if existing:
-                if payload.title:
-                    existing.title = payload.title
-                existing.content = payload.content
-                db.commit()
-                return {"id": existing.id, "status": "updated"}
-            # If ID provided but not found, create new with provided ID
-            new_id = payload.id
-        else:
-            new_id = str(uuid.uuid4())
+    if payload.id and summary_writer.get_pending(payload.id):
+        # Let the queued insert land first so this becomes an update, not a duplicate key
+        summary_writer.flush(timeout=5.0)
 
-        new_summary = Summary(
-            id=new_id,
-            title=payload.title or "Clinical Summary",
-            content=payload.content,
-        )
-        db.add(new_summary)
-        db.commit()
-        return {"id": new_id, "status": "created"}
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to save summary: {e}"
-        )
-    finally:
-        db.close()
+    with get_bulkhead("postgres").limit():
+        db = SessionLocal()
+        try:
+            if payload.id:
+                existing = db.query(Summary).filter(Summary.id == payload.id).first()
+                if existing:
+                    if payload.title:
+                        existing.title = payload.title
+                    existing.content = payload.content
+                    db.commit()
+                    return {"id": existing.id, "status": "updated"}
+                # If ID provided but not found, create new with provided ID
+                new_id = payload.id
+            else:
+                new_id = str(uuid.uuid4())
+
+            new_summary = Summary(
+                id=new_id,
+                title=payload.title or "Clinical Summary",
+                content=payload.content,
+            )
+            db.add(new_summary)
+            db.commit()
+            return {"id": new_id, "status": "created"}
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to save summary: {e}"
+            )
+        finally:
+            db.close()
 
 @router.get("/get/{summary_id}")
 def get_summary(summary_id: str):
@@ -70,14 +78,19 @@ def get_summary(summary_id: str):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Database is not configured correctly."
         )
-    db = SessionLocal()
-    try:
-        found = db.query(Summary).filter(Summary.id == summary_id).first()
-        if not found:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Summary not found")
-        return {"id": found.id, "title": found.title, "content": found.content}
-    finally:
-        db.close()
+    with get_bulkhead("postgres").limit():
+        db = SessionLocal()
+        try:
+            found = db.query(Summary).filter(Summary.id == summary_id).first()
+            if not found:
+                # Generated moments ago and still in the write-behind queue
+                pending = summary_writer.get_pending(summary_id)
+                if pending:
+                    return {"id": pending["id"], "title": pending["title"], "content": pending["content"]}
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Summary not found")
+            return {"id": found.id, "title": found.title, "content": found.content}
+        finally:
+            db.close()
 
 @router.get("/list/")
 def list_summaries(limit: int = 10):
@@ -86,12 +99,13 @@ def list_summaries(limit: int = 10):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Database is not configured correctly."
         )
-    db = SessionLocal()
-    try:
-        # Simple listing in insertion order if DB preserves it; for production add created_at and order by desc
-        items = db.query(Summary).limit(limit).all()
-        return [{"id": s.id, "title": s.title, "content": s.content} for s in items]
-    finally:
-        db.close()
+    with get_bulkhead("postgres").limit():
+        db = SessionLocal()
+        try:
+            # Simple listing in insertion order if DB preserves it; for production add created_at and order by desc
+            items = db.query(Summary).limit(limit).all()
+            return [{"id": s.id, "title": s.title, "content": s.content} for s in items]
+        finally:
+            db.close()
 
 
@@ -0,0 +1,96 @@
+import os
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.core.bulkhead import wait_for_capacity
+from app.core.jobs import JobManager, InMemoryJobStore, JobQueueFull
+from app.core.pipeline import run_retrieval_and_generation_pipeline_with_id
+
+# Summary jobs run on their own pool, separate from the one serving /summaries/generate/.
+# At most SUMMARY_JOB_QUEUE_SIZE jobs wait or run at once; finished jobs are kept for polling
+# for SUMMARY_JOB_TTL seconds.
+SUMMARY_JOB_WORKERS = int(os.getenv("SUMMARY_JOB_WORKERS", "8"))
+SUMMARY_JOB_QUEUE_SIZE = int(os.getenv("SUMMARY_JOB_QUEUE_SIZE", "1000"))
+SUMMARY_JOB_TTL = float(os.getenv("SUMMARY_JOB_TTL", "3600"))
+SUMMARY_JOB_RETRY_AFTER_SECONDS = 30
+
+summary_jobs = JobManager(
+    InMemoryJobStore(max_jobs=SUMMARY_JOB_QUEUE_SIZE * 2, ttl=SUMMARY_JOB_TTL),
+    max_workers=SUMMARY_JOB_WORKERS,
+    max_pending=SUMMARY_JOB_QUEUE_SIZE,
+    name="summary-job",
+)
+
+router = APIRouter(
+    prefix="/summaries/jobs",
+    tags=["Summary Jobs"],
+)
+
+
+class SummaryJobRequest(BaseModel):
+    text: str
+    file_name: str | None = None
+    temperature: float | None = None
+    bypass_cache: bool = False
+
+
+def _run_summary_job(
+    transcribed_conversation: str,
+    summary_title: Optional[str],
+    temperature: Optional[float],
+    bypass_cache: bool,
+    progress: Callable[[str], None]
+) -> Dict[str, Any]:
+    # Jobs are the overflow path: they queue for TGI/TEI/Chroma capacity instead of failing
+    with wait_for_capacity():
+        summary, summary_id = run_retrieval_and_generation_pipeline_with_id(
+            transcribed_conversation,
+            summary_title=summary_title,
+            temperature=temperature,
+            bypass_cache=bypass_cache,
+            progress=progress,
+        )
+    if summary is None:
+        raise RuntimeError("Could not generate summary (e.g., no relevant context found or TGI issue).")
+    return {"summary": summary, "summary_id": summary_id}
+
+
+@router.post("/", status_code=status.HTTP_202_ACCEPTED)
+def create_summary_job(request: SummaryJobRequest):
+    """
+    Queues summary generation and returns a job id right away. Poll
+    GET /summaries/jobs/{job_id} for its status, current stage and result.
+    """
+    if not request.text.strip():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Transcribed conversation cannot be empty.")
+
+    try:
+        job_id = summary_jobs.submit(
+            _run_summary_job,
+            request.text,
+            request.file_name or None,
+            request.temperature,
+            request.bypass_cache,
+        )
+    except JobQueueFull as e:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": f"Too many summary jobs pending: {e}"},
+            headers={"Retry-After": str(SUMMARY_JOB_RETRY_AFTER_SECONDS)},
+        )
+    return {"job_id": job_id, "status": summary_jobs.get(job_id)["status"]}
+
+
+@router.get("/{job_id}")
+def get_summary_job(job_id: str):
+    """
+    Returns a job's status ("queued", "running", "succeeded" or "failed"), the stage it
+    is in, the duration of each stage so far, and once succeeded its summary and summary_id.
+    """
+    job = summary_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
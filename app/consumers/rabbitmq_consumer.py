@@ -14,11 +14,7 @@ import io
 
 load_dotenv()
 
-# Import libraries for document parsing
-import PyPDF2 
-
-# Import retrieval and generation function
-from app.core.pipeline import run_retrieval_and_generation_pipeline
+from app.core.bulkhead import wait_for_capacity
 
 # --- Configuration ---
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "rabbitmq_service")
@@ -28,12 +24,19 @@ RABBITMQ_PASS = os.getenv("RABBITMQ_PASS", "guest")
 RABBITMQ_INPUT_QUEUE = os.getenv("RABBITMQ_INPUT_QUEUE", "rag_prompt")
 RABBITMQ_OUTPUT_QUEUE = os.getenv("RABBITMQ_OUTPUT_QUEUE", "inference_results")
 
+# The RAG pipeline (Chroma, LangChain, SQLAlchemy) and PyPDF2 are imported on first use, so
+# the consumer connects to RabbitMQ quickly and without needing those services to be up.
+def run_retrieval_and_generation_pipeline(*args, **kwargs):
+    from app.core.pipeline import run_retrieval_and_generation_pipeline as _run_pipeline
+    return _run_pipeline(*args, **kwargs)
+
 # --- Helper functions for content extraction ---
 def extract_text_from_pdf(pdf_bytes: bytes) -> str:
     """Extracts text from PDF bytes."""
     text = ""
     try:
         pdf_file = io.BytesIO(pdf_bytes)
+        import PyPDF2
         reader = PyPDF2.PdfReader(pdf_file)
         for page in reader.pages:
             # PyPDF2's extract_text can return None for empty pages
@@ -134,11 +137,13 @@ def process_rag_request(msg: Dict[str, Any]) -> Dict[str, Any]:
         print(f"[{conversation_id}] Error: {rag_output_summary}")
     else:
         try:
-            # Call run_retrieval_and_generation_pipeline with both parameters
-            summary = run_retrieval_and_generation_pipeline(
-                transcribed_conversation=transcribed_content,
-                additional_content=additional_content # Pass the extracted additional content here
-            )
+            # Call run_retrieval_and_generation_pipeline with both parameters.
+            # Messages wait in the queue anyway, so wait for dependency capacity too
+            with wait_for_capacity():
+                summary = run_retrieval_and_generation_pipeline(
+                    transcribed_conversation=transcribed_content,
+                    additional_content=additional_content # Pass the extracted additional content here
+                )
 
             if summary:
                 rag_output_summary = summary
@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from app.core.metrics import stage_metrics
+
+# Per-dependency concurrency limits. Each dependency admits `max_concurrent` calls at once;
+# up to `max_queued` more may wait for a slot (at most `max_wait` seconds). Beyond that,
+# interactive requests are rejected at once and the API answers 429 with Retry-After.
+BULKHEAD_LIMITS: Dict[str, Dict[str, float]] = {
+    "tgi": {
+        "max_concurrent": int(os.getenv("TGI_MAX_CONCURRENCY", "8")),
+        "max_queued": int(os.getenv("TGI_MAX_QUEUED", "32")),
+        "max_wait": float(os.getenv("TGI_MAX_QUEUE_WAIT", "60")),
+        "retry_after": 10,
+    },
+    "tei": {
+        "max_concurrent": int(os.getenv("TEI_MAX_CONCURRENCY", "16")),
+        "max_queued": int(os.getenv("TEI_MAX_QUEUED", "64")),
+        "max_wait": float(os.getenv("TEI_MAX_QUEUE_WAIT", "5")),
+        "retry_after": 1,
+    },
+    "chroma": {
+        "max_concurrent": int(os.getenv("CHROMA_MAX_CONCURRENCY", "16")),
+        "max_queued": int(os.getenv("CHROMA_MAX_QUEUED", "64")),
+        "max_wait": float(os.getenv("CHROMA_MAX_QUEUE_WAIT", "5")),
+        "retry_after": 1,
+    },
+    "postgres": {
+        # Stays under SQLAlchemy's default pool (5 connections + 10 overflow)
+        "max_concurrent": int(os.getenv("POSTGRES_MAX_CONCURRENCY", "10")),
+        "max_queued": int(os.getenv("POSTGRES_MAX_QUEUED", "50")),
+        "max_wait": float(os.getenv("POSTGRES_MAX_QUEUE_WAIT", "5")),
+        "retry_after": 1,
+    },
+}
+
+# Background work (ingestion, jobs, queue consumers, the summary writer) waits for capacity
+# instead of being rejected; see `wait_for_capacity`.
+_fail_fast: contextvars.ContextVar[bool] = contextvars.ContextVar("bulkhead_fail_fast", default=True)
+
+
+class BulkheadFull(Exception):
+    """Raised when a dependency's bulkhead has no free slot and its wait queue is full (or the wait timed out)."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Too many concurrent requests to {name}; retry in {retry_after:g}s.")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class Bulkhead:
+    """
+    Concurrency limit with a bounded wait queue for one dependency. Use as
+    `with bulkhead.limit(): ...` around each call to the dependency.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queued: int, max_wait: float, retry_after: float = 1):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self._slots = threading.Semaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    @contextmanager
+    def limit(self) -> Iterator[None]:
+        fail_fast = _fail_fast.get()
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if fail_fast and self.queued >= self.max_queued:
+                    self.rejected += 1
+                    raise BulkheadFull(self.name, self.retry_after)
+                self.queued += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.max_wait if fail_fast else None)
+            finally:
+                with self._lock:
+                    self.queued -= 1
+            if not acquired:
+                with self._lock:
+                    self.rejected += 1
+                raise BulkheadFull(self.name, self.retry_after)
+        stage_metrics.observe(f"bulkhead.{self.name}.wait", time.perf_counter() - start)
+        with self._lock:
+            self.active += 1
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "active": self.active,
+                "queued": self.queued,
+                "max_concurrent": self.max_concurrent,
+                "max_queued": self.max_queued,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+
+bulkheads: Dict[str, Bulkhead] = {name: Bulkhead(name, **limits) for name, limits in BULKHEAD_LIMITS.items()}
+
+
+def get_bulkhead(name: str) -> Bulkhead:
+    try:
+        return bulkheads[name]
+    except KeyError:
+        raise ValueError(f"Unknown dependency '{name}'. Expected one of {list(bulkheads)}.")
+
+
+@contextmanager
+def wait_for_capacity() -> Iterator[None]:
+    """
+    Within this block (and in threads started with a copy of its context), calls wait for a
+    free slot as long as it takes instead of failing fast. Use it for work that has no client
+    waiting on it, where queueing is better than failing.
+    """
+    token = _fail_fast.set(False)
+    try:
+        yield
+    finally:
+        _fail_fast.reset(token)
+
+
+def render_bulkheads_prometheus() -> str:
+    """Active calls, queue depth and rejections per dependency in the Prometheus text format."""
+    stats = {name: bulkhead.stats() for name, bulkhead in bulkheads.items()}
+    lines = []
+    for metric, kind, field in (
+        ("rag_bulkhead_active", "gauge", "active"),
+        ("rag_bulkhead_queued", "gauge", "queued"),
+        ("rag_bulkhead_rejected_total", "counter", "rejected"),
+    ):
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, values in stats.items():
+            lines.append(f'{metric}{{dependency="{name}"}} {values[field]}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,154 @@
+import os
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Tuple, Union
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.core.bulkhead import get_bulkhead
+
+# One keep-alive pool per downstream service. Pool sizes bound the concurrent connections we
+# open to each service; deadlines make a wedged service fail the request instead of hanging it.
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+DOWNSTREAMS: Dict[str, Dict[str, float]] = {
+    "tei": {
+        "pool_size": int(os.getenv("TEI_POOL_SIZE", "16")),
+        "read_timeout": float(os.getenv("TEI_READ_TIMEOUT", "60")),
+    },
+    "tgi": {
+        "pool_size": int(os.getenv("TGI_POOL_SIZE", "32")),
+        # Long H&P notes take minutes to generate
+        "read_timeout": float(os.getenv("TGI_READ_TIMEOUT", "300")),
+    },
+}
+
+Timeout = Union[None, float, Tuple[float, float]]
+
+_sessions: Dict[str, requests.Session] = {}
+_async_clients: Dict[Tuple[str, int], httpx.AsyncClient] = {}
+_lock = threading.Lock()
+
+
+def _config(downstream: str) -> Dict[str, float]:
+    try:
+        return DOWNSTREAMS[downstream]
+    except KeyError:
+        raise ValueError(f"Unknown downstream service '{downstream}'. Expected one of {list(DOWNSTREAMS)}.")
+
+
+def _timeout(downstream: str, timeout: Timeout) -> Tuple[float, float]:
+    """Resolves a (connect, read) deadline; a bare number overrides the read deadline only."""
+    if isinstance(timeout, tuple):
+        return timeout
+    read_timeout = timeout if timeout is not None else _config(downstream)["read_timeout"]
+    return (HTTP_CONNECT_TIMEOUT, read_timeout)
+
+
+def get_session(downstream: str) -> requests.Session:
+    """
+    Returns the process-wide `requests.Session` for a downstream service ("tei" or "tgi").
+    Connection failures are retried twice with backoff; requests that reached the service
+    are never retried, since generation is not idempotent.
+    """
+    with _lock:
+        session = _sessions.get(downstream)
+        if session is None:
+            pool_size = int(_config(downstream)["pool_size"])
+            retry = Retry(total=2, connect=2, read=0, status=0, other=0, backoff_factor=0.2, allowed_methods=None)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[downstream] = session
+        return session
+
+
+def post(downstream: str, url: str, timeout: Timeout = None, **kwargs: Any) -> requests.Response:
+    """
+    POSTs through the pooled session of `downstream`, always with connect and read deadlines.
+
+    The call holds a slot in the downstream's bulkhead and raises BulkheadFull when none is
+    available (see app.core.bulkhead). A `stream=True` response is read after this returns,
+    so streaming callers take the slot themselves for as long as they read.
+    """
+    if kwargs.get("stream"):
+        return get_session(downstream).post(url, timeout=_timeout(downstream, timeout), **kwargs)
+    with get_bulkhead(downstream).limit():
+        return get_session(downstream).post(url, timeout=_timeout(downstream, timeout), **kwargs)
+
+
+def get_async_client(downstream: str) -> httpx.AsyncClient:
+    """
+    Returns the pooled `httpx.AsyncClient` for a downstream service, sized and retried like
+    its sync session. Clients are bound to the event loop that created them, so one is kept
+    per running loop.
+    """
+    loop = asyncio.get_running_loop()
+    key = (downstream, id(loop))
+    with _lock:
+        client = _async_clients.get(key)
+        if client is None or client.is_closed:
+            config = _config(downstream)
+            connect_timeout, read_timeout = _timeout(downstream, None)
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=int(config["pool_size"]),
+                    max_keepalive_connections=int(config["pool_size"]),
+                ),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                transport=httpx.AsyncHTTPTransport(retries=2),  # connection failures only
+            )
+            _async_clients[key] = client
+        return client
+
+
+@asynccontextmanager
+async def _async_limit(downstream: str) -> AsyncIterator[None]:
+    """Holds a slot in the downstream's bulkhead, waiting for it on a worker thread."""
+    slot = get_bulkhead(downstream).limit()
+    entering = asyncio.ensure_future(asyncio.to_thread(slot.__enter__))
+    try:
+        await asyncio.shield(entering)
+    except asyncio.CancelledError:
+        # The thread may still get the slot after we are cancelled: hand it back then
+        entering.add_done_callback(lambda f: f.cancelled() or f.exception() or slot.__exit__(None, None, None))
+        raise
+    try:
+        yield
+    finally:
+        slot.__exit__(None, None, None)
+
+
+async def apost(downstream: str, url: str, timeout: Timeout = None, **kwargs: Any) -> httpx.Response:
+    """
+    Async counterpart of `post`: the same deadlines and bulkhead slot (BulkheadFull when
+    none is available), over the pooled async client of `downstream`.
+    """
+    connect_timeout, read_timeout = _timeout(downstream, timeout)
+    async with _async_limit(downstream):
+        return await get_async_client(downstream).post(
+            url, timeout=httpx.Timeout(read_timeout, connect=connect_timeout), **kwargs
+        )
+
+
+def close_http_clients():
+    """Closes the sync sessions (e.g. on shutdown). See `aclose_http_clients` for the async ones."""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+async def aclose_http_clients():
+    """Closes the sync sessions and the async clients of the current event loop."""
+    close_http_clients()
+    loop_id = id(asyncio.get_running_loop())
+    with _lock:
+        clients = [key for key in _async_clients if key[1] == loop_id]
+        to_close = [_async_clients.pop(key) for key in clients]
+    for client in to_close:
+        await client.aclose()
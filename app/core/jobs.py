@@ -0,0 +1,213 @@
+import time
+import uuid
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATUSES = (SUCCEEDED, FAILED)
+
+
+def _rates(counts: Dict[str, int], seconds: float) -> Dict[str, float]:
+    """Per-second rate of each count over `seconds`."""
+    if seconds <= 0:
+        return {}
+    return {name: round(value / seconds, 2) for name, value in counts.items()}
+
+
+class JobQueueFull(Exception):
+    """Raised by `JobManager.submit` when the number of unfinished jobs is at its limit."""
+
+
+class JobStore(ABC):
+    """
+    Where job state lives. Jobs are plain dicts keyed by "id". The in-memory store only
+    serves polls on the process that ran the job; implement this interface over a shared
+    backend (Redis, the summaries database) to let any API replica answer them.
+    """
+
+    @abstractmethod
+    def create(self, job: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields: Any):
+        ...
+
+
+class InMemoryJobStore(JobStore):
+    """
+    Process-local job store. Finished jobs are kept for `ttl` seconds, and at most
+    `max_jobs` jobs are kept overall (oldest finished jobs are evicted first).
+    """
+
+    def __init__(self, max_jobs: int = 1000, ttl: float = 3600.0):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        now = time.time()
+        finished = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in FINISHED_STATUSES
+        ]
+        for job_id in finished:
+            if now - self._jobs[job_id]["finished_at"] > self.ttl or len(self._jobs) > self.max_jobs:
+                del self._jobs[job_id]
+
+    def create(self, job: Dict[str, Any]):
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._evict()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            # Copy, so callers never see a job change while they serialize it
+            return {
+                **job,
+                "stages": [
+                    {**stage, "counts": dict(stage.get("counts", {})), "throughput": dict(stage.get("throughput", {}))}
+                    for stage in job["stages"]
+                ],
+            }
+
+    def update(self, job_id: str, **fields: Any):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._jobs)
+
+
+class JobManager:
+    """
+    Runs submitted functions as background jobs on a bounded worker pool and records their
+    status, per-stage progress and result in a `JobStore`.
+
+    The job function is called as `fn(*args, progress=callback, **kwargs)`; calling
+    `callback("stage name")` marks the start of a stage, so polls show which stage is
+    running and how long finished ones took. Counts may be passed along, e.g.
+    `callback("embed", batches=3, chunks=96)`; calling it again for the current stage
+    updates its counts, and polls also show each count's rate per second. At most `max_pending` jobs may be queued or
+    running; beyond that `submit` raises JobQueueFull instead of queueing without bound.
+    """
+
+    def __init__(self, store: JobStore, max_workers: int = 4, max_pending: int = 1000, name: str = "job"):
+        self.store = store
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> str:
+        """Queues a job and returns its id."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise JobQueueFull(f"{self._pending} jobs are already pending.")
+            self._pending += 1
+            self.submitted += 1
+
+        job_id = str(uuid.uuid4())
+        self.store.create({
+            "id": job_id,
+            "status": QUEUED,
+            "stage": None,
+            "stages": [],
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        })
+        try:
+            self._executor.submit(self._run, job_id, fn, args, kwargs)
+        except RuntimeError as e:  # executor shut down
+            self._finish(job_id, FAILED, error=str(e))
+            raise
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    @staticmethod
+    def _close_stage(stage: Dict[str, Any], now: float):
+        stage["seconds"] = now - stage["started_at"]
+        stage["throughput"] = _rates(stage["counts"], stage["seconds"])
+
+    def _progress(self, job_id: str, stage: str, **counts: int):
+        job = self.store.get(job_id)
+        if job is None:
+            return
+        now = time.time()
+        stages = job["stages"]
+        current = stages[-1] if stages and stages[-1]["seconds"] is None else None
+        if current is not None and current["name"] == stage:
+            # Same stage again: only its counts moved on
+            current["counts"].update(counts)
+            current["throughput"] = _rates(current["counts"], now - current["started_at"])
+        else:
+            if current is not None:
+                self._close_stage(current, now)
+            stages.append({"name": stage, "started_at": now, "seconds": None, "counts": dict(counts), "throughput": {}})
+        self.store.update(job_id, stage=stage, stages=stages)
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None):
+        now = time.time()
+        job = self.store.get(job_id)
+        stages = job["stages"] if job else []
+        if stages and stages[-1]["seconds"] is None:
+            self._close_stage(stages[-1], now)
+        self.store.update(job_id, status=status, result=result, error=error, stage=None, stages=stages, finished_at=now)
+        with self._lock:
+            self._pending -= 1
+            if status == SUCCEEDED:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+
+    def _run(self, job_id: str, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]):
+        self.store.update(job_id, status=RUNNING, started_at=time.time())
+        try:
+            result = fn(*args, progress=lambda stage, **counts: self._progress(job_id, stage, **counts), **kwargs)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self._finish(job_id, FAILED, error=str(e))
+        else:
+            self._finish(job_id, SUCCEEDED, result=result)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "submitted": self.submitted,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
@@ -0,0 +1,137 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from a warm retrieval cache hit up to a long TGI generation
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Spans of the request currently being served; shared by reference with worker threads
+# started through `copy_context()`, so fan-out stages land in the same request.
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimates a quantile by linear interpolation inside the matching bucket."""
+        if self.count == 0:
+            return None
+        target = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for i, upper in enumerate(self.buckets):
+            if cumulative + self.counts[i] >= target:
+                fraction = (target - cumulative) / self.counts[i] if self.counts[i] else 0.0
+                return lower + (upper - lower) * fraction
+            cumulative += self.counts[i]
+            lower = upper
+        return self.buckets[-1]
+
+
+class StageMetrics:
+    """Thread-safe registry of one latency histogram per pipeline stage."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = Histogram(self.buckets)
+                self._histograms[stage] = histogram
+            histogram.observe(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count, mean and estimated p50/p99 per stage."""
+        with self._lock:
+            return {
+                stage: {
+                    "count": h.count,
+                    "mean": h.sum / h.count if h.count else 0.0,
+                    "p50": h.quantile(0.5),
+                    "p99": h.quantile(0.99),
+                }
+                for stage, h in sorted(self._histograms.items())
+            }
+
+    def render_prometheus(self, metric: str = "rag_stage_duration_seconds") -> str:
+        """Renders all histograms in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {metric} Time spent in each stage of the summary pipeline.",
+            f"# TYPE {metric} histogram",
+        ]
+        with self._lock:
+            for stage, h in sorted(self._histograms.items()):
+                cumulative = 0
+                for upper, count in zip(self.buckets, h.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{upper}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {h.sum}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+stage_metrics = StageMetrics()
+
+
+def record_stage(stage: str, seconds: float):
+    """Records a measured stage duration in `stage_metrics` and the current request's spans."""
+    stage_metrics.observe(stage, seconds)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """
+    Times the enclosed block, records it in the `stage_metrics` histogram for `stage`
+    and, inside `record_spans`, adds it to the current request's spans.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def record_spans():
+    """Collects the stage spans of everything run inside the block (e.g. one HTTP request)."""
+    spans: List[Tuple[str, float]] = []
+    token = _request_spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _request_spans.reset(token)
+
+
+def format_server_timing(spans: List[Tuple[str, float]]) -> str:
+    """Formats spans as a Server-Timing header value, summing repeated stages (durations in ms)."""
+    totals: Dict[str, float] = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
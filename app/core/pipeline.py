@@ -1,40 +1,100 @@
 import os
 import sys
+import json
+import uuid
+import queue
+import asyncio
+import hashlib
+import functools
+import threading
+import contextvars
 import pysqlite3 
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 # workaround for chromadb/sqlite3 before anything else that might import it
 sys.modules["sqlite3"] = pysqlite3
 sys.modules["_sqlite3"] = pysqlite3.dbapi2
 
 
-from app.data_ingestion.document_loader import load_documents
+from app.data_ingestion.document_loader import load_documents, SUPPORTED_EXTENSIONS
+from app.data_ingestion.manifest import get_ingestion_manifest, ingestion_lock, file_sha256, chunk_sha256, content_chunk_id
 from app.data_ingestion.split_and_chunk import clean_document_content
 from app.data_ingestion.split_and_chunk import split_documents_into_chunks
 from app.embed_and_store.embed import create_embeddings
-from app.embed_and_store.store import store_chunks_in_chroma
-from app.retrieval.retrieve import retrieve_relevant_chunks
-from app.generation.generate_summary import generate_summary
+from app.embed_and_store.store import (
+    store_chunks_in_chroma, delete_chunks_from_chroma, find_legacy_chunk_ids, USER_UPLOAD_COLLECTION
+)
+from app.retrieval.retrieve import retrieve_relevant_chunks, embed_retrieval_queries
+from app.generation.generate_summary import generate_summary, stream_summary, summary_prompt_fits
+from app.generation.map_reduce import map_reduce_summary, extract_transcript_facts
+from app.generation.section_parallel import section_parallel_summary
+from app.retrieval.lexical import save_lexical_index
+from app.core.metrics import stage_timer
+from app.core.bulkhead import wait_for_capacity
+from app.core.cache import TTLCache
+from app.core.singleflight import SingleFlight
 
+# "single" generates the H&P summary in one TGI request; "sections" generates groups of
+# template sections as parallel requests (see app.generation.section_parallel)
+SUMMARY_GENERATION_MODE = os.getenv("SUMMARY_GENERATION_MODE", "single")
+SUMMARY_TEMPERATURE = float(os.getenv("SUMMARY_TEMPERATURE", "0.2"))
 
-def run_ingestion_pipeline(raw_data_dir: str):
+# Identical summary requests (double-clicks, RabbitMQ redeliveries) that arrive while one is
+# in flight share its result. Deterministic (temperature 0) results are also cached.
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "128"))
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", "3600"))
+summary_cache = TTLCache(max_size=SUMMARY_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL)
+summary_flight = SingleFlight()
+
+# The pipeline is blocking (retrieval, TEI and TGI calls). Async endpoints run it on this pool
+# so the event loop keeps serving other requests; the size caps concurrent pipelines per worker
+# and is matched to the TGI connection pool (TGI_POOL_SIZE).
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "32"))
+_pipeline_executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="pipeline")
+
+# Batch summarization pipelines the two halves: up to BATCH_RETRIEVAL_WORKERS retrievals run
+# ahead while at most BATCH_GENERATION_IN_FLIGHT summaries are generated on TGI at once.
+# The pools are shared, so concurrent batches together stay within these limits.
+BATCH_RETRIEVAL_WORKERS = int(os.getenv("BATCH_RETRIEVAL_WORKERS", "8"))
+BATCH_GENERATION_IN_FLIGHT = int(os.getenv("BATCH_GENERATION_IN_FLIGHT", "4"))
+_batch_retrieval_executor = ThreadPoolExecutor(max_workers=BATCH_RETRIEVAL_WORKERS, thread_name_prefix="batch-retrieve")
+_batch_generation_executor = ThreadPoolExecutor(max_workers=BATCH_GENERATION_IN_FLIGHT, thread_name_prefix="batch-generate")
+# Longest a batch waits for its next result before reporting the rest as failed
+BATCH_RESULT_TIMEOUT = float(os.getenv("BATCH_RESULT_TIMEOUT", "600"))
+
+
+def run_ingestion_pipeline(
+    raw_data_dir: str,
+    progress: Optional[Callable[..., None]] = None,
+    file_filter: Optional[Callable[[Path], bool]] = None
+):
     """
     Runs the document ingestion pipeline: loads, splits, and chunks documents.
+    `progress`, if given, is told when each stage starts and how many pages/chunks it produced.
+    `file_filter`, if given, selects which files of the directory to load.
     """
     print("\n--- Starting Document Ingestion Pipeline ---")
+    if progress is None:
+        progress = lambda stage, **counts: None
 
     # 1. Load Documents
     print("Step 1: Loading documents...")
-    documents = load_documents(raw_data_dir)
+    progress("load")
+    documents = load_documents(raw_data_dir, file_filter=file_filter)
+    progress("load", files=len({doc.metadata.get("source") for doc in documents}), pages=len(documents))
     if not documents:
         print("No documents loaded. Exiting ingestion pipeline.")
         return [] # Return an empty list if no docs
 
     # 2. Clean, Split and Chunk Documents
     print("Step 2: Cleaning then Splitting documents into chunks...")
+    progress("split")
     clean_documents = clean_document_content(documents)
     print("Documents have been cleaned.")
     chunks = split_documents_into_chunks(clean_documents)
+    progress("split", chunks=len(chunks))
     if not chunks:
         print("No chunks generated. Exiting ingestion pipeline.")
         return []
@@ -42,59 +102,466 @@ def run_ingestion_pipeline(raw_data_dir: str):
     print(f"Ingestion pipeline complete. Generated {len(chunks)} chunks.")
     return chunks
 
-def run_embedding_and_storage_pipeline(chunks: list):
+def run_embedding_and_storage_pipeline(
+    chunks: list,
+    progress: Optional[Callable[..., None]] = None,
+    persist_lexical: bool = True
+):
     """
     Generates embeddings for chunks and stores them in the vector database.
+    `progress`, if given, receives the embedded batch and stored chunk counts.
+    `persist_lexical` is passed on to `store_chunks_in_chroma`.
+    Returns the embedded chunks that were stored ([] if embedding or storing failed).
     """
     print("\n--- Starting Embedding and Storage Pipeline ---")
 
     # 3. Create Embeddings
     print("Step 3: Generating embeddings for chunkss...")
-    embedded_chunks = create_embeddings(chunks, os.getenv("TEI_SERVICE_URL"))
+    if progress is not None:
+        progress("embed", batches=0, chunks=0)
+    embedded_chunks = create_embeddings(chunks, os.getenv("TEI_SERVICE_URL"), progress=progress)
     if not embedded_chunks:
         print("No embeddings generated. Exiting embedding pipeline.")
-        return
+        return []
 
     # 4. Store Embeddings in Vector DB
     print("Step 4: Storing embeddings and chunks in ChromaDB...")
-    store_chunks_in_chroma(embedded_chunks, os.getenv("CHROMADB_SERVICE_URL"), os.getenv("CHROMA_COLLECTION_NAME"))
+    if progress is not None:
+        progress("store", chunks=0)
+    stored = store_chunks_in_chroma(
+        embedded_chunks, os.getenv("CHROMADB_SERVICE_URL"), USER_UPLOAD_COLLECTION,
+        progress=progress, persist_lexical=persist_lexical
+    )
     print("Embedding and Storage pipeline complete.")
+    return embedded_chunks if stored else []
+
+
+def run_incremental_ingestion_pipeline(raw_data_dir: str, progress: Optional[Callable[..., None]] = None) -> Dict[str, int]:
+    """
+    Ingests a directory into the documents collection, doing only the work that changed
+    since the files were last ingested (see app.data_ingestion.manifest):
+
+    - files whose bytes were already ingested are skipped before parsing;
+    - for changed files, only chunks whose text is new are embedded and stored;
+    - chunks a changed file no longer produces are deleted once its new chunks are stored;
+    - a file not in the manifest yet may have been stored under the old positional chunk
+      ids, so those are deleted once its chunks are stored under content-derived ids.
+
+    Runs into the collection are serialised, so two uploads of the same file cannot both
+    plan against the old manifest and orphan each other's chunks.
+
+    Returns counts of files ingested and skipped, chunks produced, embedded and deleted.
+    """
+    with ingestion_lock(USER_UPLOAD_COLLECTION):
+        return _run_incremental_ingestion(raw_data_dir, USER_UPLOAD_COLLECTION, progress)
+
+
+def _run_incremental_ingestion(
+    raw_data_dir: str,
+    collection_name: str,
+    progress: Optional[Callable[..., None]] = None
+) -> Dict[str, int]:
+    manifest = get_ingestion_manifest(collection_name)
+    if progress is None:
+        progress = lambda stage, **counts: None
+
+    progress("hash")
+    file_hashes = {
+        path.name: file_sha256(str(path))
+        for path in sorted(Path(raw_data_dir).rglob("*"))
+        if path.suffix.lower() in SUPPORTED_EXTENSIONS and path.is_file()
+    }
+    changed = {name for name, sha256 in file_hashes.items() if not manifest.is_unchanged(name, sha256)}
+    progress("hash", files=len(file_hashes), skipped_files=len(file_hashes) - len(changed))
+    stats = {"files": len(changed), "skipped_files": len(file_hashes) - len(changed), "chunks": 0, "embedded": 0, "deleted": 0}
+    if not changed:
+        print(f"All {len(file_hashes)} files are unchanged since they were last ingested.")
+        return stats
+
+    chunks = run_ingestion_pipeline(raw_data_dir, progress=progress, file_filter=lambda path: path.name in changed)
+    stats["chunks"] = len(chunks)
+
+    # Only chunks whose text is not stored yet for their file need embedding
+    chunks_by_source: Dict[str, List[Any]] = {}
+    for chunk in chunks:
+        chunk.metadata["chunk_hash"] = chunk_sha256(chunk.page_content)
+        chunks_by_source.setdefault(chunk.metadata["source"], []).append(chunk)
+    hashes_by_source = {
+        source: [chunk.metadata["chunk_hash"] for chunk in source_chunks]
+        for source, source_chunks in chunks_by_source.items()
+    }
+    unrecorded = {source for source in chunks_by_source if source not in manifest}
+    new_chunks = []
+    stale_by_source: Dict[str, List[str]] = {}
+    for source, source_chunks in chunks_by_source.items():
+        new_hashes, stale_by_source[source] = manifest.plan(source, hashes_by_source[source])
+        new_hashes = set(new_hashes)
+        for chunk in source_chunks:
+            if chunk.metadata["chunk_hash"] in new_hashes:
+                new_chunks.append(chunk)
+                new_hashes.discard(chunk.metadata["chunk_hash"])  # identical chunks share one id
+
+    stored_hashes = set()
+    if new_chunks:
+        # The BM25 index is written once, after the deletes below
+        stored = run_embedding_and_storage_pipeline(new_chunks, progress=progress, persist_lexical=False)
+        stored_hashes = {(item["metadata"].get("source"), item["metadata"].get("chunk_hash")) for item in stored}
+        stats["embedded"] = len(stored)
+
+    stale_ids = []
+    for source, hashes in hashes_by_source.items():
+        previous = manifest.chunk_ids(source)
+        current = {h: content_chunk_id(source, h) for h in hashes if h in previous or (source, h) in stored_hashes}
+        if len(current) == len(set(hashes)):
+            manifest.record_file(source, file_hashes[source], current)
+            stale_ids.extend(stale_by_source[source])
+            if source in unrecorded:
+                stale_ids.extend(find_legacy_chunk_ids(source, os.getenv("CHROMADB_SERVICE_URL"), collection_name))
+        else:
+            # Some chunks failed to embed or store: keep the old chunks and retry the file next time
+            manifest.record_file(source, "", {**previous, **current})
+    if stale_ids:
+        progress("delete")
+        stats["deleted"] = delete_chunks_from_chroma(
+            stale_ids, os.getenv("CHROMADB_SERVICE_URL"), collection_name, persist_lexical=False
+        )
+        progress("delete", chunks=stats["deleted"])
+    if stored_hashes or stats["deleted"]:
+        save_lexical_index(collection_name)
+    manifest.save()
+
+    print(f"Incremental ingestion complete: {stats}")
+    return stats
 
 
-def run_retrieval_and_generation_pipeline(transcribed_conversation: str, additional_content: Optional[str] = None, summary_title: Optional[str] = None):
+def _summary_request_key(
+    transcribed_conversation: str,
+    additional_content: Optional[str],
+    summary_title: Optional[str],
+    temperature: float
+) -> str:
+    request = [transcribed_conversation, additional_content, summary_title, temperature, SUMMARY_GENERATION_MODE]
+    return hashlib.sha256(json.dumps(request).encode("utf-8")).hexdigest()
+
+
+def run_retrieval_and_generation_pipeline(
+    transcribed_conversation: str,
+    additional_content: Optional[str] = None,
+    summary_title: Optional[str] = None,
+    temperature: Optional[float] = None,
+    bypass_cache: bool = False,
+    progress: Optional[Callable[[str], None]] = None
+):
     """
     Runs the retrieval and generation pipeline: retrieves relevant chunks and generates a summary.
+    See `run_retrieval_and_generation_pipeline_with_id`.
+    """
+    summary, _ = run_retrieval_and_generation_pipeline_with_id(
+        transcribed_conversation, additional_content, summary_title, temperature, bypass_cache, progress
+    )
+    return summary
+
+
+def run_retrieval_and_generation_pipeline_with_id(
+    transcribed_conversation: str,
+    additional_content: Optional[str] = None,
+    summary_title: Optional[str] = None,
+    temperature: Optional[float] = None,
+    bypass_cache: bool = False,
+    progress: Optional[Callable[[str], None]] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Runs the retrieval and generation pipeline and returns the summary together with the id
+    it is saved under (None, None if no summary was generated). The id is known immediately;
+    the row itself is written shortly after by the summary write-behind queue.
+
+    Concurrent calls with the same (transcript, additional_content, title, temperature) share
+    one computation, so they produce a single summary (and a single saved row). With
+    temperature 0 the result is deterministic and is also served from `summary_cache`.
+    `bypass_cache` forces a fresh computation that neither joins an in-flight call nor
+    reads the cache (its deterministic result still refreshes the cache).
+
+    `progress`, if given, is called with each stage name ("retrieve", "generate") as it starts.
+    Only the caller that runs a coalesced computation receives these calls.
+    """
+    temperature = SUMMARY_TEMPERATURE if temperature is None else temperature
+    key = _summary_request_key(transcribed_conversation, additional_content, summary_title, temperature)
+    deterministic = temperature == 0
+
+    # Coalesced and cached requests get the id of the summary they share
+    summary_id = str(uuid.uuid4())
+    if bypass_cache:
+        result = _run_retrieval_and_generation_pipeline(
+            transcribed_conversation, additional_content, summary_title, temperature, summary_id, progress
+        )
+    else:
+        if deterministic:
+            cached = summary_cache.get(key)
+            if cached is not None:
+                print("Summary cache hit: reusing the previous summary.")
+                return cached
+        result, shared = summary_flight.do(
+            key, _run_retrieval_and_generation_pipeline,
+            transcribed_conversation, additional_content, summary_title, temperature, summary_id, progress
+        )
+        if shared:
+            print("Joined an identical in-flight summary request.")
+
+    if deterministic and result[0]:
+        summary_cache.set(key, result)
+    return result
+
+
+async def run_in_pipeline_executor(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Awaits a blocking pipeline call on the pipeline pool. The caller's context is copied
+    into the worker (run_in_executor does not), so metric spans still reach the request.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await loop.run_in_executor(_pipeline_executor, call)
+
+
+async def arun_retrieval_and_generation_pipeline(*args: Any, **kwargs: Any) -> Optional[str]:
+    """Non-blocking `run_retrieval_and_generation_pipeline` for async endpoints."""
+    return await run_in_pipeline_executor(run_retrieval_and_generation_pipeline, *args, **kwargs)
+
+
+async def arun_retrieval_and_generation_pipeline_with_id(*args: Any, **kwargs: Any) -> Tuple[Optional[str], Optional[str]]:
+    """Non-blocking `run_retrieval_and_generation_pipeline_with_id` for async endpoints."""
+    return await run_in_pipeline_executor(run_retrieval_and_generation_pipeline_with_id, *args, **kwargs)
+
+
+def _retrieve_summary_context(
+    transcribed_conversation: str,
+    query_embeddings: Optional[List[List[float]]] = None
+) -> List[Dict[str, Any]]:
+    with stage_timer("pipeline.retrieve"):
+        return retrieve_relevant_chunks(
+            transcribed_conversation,
+            os.getenv("CHROMADB_SERVICE_URL"),
+            n_results=7,
+            tei_service_url=os.getenv("TEI_SERVICE_URL"),
+            query_embeddings=query_embeddings
+        )
+
+
+def _generate_summary_from_context(
+    transcribed_conversation: str,
+    relevant_chunks: List[Dict[str, Any]],
+    additional_content: Optional[str],
+    summary_title: Optional[str],
+    temperature: float,
+    summary_id: str
+) -> str:
+    # Long consultations go through per-segment fact extraction first
+    summarize = generate_summary
+    if not summary_prompt_fits(transcribed_conversation, additional_content):
+        print("Transcript exceeds the input token budget. Using map-reduce summarization.")
+        summarize = map_reduce_summary
+    elif SUMMARY_GENERATION_MODE == "sections":
+        summarize = section_parallel_summary
+    with stage_timer("pipeline.generate"):
+        return summarize(
+            transcribed_conversation,
+            relevant_chunks,
+            os.getenv("TGI_SERVICE_URL"),
+            temperature=temperature,
+            additional_content=additional_content,
+            summary_title=summary_title,
+            summary_id=summary_id,
+        )
+
+
+def _run_retrieval_and_generation_pipeline(
+    transcribed_conversation: str,
+    additional_content: Optional[str],
+    summary_title: Optional[str],
+    temperature: float,
+    summary_id: str,
+    progress: Optional[Callable[[str], None]] = None,
+    query_embeddings: Optional[List[List[float]]] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Runs the retrieval and generation pipeline once, uncached. Returns (summary, summary_id).
+    Transcripts too long for a single prompt are summarized with map-reduce (see app.generation.map_reduce);
+    otherwise SUMMARY_GENERATION_MODE picks single-pass or section-parallel generation.
     """
     print("\n--- Starting Retrieval and Generation Pipeline ---")
 
     # 5. Retrieve Relevant Chunks
     print(f"Step 5: Retrieving relevant chunks for query")
-    relevant_chunks = retrieve_relevant_chunks(transcribed_conversation, os.getenv("CHROMADB_SERVICE_URL"), n_results=7)
+    if progress:
+        progress("retrieve")
+    relevant_chunks = _retrieve_summary_context(transcribed_conversation, query_embeddings)
     if not relevant_chunks:
         print("No relevant chunks found. Cannot generate summary.")
-        return None
+        return None, None
 
     print(f"Found {len(relevant_chunks)} relevant chunks. These are the relevant chunks: '{relevant_chunks}'")
 
     # 6. Generate Summary
     print("Step 6: Generating summary...")
+    if progress:
+        progress("generate")
     print(f"Inside pipeline, received additional_content: {additional_content}")
-    summary = generate_summary(
-        transcribed_conversation,
-        relevant_chunks,
-        os.getenv("TGI_SERVICE_URL"),
-        additional_content=additional_content,
-        summary_title=summary_title,
+    summary = _generate_summary_from_context(
+        transcribed_conversation, relevant_chunks, additional_content, summary_title, temperature, summary_id
     )
     if not summary:
         print("Failed to generate summary.")
-        return None
+        return None, None
 
     print("\n--- Generated Summary ---")
     print(summary)
     print("--- End Summary ---")
     print("Retrieval and Generation pipeline complete.")
-    return summary
+    return summary, summary_id
+
+
+def run_batch_retrieval_and_generation_pipeline(
+    conversations: List[Dict[str, Any]],
+    temperature: Optional[float] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Summarizes many conversations ({"text": ..., "title": ...}) and yields one result per
+    conversation as soon as it is done, in completion order:
+    {"index": i, "summary": ..., "summary_id": ...} or {"index": i, "error": ...}.
+
+    All retrieval queries are embedded up front in batched TEI calls. Retrievals then run
+    concurrently, and each conversation moves on to generation as soon as its context is in;
+    see BATCH_RETRIEVAL_WORKERS and BATCH_GENERATION_IN_FLIGHT. Those limits are the batch's
+    admission control, so its calls wait for dependency capacity rather than failing fast.
+    Batch items are independent requests, so they bypass request coalescing and the summary cache.
+
+    Closing the generator (e.g. the client disconnected) cancels the conversations that have
+    not started retrieval or generation yet. If no result arrives within BATCH_RESULT_TIMEOUT
+    seconds, the remaining conversations are reported as failed.
+    """
+    temperature = SUMMARY_TEMPERATURE if temperature is None else temperature
+    results: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+    cancelled = threading.Event()
+    futures = []
 
+    tei_service_url = os.getenv("TEI_SERVICE_URL")
+    query_embeddings: List[Optional[List[List[float]]]] = [None] * len(conversations)
+    if tei_service_url:
+        with stage_timer("pipeline.batch_embed_queries"), wait_for_capacity():
+            query_embeddings = embed_retrieval_queries([c["text"] for c in conversations], tei_service_url)
 
+    def generate(index: int, conversation: Dict[str, Any], relevant_chunks: List[Dict[str, Any]]):
+        summary_id = str(uuid.uuid4())
+        try:
+            with wait_for_capacity():
+                summary = _generate_summary_from_context(
+                    conversation["text"], relevant_chunks, None, conversation.get("title"), temperature, summary_id
+                )
+        except Exception as e:
+            results.put({"index": index, "error": f"Failed to generate summary: {e}"})
+            return
+        if summary:
+            results.put({"index": index, "summary": summary, "summary_id": summary_id})
+        else:
+            results.put({"index": index, "error": "Could not generate summary (TGI issue)."})
+
+    def retrieve(index: int, conversation: Dict[str, Any]):
+        try:
+            with wait_for_capacity():
+                relevant_chunks = _retrieve_summary_context(conversation["text"], query_embeddings[index])
+        except Exception as e:
+            results.put({"index": index, "error": f"Failed to retrieve context: {e}"})
+            return
+        if not relevant_chunks:
+            results.put({"index": index, "error": "Could not generate summary (no relevant context found)."})
+            return
+        if cancelled.is_set():
+            return
+        try:
+            futures.append(_batch_generation_executor.submit(
+                contextvars.copy_context().run, generate, index, conversation, relevant_chunks
+            ))
+        except RuntimeError as e:  # the pool is shut down
+            results.put({"index": index, "error": f"Failed to generate summary: {e}"})
+
+    print(f"\n--- Starting Batch Retrieval and Generation Pipeline ({len(conversations)} conversations) ---")
+    pending = set(range(len(conversations)))
+    try:
+        for index, conversation in enumerate(conversations):
+            try:
+                futures.append(_batch_retrieval_executor.submit(contextvars.copy_context().run, retrieve, index, conversation))
+            except RuntimeError as e:  # the pool is shut down
+                results.put({"index": index, "error": f"Failed to retrieve context: {e}"})
+        while pending:
+            try:
+                result = results.get(timeout=BATCH_RESULT_TIMEOUT)
+            except queue.Empty:
+                print(f"No batch result within {BATCH_RESULT_TIMEOUT}s. Giving up on {len(pending)} conversations.")
+                for index in sorted(pending):
+                    yield {"index": index, "error": "Timed out waiting for the summary."}
+                break
+            pending.discard(result["index"])
+            yield result
+        print("Batch Retrieval and Generation pipeline complete.")
+    finally:
+        # Stop work nobody will read: queued tasks are dropped, running ones submit nothing new
+        cancelled.set()
+        for future in list(futures):
+            future.cancel()
+
+
+def stream_retrieval_and_generation_pipeline(transcribed_conversation: str, additional_content: Optional[str] = None, summary_title: Optional[str] = None, summary_id: Optional[str] = None, temperature: Optional[float] = None) -> Optional[Iterator[str]]:
+    """
+    Streaming variant of `run_retrieval_and_generation_pipeline`. Retrieval and the start of
+    generation (up to the first token) run up front, so callers can still report "no relevant
+    context", a saturated TGI (BulkheadFull) or an unreachable TGI before streaming; the rest
+    of generation is returned as an iterator of summary tokens (see `stream_summary`), or
+    None if nothing was retrieved.
+    Streams are always generated fresh; they never read or fill the summary cache.
+    """
+    print("\n--- Starting Streaming Retrieval and Generation Pipeline ---")
+    temperature = SUMMARY_TEMPERATURE if temperature is None else temperature
+
+    relevant_chunks = _retrieve_summary_context(transcribed_conversation)
+    if not relevant_chunks:
+        print("No relevant chunks found. Cannot generate summary.")
+        return None
+
+    if not summary_prompt_fits(transcribed_conversation, additional_content):
+        # Facts are extracted up front; only the final summary is streamed
+        print("Transcript exceeds the input token budget. Extracting facts before streaming.")
+        with stage_timer("pipeline.map"):
+            facts = extract_transcript_facts(
+                transcribed_conversation, os.getenv("TGI_SERVICE_URL"), additional_content
+            )
+        if facts is None:
+            print("Failed to extract facts from the conversation.")
+            return None
+        transcribed_conversation = facts
+
+    print(f"Found {len(relevant_chunks)} relevant chunks. Streaming summary...")
+    return _start_stream(stream_summary(
+        transcribed_conversation,
+        relevant_chunks,
+        os.getenv("TGI_SERVICE_URL"),
+        temperature=temperature,
+        additional_content=additional_content,
+        summary_title=summary_title,
+        summary_id=summary_id,
+    ))
+
+
+def _start_stream(tokens: Iterator[str]) -> Iterator[str]:
+    """
+    Runs a token stream up to its first token, so the TGI slot is taken and the request is
+    sent before the caller starts a response: BulkheadFull and TGI connection/HTTP errors
+    are raised here rather than mid-stream.
+    """
+    try:
+        first = next(tokens)
+    except StopIteration:
+        return iter(())
 
+    def _resume():
+        yield first
+        yield from tokens  # closing the resumed stream closes `tokens` and frees the slot
+    return _resume()
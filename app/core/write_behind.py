@@ -0,0 +1,174 @@
+import time
+import queue
+import atexit
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.metrics import stage_metrics
+
+
+class WriteBehindQueue:
+    """
+    Bounded in-process write-behind buffer.
+
+    `submit` returns immediately; a background thread drains the queue and hands items to
+    `write_batch` in batches of up to `batch_size`, so many writes share one transaction.
+    `write_batch` may return the items it could not write; if it raises, the whole batch failed.
+    If the queue is full for longer than `submit_timeout`, the item is written inline instead,
+    which applies back-pressure rather than dropping data. Items are flushed on `close`,
+    which also runs at interpreter exit.
+
+    With `key`, items still waiting to be written can be looked up by that field (`get_pending`).
+    Items that failed to write stay retrievable there too (the latest `max_size` of them),
+    so an id already handed to a client keeps resolving while the process runs.
+    """
+
+    def __init__(
+        self,
+        write_batch: Callable[[List[Dict[str, Any]]], Any],
+        max_size: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 0.2,
+        submit_timeout: float = 1.0,
+        key: Optional[str] = None,
+        name: str = "write-behind"
+    ):
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.submit_timeout = submit_timeout
+        self.key = key
+        self.name = name
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_size)
+        self._pending: Dict[Any, Dict[str, Any]] = {}
+        self._failed_items: "OrderedDict[Any, Dict[str, Any]]" = OrderedDict()
+        self._max_failed_items = max_size
+        self._atexit_registered = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.inline_writes = 0
+        self.last_flush_seconds = 0.0
+
+    def _ensure_started(self):
+        # Started on first use, so importing (or forking before use) spawns no thread
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                if not self._atexit_registered:
+                    atexit.register(self.close)
+                    self._atexit_registered = True
+
+    def submit(self, item: Dict[str, Any]):
+        if self.key is not None:
+            with self._lock:
+                self._pending[item[self.key]] = item
+        self._ensure_started()
+        try:
+            self._queue.put(item, timeout=self.submit_timeout)
+        except queue.Full:
+            print(f"{self.name}: queue full, writing inline.")
+            with self._lock:
+                self.inline_writes += 1
+            self._write([item])
+
+    def get_pending(self, key_value: Any) -> Optional[Dict[str, Any]]:
+        """Returns an item that was submitted but not written yet (or failed to write), if any."""
+        with self._lock:
+            item = self._pending.get(key_value)
+            return item if item is not None else self._failed_items.get(key_value)
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        start = time.perf_counter()
+        try:
+            failed = list(self.write_batch(batch) or [])
+        except Exception as e:
+            print(f"{self.name}: failed to write {len(batch)} items: {e}")
+            failed = list(batch)
+        elapsed = time.perf_counter() - start
+        stage_metrics.observe(f"{self.name}.flush", elapsed)
+        if failed and self.key is not None:
+            print(f"{self.name}: not written: {[item[self.key] for item in failed]}")
+        with self._lock:
+            self.batches += 1
+            self.last_flush_seconds = elapsed
+            self.written += len(batch) - len(failed)
+            self.failed += len(failed)
+            if self.key is not None:
+                for item in batch:
+                    self._pending.pop(item[self.key], None)
+                for item in failed:
+                    self._failed_items[item[self.key]] = item
+                    self._failed_items.move_to_end(item[self.key])
+                while len(self._failed_items) > self._max_failed_items:
+                    self._failed_items.popitem(last=False)
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until everything submitted so far is written. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Flushes outstanding items and stops the background thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        self.flush(timeout)
+        self._stopping.set()
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_size": self._queue.maxsize,
+                "written": self.written,
+                "failed": self.failed,
+                "batches": self.batches,
+                "inline_writes": self.inline_writes,
+                "last_flush_seconds": self.last_flush_seconds,
+            }
+
+    def render_prometheus(self) -> str:
+        """Queue depth and write counters as Prometheus gauges/counters."""
+        stats = self.stats()
+        label = f'{{queue="{self.name}"}}'
+        lines = [
+            "# TYPE rag_write_queue_depth gauge",
+            f"rag_write_queue_depth{label} {stats['queue_depth']}",
+            "# TYPE rag_write_queue_capacity gauge",
+            f"rag_write_queue_capacity{label} {stats['max_size']}",
+        ]
+        for counter in ("written", "failed", "batches", "inline_writes"):
+            lines.append(f"# TYPE rag_write_queue_{counter}_total counter")
+            lines.append(f"rag_write_queue_{counter}_total{label} {stats[counter]}")
+        return "\n".join(lines) + "\n"
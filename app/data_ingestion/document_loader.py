@@ -1,21 +1,55 @@
 import os
+import io
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import List
-from langchain_community.document_loaders import DirectoryLoader, TextLoader, PyPDFLoader
+from typing import Callable, List, Optional, Tuple
 from langchain.schema import Document
 from datetime import datetime
 
-def load_documents(directory_path: str) -> List[Document]:
-    """
-    using LangChain's DirectoryLoader to load all file types (currently .pdf and .txt)
-    Args:
-        directory_path (str): The path to the directory containing the documents.
-    Returns:
-        List[Document]: A list of LangChain Document objects.
-    """
-    # Ensure the directory exists
-    if not Path(directory_path).is_dir():
-        raise FileNotFoundError(f"Directory not found: {directory_path}")
+# With more than one worker, files are parsed in a process pool (PDF text extraction is
+# CPU-bound). PDFs longer than PDF_PAGES_PER_TASK pages are split into page ranges of that
+# size so one large guideline does not keep a single worker busy alone.
+DOCUMENT_LOADER_WORKERS = int(os.getenv("DOCUMENT_LOADER_WORKERS", "1"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "50"))
+
+# Currently .pdf and .txt (see _load_file)
+SUPPORTED_EXTENSIONS = (".txt", ".pdf")
+
+# Shared by all parallel loads and kept until shutdown_loader_pool(): spawning a worker
+# re-imports the loaders, which costs more than parsing a typical upload
+_loader_pool: Optional[ProcessPoolExecutor] = None
+_loader_pool_lock = threading.Lock()
+
+
+def _get_loader_pool(workers: int) -> ProcessPoolExecutor:
+    """Returns the loader process pool, creating it on first use with at least `workers` processes."""
+    global _loader_pool
+    with _loader_pool_lock:
+        if _loader_pool is None:
+            # "spawn": forking a server process that runs threads can deadlock the children
+            _loader_pool = ProcessPoolExecutor(
+                max_workers=max(workers, DOCUMENT_LOADER_WORKERS),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _loader_pool
+
+
+def shutdown_loader_pool(wait: bool = True):
+    """Stops the loader processes (at app shutdown, or to replace a broken pool)."""
+    global _loader_pool
+    with _loader_pool_lock:
+        pool, _loader_pool = _loader_pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+def _load_file(path: str) -> List[Document]:
+    """Parses a whole file with its LangChain loader."""
+    # The loaders pull in most of langchain_community; only ingestion needs them
+    from langchain_community.document_loaders import TextLoader, PyPDFLoader
 
     # Define the loader mapping for different file types
     # loader_mapping = {
@@ -28,34 +62,143 @@ def load_documents(directory_path: str) -> List[Document]:
         ".txt": TextLoader,
         ".pdf": PyPDFLoader,
     }
+    loader_class = supported_extensions[Path(path).suffix.lower()]
+    return loader_class(path).load()
 
-    loaded_documents = []
 
+def _load_pdf_pages(path: str, start: int, stop: int) -> List[Document]:
+    """
+    Parses pages [start, stop) of a PDF. The pages are copied into a small in-memory PDF
+    and parsed like a whole file, then page numbers are mapped back, so the Documents match
+    what PyPDFLoader returns for the same pages.
+    """
+    from pypdf import PdfReader, PdfWriter
+    from langchain_community.document_loaders.parsers import PyPDFParser
+    from langchain_core.documents.base import Blob
 
-    # return documents
-    print(f"Loading documents from: {directory_path}...")
+    reader = PdfReader(path)
+    writer = PdfWriter()
+    for page_number in range(start, stop):
+        writer.add_page(reader.pages[page_number])
+    writer.metadata = reader.metadata
+    buffer = io.BytesIO()
+    writer.write(buffer)
+
+    documents = list(PyPDFParser().lazy_parse(Blob.from_data(buffer.getvalue(), path=path)))
+    page_labels = reader.page_labels
+    for offset, doc in enumerate(documents):
+        page_number = start + offset
+        doc.metadata["page"] = page_number
+        doc.metadata["total_pages"] = len(reader.pages)
+        if "page_label" in doc.metadata:
+            doc.metadata["page_label"] = page_labels[page_number]
+    return documents
 
-    for file_path in Path(directory_path).rglob("*"):
-        ext = file_path.suffix.lower()
-        if ext in supported_extensions:
-            loader_class = supported_extensions[ext]
+
+def _plan_tasks(file_paths: List[Path], pages_per_task: int) -> List[Tuple[int, Callable[..., List[Document]], tuple]]:
+    """One (file index, function, args) task per file, or per page range of a large PDF."""
+    tasks = []
+    for index, file_path in enumerate(file_paths):
+        page_count = 0
+        if file_path.suffix.lower() == ".pdf" and pages_per_task > 0:
             try:
-                # Load the document(s)
-                loader = loader_class(str(file_path))
-                docs = loader.load()
+                from pypdf import PdfReader
+                page_count = len(PdfReader(str(file_path)).pages)
+            except Exception:
+                page_count = 0  # let the whole-file loader report the problem
+        if page_count > pages_per_task:
+            for start in range(0, page_count, pages_per_task):
+                tasks.append((index, _load_pdf_pages, (str(file_path), start, min(start + pages_per_task, page_count))))
+        else:
+            tasks.append((index, _load_file, (str(file_path),)))
+    return tasks
+
+
+def load_documents(
+    directory_path: str,
+    workers: Optional[int] = None,
+    pages_per_task: Optional[int] = None,
+    file_filter: Optional[Callable[[Path], bool]] = None
+) -> List[Document]:
+    """
+    using LangChain's loaders to load all supported file types (currently .pdf and .txt)
+    Args:
+        directory_path (str): The path to the directory containing the documents.
+        workers (int): Processes to parse files with (default DOCUMENT_LOADER_WORKERS; 1 loads serially).
+        pages_per_task (int): In parallel mode, PDFs longer than this are split into page ranges
+            (default PDF_PAGES_PER_TASK).
+        file_filter (callable): If given, only files for which it returns True are loaded.
+    Returns:
+        List[Document]: A list of LangChain Document objects, in file name order and page
+        order within a file, whatever the number of workers.
+    """
+    # Ensure the directory exists
+    if not Path(directory_path).is_dir():
+        raise FileNotFoundError(f"Directory not found: {directory_path}")
+
+    workers = DOCUMENT_LOADER_WORKERS if workers is None else workers
+    pages_per_task = PDF_PAGES_PER_TASK if pages_per_task is None else pages_per_task
 
-                # Inject filename into metadata
-                for doc in docs:
-                    doc.metadata["file_name"] = file_path.name
-                    doc.metadata["source"] = file_path.name  # Set source to filename, not full path
-                    doc.metadata["upload_date"] = datetime.now().isoformat()
-                    loaded_documents.append(doc)
+    print(f"Loading documents from: {directory_path}...")
 
+    file_paths = sorted(
+        path for path in Path(directory_path).rglob("*")
+        if path.suffix.lower() in SUPPORTED_EXTENSIONS and path.is_file()
+        and (file_filter is None or file_filter(path))
+    )
+    # Every document from this load gets the same upload date
+    upload_date = datetime.now().isoformat()
+
+    if workers > 1 and file_paths:
+        tasks = _plan_tasks(file_paths, pages_per_task)
+        executor = _get_loader_pool(workers)
+        try:
+            futures = [(index, executor.submit(fn, *args)) for index, fn, args in tasks]
+        except BrokenProcessPool:
+            # A worker died in an earlier load: start a fresh pool and resubmit
+            shutdown_loader_pool(wait=False)
+            executor = _get_loader_pool(workers)
+            futures = [(index, executor.submit(fn, *args)) for index, fn, args in tasks]
+        results = []
+        for index, future in futures:
+            try:
+                results.append((index, future.result(), None))
             except Exception as e:
-                print(f"Error loading {file_path.name}: {e}")
+                results.append((index, None, e))
+        if any(isinstance(error, BrokenProcessPool) for _, _, error in results):
+            shutdown_loader_pool(wait=False)
+    else:
+        results = []
+        for index, file_path in enumerate(file_paths):
+            try:
+                results.append((index, _load_file(str(file_path)), None))
+            except Exception as e:
+                results.append((index, None, e))
+
+    # Collect each file's documents; a file with any failed part is skipped as a whole
+    docs_by_file = {}
+    failed = set()
+    for index, docs, error in results:
+        if error is not None:
+            if index not in failed:
+                print(f"Error loading {file_paths[index].name}: {error}")
+            failed.add(index)
+            continue
+        docs_by_file.setdefault(index, []).extend(docs)
+
+    loaded_documents = []
+    for index, file_path in enumerate(file_paths):
+        if index in failed:
+            continue
+        # Inject filename into metadata
+        for doc in docs_by_file.get(index, []):
+            doc.metadata["file_name"] = file_path.name
+            doc.metadata["source"] = file_path.name  # Set source to filename, not full path
+            doc.metadata["upload_date"] = upload_date
+            loaded_documents.append(doc)
 
     print(f"Loaded {len(loaded_documents)} documents with filenames in metadata.")
     return loaded_documents
 
 if __name__ == "__main__":
-    loaded_docs = load_documents("/rag-app/data/raw_data")
\ No newline at end of file
+    loaded_docs = load_documents("/rag-app/data/raw_data")
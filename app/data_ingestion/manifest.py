@@ -0,0 +1,139 @@
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+# One manifest per collection records what has been ingested into it: each file's content
+# hash and, per file, the text hash and ChromaDB id of every chunk stored for it.
+INGESTION_MANIFEST_DIR = os.getenv("INGESTION_MANIFEST_DIR", "./data/ingestion_manifest")
+HASH_READ_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def content_chunk_id(source: str, chunk_hash: str) -> str:
+    """Stable ChromaDB id for a chunk: the same text from the same file always maps to the same id."""
+    return f"{source}_{chunk_hash[:32]}"
+
+
+class IngestionManifest:
+    """
+    What has been ingested into one collection, persisted as JSON:
+
+        {"files": {source: {"sha256": file hash, "chunks": {chunk text hash: chunk id}}}}
+
+    Sources are file names, as in chunk metadata. Safe to share between threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._files: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._files = json.load(f).get("files", {})
+            except Exception as e:
+                print(f"Error loading ingestion manifest {self.path}: {e}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._files)
+
+    def __contains__(self, source: str) -> bool:
+        with self._lock:
+            return source in self._files
+
+    def is_unchanged(self, source: str, sha256: str) -> bool:
+        """True if exactly these bytes were already ingested under this file name."""
+        with self._lock:
+            entry = self._files.get(source)
+            return entry is not None and entry["sha256"] == sha256
+
+    def chunk_ids(self, source: str) -> Dict[str, str]:
+        """Chunk text hash -> chunk id of everything stored for `source`."""
+        with self._lock:
+            entry = self._files.get(source)
+            return dict(entry["chunks"]) if entry else {}
+
+    def plan(self, source: str, chunk_hashes: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """
+        Compares a file's current chunk hashes with what is stored for it.
+        Returns (hashes that still need embedding and storing, ids of stored chunks that are gone).
+        """
+        stored = self.chunk_ids(source)
+        current = set(chunk_hashes)
+        new_hashes = [h for h in dict.fromkeys(chunk_hashes) if h not in stored]
+        stale_ids = [chunk_id for h, chunk_id in stored.items() if h not in current]
+        return new_hashes, stale_ids
+
+    def record_file(self, source: str, sha256: str, chunks: Dict[str, str]):
+        """Records the file's content hash and the full set of its stored chunks."""
+        with self._lock:
+            self._files[source] = {"sha256": sha256, "chunks": dict(chunks)}
+
+    def save(self):
+        """Writes the manifest atomically."""
+        with self._lock:
+            payload = json.dumps({"files": self._files})
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, self.path)
+
+
+_manifests: Dict[str, IngestionManifest] = {}
+_ingestion_locks: Dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def _manifest_path(collection_name: str) -> Path:
+    return Path(INGESTION_MANIFEST_DIR) / f"{collection_name}.json"
+
+
+def get_ingestion_manifest(collection_name: str) -> IngestionManifest:
+    """Returns the collection's manifest, loading it from disk on first use."""
+    with _registry_lock:
+        manifest = _manifests.get(collection_name)
+        if manifest is None:
+            manifest = IngestionManifest(str(_manifest_path(collection_name)))
+            _manifests[collection_name] = manifest
+        return manifest
+
+
+def ingestion_lock(collection_name: str) -> threading.Lock:
+    """
+    Lock to hold for a whole ingestion run into the collection: planning against its
+    manifest, storing, recording and deleting stale chunks must not interleave with another run.
+    """
+    with _registry_lock:
+        return _ingestion_locks.setdefault(collection_name, threading.Lock())
+
+
+def drop_ingestion_manifest(collection_name: str):
+    """Forgets and deletes the manifest of a deleted collection, so its files are ingested again."""
+    with _registry_lock:
+        _manifests.pop(collection_name, None)
+        path = _manifest_path(collection_name)
+        if path.exists():
+            path.unlink()
+
+
+def reset_ingestion_manifests():
+    """Drops all in-memory manifests (they are re-loaded from disk on next use)."""
+    with _registry_lock:
+        _manifests.clear()
@@ -1,11 +1,18 @@
-from typing import List, Dict, Any
+import os
+from typing import Callable, List, Dict, Any, Optional
 from langchain.schema import Document
 import requests
 import time
 import json
 
+from app.core import http_client
+from app.core.bulkhead import wait_for_capacity
+
 MAX_PAYLOAD_BYTES = 1_900_000  # TEI's default limit
 MAX_TEI_BATCH_ITEMS = 32 #Maximum number of chunks allowed per batch by the TEI service
+# Pause between ingestion batches. TEI load is already capped by the "tei" bulkhead, so
+# none is needed by default; set it to throttle ingestion further.
+TEI_BATCH_DELAY_SECONDS = float(os.getenv("TEI_BATCH_DELAY_SECONDS", "0"))
 
 def batch_chunks_by_payload_size_and_count(
     chunks: List[Document], 
@@ -54,10 +61,15 @@ def batch_chunks_by_payload_size_and_count(
 
     return batches
 
-def create_embeddings(chunks: List[Document], tei_service_url: str) -> List[Dict[str, Any]]:
+def create_embeddings(
+    chunks: List[Document],
+    tei_service_url: str,
+    progress: Optional[Callable[..., None]] = None
+) -> List[Dict[str, Any]]:
     """
     Generates embeddings for a list of LangChain Document objects using the TEI service.
     Batches the requests to avoid payload size and item count errors.
+    If given, `progress("embed", batches=..., chunks=...)` is called after each batch.
     
     Returns a list of dictionaries, each containing 'text', 'metadata', and 'embedding'.
     """
@@ -78,12 +90,15 @@ def create_embeddings(chunks: List[Document], tei_service_url: str) -> List[Dict
         payload = {"inputs": texts_to_embed}
 
         try:
-            response = requests.post(
-                f"{tei_service_url}/embed",
-                headers=headers,
-                data=json.dumps(payload),
-                timeout=300
-            )
+            # Ingestion queues for a TEI slot instead of being rejected like interactive queries
+            with wait_for_capacity():
+                response = http_client.post(
+                    "tei",
+                    f"{tei_service_url}/embed",
+                    headers=headers,
+                    data=json.dumps(payload),
+                    timeout=300
+                )
             response.raise_for_status() 
             embeddings = response.json()
 
@@ -114,8 +129,37 @@ def create_embeddings(chunks: List[Document], tei_service_url: str) -> List[Dict
         except Exception as e:
             print(f"An unexpected error occurred in batch {batch_num}: {e}")
 
-        time.sleep(0.5) 
+        if progress is not None:
+            progress("embed", batches=batch_num + 1, chunks=len(all_embeddings))
+        if TEI_BATCH_DELAY_SECONDS and batch_num < len(batches) - 1:
+            time.sleep(TEI_BATCH_DELAY_SECONDS)
 
     print(f"Ingestion pipeline complete. Generated {len(all_embeddings)} embeddings.")
     return all_embeddings
 
+
+def embed_texts(texts: List[str], tei_service_url: str, timeout: Optional[float] = None) -> List[List[float]]:
+    """
+    Embeds raw strings (e.g. retrieval queries) in a single call to the TEI service.
+    Uses the same /embed endpoint as ingestion so queries and stored chunks share a vector space.
+    Inputs longer than the model's window are truncated by TEI rather than rejected.
+
+    Raises on HTTP or format errors so callers can decide how to fall back.
+    """
+    if not texts:
+        return []
+
+    response = http_client.post(
+        "tei",
+        f"{tei_service_url}/embed",
+        headers={"Content-Type": "application/json"},
+        data=json.dumps({"inputs": texts, "truncate": True}),
+        timeout=timeout
+    )
+    response.raise_for_status()
+    embeddings = response.json()
+
+    if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+        raise ValueError("TEI service returned an unexpected format for embeddings.")
+    return embeddings
+
@@ -1,24 +1,44 @@
-from typing import List, Dict, Any
+import os
+from typing import Callable, List, Dict, Any, Optional
 import chromadb
 from chromadb.utils import embedding_functions
 from  datetime import datetime
 
+from app.core.bulkhead import get_bulkhead, wait_for_capacity
+from app.data_ingestion.manifest import content_chunk_id
+from app.retrieval.catalog import invalidate_collection_catalog
+from app.retrieval.lexical import index_chunks_lexically, remove_chunks_lexically
+
+# The collection user uploads are ingested into, listed and deleted from. Ingestion
+# manifests and BM25 indexes are keyed by the same name, so resolve it only here.
+USER_UPLOAD_COLLECTION = os.getenv("CHROMA_COLLECTION_NAME") or "documents"
+
+
+def _get_collection(chroma_service_url: str, collection_name: str):
+    client = chromadb.HttpClient(host=chroma_service_url.replace("http://", "").split(":")[0], port=8000)
+    return client.get_or_create_collection(name=collection_name)
+
 def store_chunks_in_chroma(
     embedded_chunks: List[Dict[str, Any]],
     chroma_service_url: str,
-    collection_name: str = "rag_documents"
+    collection_name: str = USER_UPLOAD_COLLECTION,
+    progress: Optional[Callable[..., None]] = None,
+    persist_lexical: bool = True
 ):
     """
     Stores embedded chunks in a ChromaDB collection.
+    Chunks with a "chunk_hash" in their metadata get a content-derived id, so storing the
+    same chunk again updates it in place instead of duplicating it.
+    If given, `progress("store", chunks=...)` is called once the chunks are stored.
+    Set `persist_lexical` to False when storing in several calls and call
+    `save_lexical_index` once at the end.
+    Returns the number of chunks stored (0 if storing failed).
     """
     print(f"Connecting to ChromaDB at {chroma_service_url} and storing chunks...")
 
     try:
-        # Connect to ChromaDB 
-        client = chromadb.HttpClient(host=chroma_service_url.replace("http://", "").split(":")[0], port=8000)
-
-        # Get or create the collection
-        collection = client.get_or_create_collection(name=collection_name)
+        # Connect to ChromaDB and get or create the collection
+        collection = _get_collection(chroma_service_url, collection_name)
 
         # Prepare data for ChromaDB
         ids = []
@@ -28,7 +48,8 @@ def store_chunks_in_chroma(
 
         for i, item in enumerate(embedded_chunks):
             source = item["metadata"].get("source", "unknown_source")
-            chunk_id = f"{source}_chunk_{i}"
+            chunk_hash = item["metadata"].get("chunk_hash")
+            chunk_id = content_chunk_id(source, chunk_hash) if chunk_hash else f"{source}_chunk_{i}"
 
             # Ensure upload_date exists in metadata
             if "upload_date" not in item["metadata"]:
@@ -42,16 +63,69 @@ def store_chunks_in_chroma(
         #print("CHUNK IDS:", ids)
         print("METADATAS:", metadatas)
         
-        # Add to ChromaDB
-        collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            embeddings=embeddings,
-            ids=ids
-        )
+        # Upsert into ChromaDB (add would leave existing ids untouched), queueing behind
+        # retrieval queries for a Chroma slot
+        with wait_for_capacity(), get_bulkhead("chroma").limit():
+            collection.upsert(
+                documents=documents,
+                metadatas=metadatas,
+                embeddings=embeddings,
+                ids=ids
+            )
         print(f"Successfully added {len(embedded_chunks)} chunks to ChromaDB collection '{collection_name}'.")
+        if progress is not None:
+            progress("store", chunks=len(embedded_chunks))
+        # Keep the BM25 side index in step with the collection
+        index_chunks_lexically(collection_name, ids, documents, persist=persist_lexical)
+        # The collection may have just been created
+        invalidate_collection_catalog()
+        return len(embedded_chunks)
 
     except Exception as e:
         print(f"Error storing chunks in ChromaDB: {e}")
+        return 0
+
+
+def find_legacy_chunk_ids(source: str, chroma_service_url: str, collection_name: str = USER_UPLOAD_COLLECTION) -> List[str]:
+    """
+    Ids of the chunks stored for `source` under the positional `{source}_chunk_{i}` ids used
+    before ids were content-derived. Returns [] if the lookup fails.
+    """
+    prefix = f"{source}_chunk_"
+    try:
+        collection = _get_collection(chroma_service_url, collection_name)
+        with wait_for_capacity(), get_bulkhead("chroma").limit():
+            result = collection.get(where={"source": source}, include=[])
+        return [chunk_id for chunk_id in result["ids"] if chunk_id.startswith(prefix) and chunk_id[len(prefix):].isdigit()]
+    except Exception as e:
+        print(f"Error looking up legacy chunk ids for '{source}': {e}")
+        return []
+
+
+def delete_chunks_from_chroma(
+    ids: List[str],
+    chroma_service_url: str,
+    collection_name: str = USER_UPLOAD_COLLECTION,
+    persist_lexical: bool = True
+) -> int:
+    """
+    Deletes chunks by id from a ChromaDB collection and its BM25 side index
+    (see `store_chunks_in_chroma` for `persist_lexical`).
+    Returns the number of ids deleted (0 if deleting failed).
+    """
+    if not ids:
+        return 0
+    try:
+        collection = _get_collection(chroma_service_url, collection_name)
+        with wait_for_capacity(), get_bulkhead("chroma").limit():
+            collection.delete(ids=ids)
+        remove_chunks_lexically(collection_name, ids, persist=persist_lexical)
+        # Retrievals cached before the delete may still hold these chunks
+        invalidate_collection_catalog()
+        print(f"Deleted {len(ids)} stale chunks from ChromaDB collection '{collection_name}'.")
+        return len(ids)
+    except Exception as e:
+        print(f"Error deleting chunks from ChromaDB: {e}")
+        return 0
 
         
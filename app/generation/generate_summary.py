@@ -1,49 +1,62 @@
+import os
+import time
 import requests
 import json
-from typing import List, Dict, Any, Optional
-from scripts.save_summary import save_summary_to_db
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from scripts.save_summary import save_summaries_batch_to_db
 import uuid
 
-def generate_summary(
-    transcribed_conversation: str,
-    relevant_knowledge_chunks: List[Dict[str, Any]],
-    tgi_service_url: str,
-    max_new_tokens: int = 2000,
-    temperature: float = 0.2,
-    additional_content: Optional[str] = None,
-    summary_title: Optional[str] = None 
-) -> str:
-    """
-    Generates a templated clinical summary using the TGI service (Med 42 LLM).
+from app.core import http_client
+from app.core.bulkhead import BulkheadFull, get_bulkhead, wait_for_capacity
+from app.core.metrics import record_stage, stage_timer
+from app.core.write_behind import WriteBehindQueue
+from app.generation.prompt_builder import (
+    PromptTooLongError,
+    count_tokens,
+    fit_chunks_to_budget,
+    input_token_budget,
+)
 
-    Args:
-        relevant_chunks (List[Dict[str, Any]]): A list of dictionaries, where each dictionary
-                                                represents a retrieved chunk with 'page_content'.
-        query (str): The original user query.
-        tgi_service_url (str): The URL of the TGI service (e.g., "http://tgi_service:8080").
-        max_new_tokens (int): The maximum number of tokens to generate in the summary.
-        temperature (float): Controls the randomness of the generation. Lower values make it more deterministic.
 
-    Returns:
-        str: The generated clinical summary, or an empty string if generation fails.
-    """
-    if not transcribed_conversation.strip():
-        return "No transcribed conversation provided to generate a summary."
+# Section headings of the H&P template, in output order (must match the TEMPLATE in the prompt)
+HP_SECTIONS = [
+    "Presenting Complaint",
+    "History of Presenting Complaint",
+    "Review of Systems",
+    "Past Medical History",
+    "Past Surgical History",
+    "Drug History",
+    "Family History",
+    "Social History",
+    "Observation",
+    "Assessment",
+    "Clinical Impression/Differential Diagnosis",
+    "Plan of Action",
+]
+MISSING_SECTION_TEXT = "Information not provided."
 
-    # Clean and join the relevant chunks
-    context_chunks = [chunk.get("page_content", "").strip() for chunk in relevant_knowledge_chunks if chunk.get("page_content")]
-    if context_chunks:
-        context = "---Relevant Clinical Guidelines/Knowledge---\n"
-        context += "\n".join(context_chunks)
-        context += "\n---End Relevant Clinical Guidelines/Knowledge---"
-    else:
-        context = "No specific external clinical guidelines were returned."
-
-    extra_notes = ""
-    if additional_content and additional_content.strip():
-        extra_notes = f"\n\n**Additional User Notes:**\n{additional_content.strip()}\n"
 
-    
+def _write_summaries(summaries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Nobody waits on these writes, so queue for a database slot rather than fail
+    with wait_for_capacity(), get_bulkhead("postgres").limit():
+        return save_summaries_batch_to_db(summaries)
+
+
+# Generated summaries are saved off the request path, in batched transactions
+summary_writer = WriteBehindQueue(
+    _write_summaries,
+    max_size=int(os.getenv("SUMMARY_WRITE_QUEUE_SIZE", "1000")),
+    batch_size=int(os.getenv("SUMMARY_WRITE_BATCH_SIZE", "50")),
+    key="id",
+    name="summary_writer",
+)
+
+CONTEXT_HEADER = "---Relevant Clinical Guidelines/Knowledge---\n"
+CONTEXT_FOOTER = "\n---End Relevant Clinical Guidelines/Knowledge---"
+NO_CONTEXT = "No specific external clinical guidelines were returned."
+
+
+def _render_summary_prompt(transcribed_conversation: str, context: str, extra_notes: str) -> str:
     prompt = f"""
          ### Instruction
         I am a medical doctor and you specialize in medical summarization. Your task is to generate a concise, templated History and Physical (H&P) clinical summary based on the provided patient-doctor conversation (transcribed_conversation) and
@@ -91,8 +104,108 @@ def generate_summary(
         Generate the clinical summary following the exact template and formatting instructions. Do not make up any information.
         If there is no relevant information for a section, you MUST output the section title (bolded) followed by "Information not provided.".
         """
-    headers = {"Content-Type": "application/json"}
-    payload = {
+    return prompt
+
+
+def _format_context(context_chunks: List[str]) -> str:
+    if not context_chunks:
+        return NO_CONTEXT
+    return CONTEXT_HEADER + "\n".join(context_chunks) + CONTEXT_FOOTER
+
+
+def _format_notes(additional_content: Optional[str]) -> str:
+    if additional_content and additional_content.strip():
+        return f"\n\n**Additional User Notes:**\n{additional_content.strip()}\n"
+    return ""
+
+
+def _fixed_prompt_usage(transcribed_conversation: str, extra_notes: str) -> Dict[str, int]:
+    """Tokens used by the parts of the prompt that are never trimmed."""
+    return {
+        "instructions": count_tokens(_render_summary_prompt("", "", "")),
+        "transcript": count_tokens(transcribed_conversation),
+        "notes": count_tokens(extra_notes),
+    }
+
+
+def summary_prompt_fits(
+    transcribed_conversation: str,
+    additional_content: Optional[str] = None,
+    max_new_tokens: int = 2000
+) -> bool:
+    """Whether the transcript and notes fit a single summary prompt (with no retrieved context)."""
+    usage = _fixed_prompt_usage(transcribed_conversation, _format_notes(additional_content))
+    return sum(usage.values()) <= input_token_budget(max_new_tokens)
+
+
+def build_summary_prompt_with_usage(
+    transcribed_conversation: str,
+    relevant_knowledge_chunks: List[Dict[str, Any]],
+    additional_content: Optional[str] = None,
+    max_new_tokens: int = 2000
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Builds the H&P summary prompt within TGI's token limits.
+
+    `max_new_tokens` is reserved for the output first. The instructions, transcript and
+    user notes are always included in full; the remaining space is filled with the
+    retrieved chunks in rank order, trimming the last one that partly fits and
+    dropping the rest (see `fit_chunks_to_budget`).
+
+    Returns:
+        Tuple[str, Dict[str, int]]: The prompt and the tokens used per section, plus
+                                    the budget and how many chunks were used/trimmed/dropped.
+
+    Raises:
+        PromptTooLongError: If the instructions, transcript and notes alone exceed the budget.
+    """
+    budget = input_token_budget(max_new_tokens)
+    extra_notes = _format_notes(additional_content)
+    usage = _fixed_prompt_usage(transcribed_conversation, extra_notes)
+    fixed_tokens = usage["instructions"] + usage["transcript"] + usage["notes"]
+    if fixed_tokens > budget:
+        raise PromptTooLongError(
+            f"Transcript and instructions need {fixed_tokens} tokens but only {budget} are available "
+            f"with {max_new_tokens} reserved for the summary."
+        )
+
+    # Clean the relevant chunks and keep as many as fit, best first
+    context_chunks = [chunk.get("page_content", "").strip() for chunk in relevant_knowledge_chunks if chunk.get("page_content")]
+    context_budget = budget - fixed_tokens - count_tokens(CONTEXT_HEADER) - count_tokens(CONTEXT_FOOTER)
+    context_chunks, fit = fit_chunks_to_budget(context_chunks, context_budget)
+    context = _format_context(context_chunks)
+
+    prompt = _render_summary_prompt(transcribed_conversation, context, extra_notes)
+    usage.update({
+        "context": count_tokens(context),
+        "total": count_tokens(prompt),
+        "budget": budget,
+        "max_new_tokens": max_new_tokens,
+        "chunks_used": fit["chunks_used"],
+        "chunks_trimmed": fit["chunks_trimmed"],
+        "chunks_dropped": fit["chunks_dropped"],
+    })
+    return prompt, usage
+
+
+def build_summary_prompt(
+    transcribed_conversation: str,
+    relevant_knowledge_chunks: List[Dict[str, Any]],
+    additional_content: Optional[str] = None,
+    max_new_tokens: int = 2000
+) -> str:
+    """
+    Builds the H&P summary prompt sent to TGI from the conversation, the retrieved
+    chunks and any additional user notes. See `build_summary_prompt_with_usage`.
+    """
+    prompt, _ = build_summary_prompt_with_usage(
+        transcribed_conversation, relevant_knowledge_chunks, additional_content, max_new_tokens
+    )
+    return prompt
+
+
+def _tgi_payload(prompt: str, max_new_tokens: int, temperature: float) -> Dict[str, Any]:
+    return {
         "inputs": prompt,
         "parameters": {
             "max_new_tokens": max_new_tokens,
@@ -102,10 +215,75 @@ def generate_summary(
         }
     }
 
+
+def _persist_summary(
+    generated_text: str,
+    summary_title: Optional[str] = None,
+    summary_id: Optional[str] = None
+) -> str:
+    """
+    Queues a generated summary for the summaries store and returns its id right away.
+    The row is written by `summary_writer` shortly after.
+    """
+    summary_id = summary_id or str(uuid.uuid4())
+    summary_data = {
+        'id': summary_id,
+        'title': summary_title or 'Clinical Summary',
+        'content': generated_text
+    }
+    with stage_timer("generate.save"):
+        summary_writer.submit(summary_data)
+    return summary_id
+
+
+def generate_summary(
+    transcribed_conversation: str,
+    relevant_knowledge_chunks: List[Dict[str, Any]],
+    tgi_service_url: str,
+    max_new_tokens: int = 2000,
+    temperature: float = 0.2,
+    additional_content: Optional[str] = None,
+    summary_title: Optional[str] = None,
+    summary_id: Optional[str] = None
+) -> str:
+    """
+    Generates a templated clinical summary using the TGI service (Med 42 LLM).
+
+    Args:
+        relevant_chunks (List[Dict[str, Any]]): A list of dictionaries, where each dictionary
+                                                represents a retrieved chunk with 'page_content'.
+        query (str): The original user query.
+        tgi_service_url (str): The URL of the TGI service (e.g., "http://tgi_service:8080").
+        max_new_tokens (int): The maximum number of tokens to generate in the summary.
+        temperature (float): Controls the randomness of the generation. Lower values make it more deterministic.
+        summary_id (str, optional): Id to save the summary under; a new UUID if not given.
+
+    Returns:
+        str: The generated clinical summary, or an empty string if generation fails.
+
+    Raises:
+        BulkheadFull: If TGI is already at its concurrency limit and wait queue.
+    """
+    if not transcribed_conversation.strip():
+        return "No transcribed conversation provided to generate a summary."
+
+    try:
+        with stage_timer("generate.prompt"):
+            prompt, usage = build_summary_prompt_with_usage(
+                transcribed_conversation, relevant_knowledge_chunks, additional_content, max_new_tokens
+            )
+    except PromptTooLongError as e:
+        print(f"Cannot generate summary: {e}")
+        return ""
+    print(f"Prompt token usage: {usage}")
+    headers = {"Content-Type": "application/json"}
+    payload = _tgi_payload(prompt, max_new_tokens, temperature)
+
     try:
         print(f"Sending request to TGI URL: {tgi_service_url}/generate")
         print(f"Payload being sent: {json.dumps(payload, indent=2)}")
-        response = requests.post(f"{tgi_service_url}/generate", headers=headers, data=json.dumps(payload))
+        with stage_timer("generate.tgi"):
+            response = http_client.post("tgi", f"{tgi_service_url}/generate", headers=headers, data=json.dumps(payload))
         
         print(f"TGI Response Status Code: {response.status_code}")
         #print(f"TGI Raw Response Text: {response.text}")
@@ -117,19 +295,16 @@ def generate_summary(
         if isinstance(response_data, dict) and 'generated_text' in response_data:
             # TGI typically returns a list of results, each with 'generated_text'
             generated_text = response_data["generated_text"]
-            summary_id = str(uuid.uuid4())
-            summary_data = {
-                'id': summary_id,
-                'title': summary_title or 'Clinical Summary',
-                'content': generated_text
-            }
-            save_summary_to_db(summary_data)
+            _persist_summary(generated_text, summary_title, summary_id)
             return generated_text
         else:
             print("TGI service returned an unexpected response format.")
             print(f"Full JSON response: {json.dumps(response_data, indent=2)}")
             return ""
 
+    except BulkheadFull:
+        # Admission control: let the API answer 429 instead of an empty summary
+        raise
     except requests.exceptions.RequestException as e:
         print(f"Error communicating with TGI service: {e}")
         return ""
@@ -139,3 +314,71 @@ def generate_summary(
     except Exception as e:
         print(f"An unexpected error occurred during summary generation: {e}")
         return ""
+
+
+def stream_summary(
+    transcribed_conversation: str,
+    relevant_knowledge_chunks: List[Dict[str, Any]],
+    tgi_service_url: str,
+    max_new_tokens: int = 2000,
+    temperature: float = 0.2,
+    additional_content: Optional[str] = None,
+    summary_title: Optional[str] = None,
+    summary_id: Optional[str] = None
+) -> Iterator[str]:
+    """
+    Streaming variant of `generate_summary` backed by TGI's /generate_stream.
+
+    Yields the summary text token by token as TGI produces it. Once the stream completes
+    the full text is saved through the summaries store, just like `generate_summary`;
+    a stream that is abandoned part-way (e.g. the client disconnected) is not saved.
+
+    Raises:
+        requests.exceptions.RequestException: If TGI cannot be reached or returns an error.
+        BulkheadFull: If TGI is already at its concurrency limit and wait queue.
+        ValueError: If TGI reports an error inside the stream.
+        PromptTooLongError: If the transcript does not fit the input budget.
+    """
+    if not transcribed_conversation.strip():
+        yield "No transcribed conversation provided to generate a summary."
+        return
+
+    with stage_timer("generate.prompt"):
+        prompt, usage = build_summary_prompt_with_usage(
+            transcribed_conversation, relevant_knowledge_chunks, additional_content, max_new_tokens
+        )
+    print(f"Prompt token usage: {usage}")
+    headers = {"Content-Type": "application/json", "Accept": "text/event-stream"}
+    payload = _tgi_payload(prompt, max_new_tokens, temperature)
+
+    print(f"Streaming from TGI URL: {tgi_service_url}/generate_stream")
+    start = time.perf_counter()
+    first_token = True
+    tokens = []
+    generated_text = None
+    with get_bulkhead("tgi").limit(), http_client.post(
+        "tgi", f"{tgi_service_url}/generate_stream", headers=headers, data=json.dumps(payload), stream=True
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            # TGI sends one server-sent event per token: "data:{...}"
+            if not line or not line.startswith("data:"):
+                continue
+            event = json.loads(line[len("data:"):])
+            if event.get("error"):
+                raise ValueError(f"TGI stream error: {event['error']}")
+
+            token = event.get("token") or {}
+            if token.get("text") and not token.get("special"):
+                if first_token:
+                    record_stage("generate.tgi_first_token", time.perf_counter() - start)
+                    first_token = False
+                tokens.append(token["text"])
+                yield token["text"]
+            if event.get("generated_text") is not None:
+                generated_text = event["generated_text"]
+    record_stage("generate.tgi_stream", time.perf_counter() - start)
+
+    if generated_text is None:
+        generated_text = "".join(tokens)
+    _persist_summary(generated_text, summary_title, summary_id)
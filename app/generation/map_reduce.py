@@ -0,0 +1,168 @@
+import os
+import json
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from app.core import http_client
+from app.core.bulkhead import BulkheadFull
+from app.core.metrics import stage_timer
+from app.generation.generate_summary import generate_summary, summary_prompt_fits, _tgi_payload
+from app.generation.prompt_builder import count_tokens, truncate_to_tokens, CHARS_PER_TOKEN
+
+# Transcripts that do not fit a single summary prompt are summarized in two steps: clinical facts
+# are extracted from each segment concurrently (map), then one H&P summary is written from the
+# merged facts (reduce). Wall-clock time is bounded by the slowest segment.
+MAP_SEGMENT_TOKENS = int(os.getenv("MAP_SEGMENT_TOKENS", "3000"))
+FACTS_MAX_NEW_TOKENS = int(os.getenv("FACTS_MAX_NEW_TOKENS", "512"))
+MAX_MAP_WORKERS = int(os.getenv("MAX_MAP_WORKERS", "8"))
+MAX_REDUCE_ROUNDS = 2  # merged facts that are still too long are condensed once more
+
+_map_executor = ThreadPoolExecutor(max_workers=MAX_MAP_WORKERS, thread_name_prefix="map-segment")
+
+
+def split_transcript_into_segments(text: str, max_tokens: int = MAP_SEGMENT_TOKENS) -> List[str]:
+    """
+    Splits a transcript into segments of at most `max_tokens` tokens, breaking between
+    lines (speaker turns) where possible. A single line longer than a segment is cut by tokens.
+    """
+    segments: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        tokens = count_tokens(line) + 1
+        if current and current_tokens + tokens > max_tokens:
+            segments.append("\n".join(current))
+            current, current_tokens = [], 0
+        if tokens <= max_tokens:
+            current.append(line)
+            current_tokens += tokens
+            continue
+
+        rest = line
+        while rest:
+            piece = truncate_to_tokens(rest, max_tokens)
+            if not piece or not rest.startswith(piece):
+                piece = rest[:max_tokens * CHARS_PER_TOKEN]
+            segments.append(piece)
+            rest = rest[len(piece):].strip()
+
+    if current:
+        segments.append("\n".join(current))
+    return segments
+
+
+def build_fact_extraction_prompt(segment: str, part: int, total_parts: int) -> str:
+    return f"""
+        ### Instruction
+        I am a medical doctor and you specialize in medical summarization. Below is part {part} of {total_parts} of a transcribed patient-doctor conversation.
+        Extract every clinically relevant fact stated in this part as concise bullet points: presenting complaint and its history, review of systems,
+        past medical and surgical history, medications and allergies, family and social history, observations, assessments and plans discussed.
+        Do not make up any information. If this part contains no clinical information, output: "No clinical facts."
+        ###
+
+        **Patient Doctor Conversation (part {part} of {total_parts}):**
+        {segment}
+
+        **Clinical facts:**
+        """
+
+
+def extract_segment_facts(segment: str, part: int, total_parts: int, tgi_service_url: str) -> str:
+    """Extracts the clinical facts of one transcript segment with a deterministic TGI call."""
+    payload = _tgi_payload(build_fact_extraction_prompt(segment, part, total_parts), FACTS_MAX_NEW_TOKENS, 0.0)
+    with stage_timer("generate.map_segment"):
+        response = http_client.post(
+            "tgi",
+            f"{tgi_service_url}/generate",
+            headers={"Content-Type": "application/json"},
+            data=json.dumps(payload)
+        )
+    response.raise_for_status()
+    response_data = response.json()
+    if not isinstance(response_data, dict) or "generated_text" not in response_data:
+        raise ValueError("TGI service returned an unexpected response format.")
+    return response_data["generated_text"].strip()
+
+
+def _map_segments(segments: List[str], tgi_service_url: str) -> Optional[str]:
+    """Runs fact extraction for all segments concurrently and merges the facts in transcript order."""
+    futures = [
+        _map_executor.submit(
+            contextvars.copy_context().run, extract_segment_facts, segment, i + 1, len(segments), tgi_service_url
+        )
+        for i, segment in enumerate(segments)
+    ]
+
+    facts = []
+    for i, future in enumerate(futures):
+        try:
+            facts.append(f"Part {i + 1}:\n{future.result()}")
+        except BulkheadFull:
+            raise
+        except Exception as e:
+            # HTTP deadlines bound each call, so a failed part cannot stall the others
+            print(f"Error extracting facts from part {i + 1} of {len(segments)}: {e}. Skipping it.")
+
+    if not facts:
+        return None
+    if len(facts) < len(segments):
+        facts.append("Note: some parts of the conversation could not be processed.")
+    return "\n\n".join(facts)
+
+
+def extract_transcript_facts(
+    transcribed_conversation: str,
+    tgi_service_url: str,
+    additional_content: Optional[str] = None,
+    max_new_tokens: int = 2000
+) -> Optional[str]:
+    """
+    Condenses a transcript that is too long for one summary prompt into merged clinical facts
+    that fit it. Returns None if no segment could be processed.
+    """
+    text = transcribed_conversation
+    for round_number in range(1, MAX_REDUCE_ROUNDS + 1):
+        segments = split_transcript_into_segments(text)
+        print(f"Map-reduce round {round_number}: extracting facts from {len(segments)} segments concurrently...")
+        text = _map_segments(segments, tgi_service_url)
+        if text is None:
+            return None
+        if summary_prompt_fits(text, additional_content, max_new_tokens):
+            break
+    return "Clinical facts extracted from a long patient-doctor conversation, in order:\n" + text
+
+
+def map_reduce_summary(
+    transcribed_conversation: str,
+    relevant_knowledge_chunks: List[Dict[str, Any]],
+    tgi_service_url: str,
+    max_new_tokens: int = 2000,
+    temperature: float = 0.2,
+    additional_content: Optional[str] = None,
+    summary_title: Optional[str] = None,
+    summary_id: Optional[str] = None
+) -> str:
+    """
+    Long-transcript variant of `generate_summary`: extracts facts per segment concurrently,
+    then generates (and saves) the templated H&P summary from the merged facts plus the
+    retrieved context. Returns an empty string if generation fails.
+    """
+    facts = extract_transcript_facts(transcribed_conversation, tgi_service_url, additional_content, max_new_tokens)
+    if facts is None:
+        print("Failed to extract facts from the conversation.")
+        return ""
+
+    return generate_summary(
+        facts,
+        relevant_knowledge_chunks,
+        tgi_service_url,
+        max_new_tokens=max_new_tokens,
+        temperature=temperature,
+        additional_content=additional_content,
+        summary_title=summary_title,
+        summary_id=summary_id,
+    )
@@ -0,0 +1,95 @@
+import os
+import math
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple
+
+# TGI's limits (see tgi_service in docker-compose.yml). A prompt plus max_new_tokens must fit
+# MAX_TOTAL_TOKENS, and the prompt alone must fit MAX_INPUT_TOKENS.
+MAX_INPUT_TOKENS = int(os.getenv("MAX_INPUT_TOKENS", "6000"))
+MAX_TOTAL_TOKENS = int(os.getenv("MAX_TOTAL_TOKENS", "8000"))
+# Headroom for the difference between our tokenizer and the model's own
+PROMPT_SAFETY_MARGIN_TOKENS = int(os.getenv("PROMPT_SAFETY_MARGIN_TOKENS", "64"))
+# A chunk that would be cut below this many tokens is dropped instead of trimmed
+MIN_TRIMMED_CHUNK_TOKENS = 64
+CHARS_PER_TOKEN = 4  # fallback estimate when no tokenizer is available
+
+
+class PromptTooLongError(ValueError):
+    """Raised when the fixed parts of a prompt (instructions, transcript, notes) exceed the input budget."""
+
+
+@lru_cache(maxsize=1)
+def get_tokenizer():
+    """
+    Returns the cl100k_base encoding (the same one used for chunking), loaded once per process.
+    Llama 3's vocabulary extends it, so its counts are a close upper bound for Med42.
+    Returns None if tiktoken or its encoding file is unavailable; counts are then estimated.
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"Tokenizer unavailable, estimating tokens as {CHARS_PER_TOKEN} characters each: {e}")
+        return None
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Counts tokens in `text`. Cached, since the same knowledge chunks recur across requests."""
+    encoder = get_tokenizer()
+    if encoder is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts `text` down to at most `max_tokens` tokens."""
+    if max_tokens <= 0:
+        return ""
+    encoder = get_tokenizer()
+    if encoder is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoder.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoder.decode(tokens[:max_tokens])
+
+
+def input_token_budget(max_new_tokens: int) -> int:
+    """Tokens available for the prompt once `max_new_tokens` is reserved for the output."""
+    return min(MAX_INPUT_TOKENS, MAX_TOTAL_TOKENS - max_new_tokens) - PROMPT_SAFETY_MARGIN_TOKENS
+
+
+def fit_chunks_to_budget(
+    chunk_texts: List[str],
+    budget_tokens: int,
+    min_chunk_tokens: int = MIN_TRIMMED_CHUNK_TOKENS
+) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Keeps chunks in rank order until `budget_tokens` is used up. The first chunk that does
+    not fit is trimmed to the remaining space (or dropped if that is too little to be useful),
+    and every chunk after it is dropped.
+
+    Returns the kept chunk texts and counts of used, trimmed and dropped chunks and tokens.
+    """
+    kept: List[str] = []
+    used_tokens = 0
+    trimmed = 0
+    for i, text in enumerate(chunk_texts):
+        tokens = count_tokens(text) + 1  # joined with a newline
+        remaining = budget_tokens - used_tokens
+        if tokens <= remaining:
+            kept.append(text)
+            used_tokens += tokens
+            continue
+        if remaining - 1 >= min_chunk_tokens:
+            partial = truncate_to_tokens(text, remaining - 1)
+            kept.append(partial)
+            used_tokens += count_tokens(partial) + 1
+            trimmed = 1
+        break
+
+    return kept, {
+        "chunks_used": len(kept),
+        "chunks_trimmed": trimmed,
+        "chunks_dropped": len(chunk_texts) - len(kept),
+        "tokens": used_tokens,
+    }
@@ -0,0 +1,159 @@
+import os
+import re
+import json
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from app.core import http_client
+from app.core.bulkhead import BulkheadFull
+from app.core.metrics import stage_timer
+from app.generation.generate_summary import (
+    HP_SECTIONS,
+    MISSING_SECTION_TEXT,
+    PromptTooLongError,
+    build_summary_prompt_with_usage,
+    generate_summary,
+    _persist_summary,
+    _tgi_payload,
+)
+from app.generation.prompt_builder import count_tokens
+
+# Decode time dominates a one-pass H&P summary. In "sections" mode each group of sections is
+# generated by its own TGI request; TGI batches them, so latency approaches the longest group.
+SECTION_GROUPS: List[List[str]] = [
+    ["Presenting Complaint", "History of Presenting Complaint", "Review of Systems"],
+    ["Past Medical History", "Past Surgical History", "Drug History"],
+    ["Family History", "Social History", "Observation"],
+    ["Assessment", "Clinical Impression/Differential Diagnosis", "Plan of Action"],
+]
+SECTION_GROUP_MAX_NEW_TOKENS = int(os.getenv("SECTION_GROUP_MAX_NEW_TOKENS", "700"))
+
+_section_executor = ThreadPoolExecutor(max_workers=len(SECTION_GROUPS) * 4, thread_name_prefix="section-group")
+
+_HEADING_PATTERN = re.compile(
+    r"\*\*\s*(" + "|".join(re.escape(section) for section in HP_SECTIONS) + r")\s*:\s*\*\*",
+    re.IGNORECASE,
+)
+_CANONICAL_SECTIONS = {section.lower(): section for section in HP_SECTIONS}
+
+
+def _group_suffix(sections: List[str]) -> str:
+    headings = "\n".join(f"            **{section}:**" for section in sections)
+    return f"""
+        For this response, output ONLY the following sections, in this order, and nothing else:
+{headings}
+        """
+
+
+def parse_sections(text: str) -> Dict[str, str]:
+    """Splits generated text on the template's bold headings. Returns {section: content}."""
+    matches = list(_HEADING_PATTERN.finditer(text))
+    sections = {}
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        section = _CANONICAL_SECTIONS[match.group(1).lower()]
+        content = text[match.end():end].strip()
+        if section not in sections or not sections[section]:
+            sections[section] = content
+    return sections
+
+
+def stitch_sections(sections: Dict[str, str]) -> str:
+    """Renders sections in template order with bold headings, filling gaps with MISSING_SECTION_TEXT."""
+    return "\n\n".join(f"**{section}:** {sections.get(section) or MISSING_SECTION_TEXT}" for section in HP_SECTIONS)
+
+
+def _generate_group(prompt: str, group_index: int, tgi_service_url: str, temperature: float) -> str:
+    payload = _tgi_payload(prompt, SECTION_GROUP_MAX_NEW_TOKENS, temperature)
+    with stage_timer("generate.section_group"):
+        response = http_client.post(
+            "tgi",
+            f"{tgi_service_url}/generate",
+            headers={"Content-Type": "application/json"},
+            data=json.dumps(payload)
+        )
+    response.raise_for_status()
+    response_data = response.json()
+    if not isinstance(response_data, dict) or "generated_text" not in response_data:
+        raise ValueError(f"TGI service returned an unexpected response format for section group {group_index}.")
+    return response_data["generated_text"]
+
+
+def section_parallel_summary(
+    transcribed_conversation: str,
+    relevant_knowledge_chunks: List[Dict[str, Any]],
+    tgi_service_url: str,
+    max_new_tokens: int = 2000,
+    temperature: float = 0.2,
+    additional_content: Optional[str] = None,
+    summary_title: Optional[str] = None,
+    summary_id: Optional[str] = None
+) -> str:
+    """
+    Section-parallel variant of `generate_summary`.
+
+    Every section group (SECTION_GROUPS) is requested concurrently with the same prompt,
+    extended only by a short trailing instruction naming the group's sections, so the
+    requests share their whole prefix. The outputs are stitched back into the full template
+    in order, with "Information not provided." for any section the model left out, and saved.
+
+    If any group fails, falls back to a single `generate_summary` call. `max_new_tokens` is
+    only used by that fallback; each group is limited to SECTION_GROUP_MAX_NEW_TOKENS.
+    """
+    if not transcribed_conversation.strip():
+        return "No transcribed conversation provided to generate a summary."
+
+    suffixes = [_group_suffix(group) for group in SECTION_GROUPS]
+    try:
+        with stage_timer("generate.prompt"):
+            # Reserve room for the longest suffix so every group shares one prefix
+            prefix, usage = build_summary_prompt_with_usage(
+                transcribed_conversation,
+                relevant_knowledge_chunks,
+                additional_content,
+                SECTION_GROUP_MAX_NEW_TOKENS + max(count_tokens(suffix) for suffix in suffixes)
+            )
+    except PromptTooLongError as e:
+        print(f"Cannot generate summary: {e}")
+        return ""
+    print(f"Prompt token usage: {usage}. Generating {len(SECTION_GROUPS)} section groups in parallel...")
+
+    futures = [
+        _section_executor.submit(
+            contextvars.copy_context().run, _generate_group, prefix + suffix, i, tgi_service_url, temperature
+        )
+        for i, suffix in enumerate(suffixes)
+    ]
+
+    sections: Dict[str, str] = {}
+    for i, (group, future) in enumerate(zip(SECTION_GROUPS, futures)):
+        try:
+            parsed = parse_sections(future.result())
+        except BulkheadFull:
+            # TGI is saturated; a single-pass retry would only add to the load
+            for other in futures:
+                other.cancel()
+            raise
+        except Exception as e:
+            print(f"Error generating section group {i}: {e}. Falling back to single-pass generation.")
+            for other in futures:
+                other.cancel()
+            return generate_summary(
+                transcribed_conversation,
+                relevant_knowledge_chunks,
+                tgi_service_url,
+                max_new_tokens=max_new_tokens,
+                temperature=temperature,
+                additional_content=additional_content,
+                summary_title=summary_title,
+                summary_id=summary_id,
+            )
+        # Only take the sections this group was asked for
+        for section in group:
+            if parsed.get(section):
+                sections[section] = parsed[section]
+
+    summary = stitch_sections(sections)
+    _persist_summary(summary, summary_title, summary_id)
+    return summary
@@ -7,23 +7,42 @@ sys.modules["sqlite3"] = pysqlite3
 sys.modules["_sqlite3"] = pysqlite3.dbapi2
 
 import os
+import json
+import math
+import uuid
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 from fastapi import FastAPI, HTTPException, Depends, Security
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import APIKeyHeader
 from pydantic import BaseModel
 from fastapi import Request
-from typing import Optional
+from typing import List, Optional
 
 # Import the higher-level pipeline functions from app.core.pipeline
-from app.core.pipeline import run_retrieval_and_generation_pipeline
+from app.core.pipeline import (
+    arun_retrieval_and_generation_pipeline_with_id,
+    run_in_pipeline_executor,
+    run_batch_retrieval_and_generation_pipeline,
+    stream_retrieval_and_generation_pipeline,
+    summary_cache,
+    summary_flight,
+)
+from app.core.metrics import stage_metrics, record_spans, format_server_timing
+from app.core.http_client import aclose_http_clients
+from app.core.bulkhead import BulkheadFull, render_bulkheads_prometheus
+from app.retrieval.retrieve import render_retrieval_prometheus
+from app.generation.generate_summary import summary_writer
+from app.data_ingestion.document_loader import shutdown_loader_pool
 
 # Import the documents router
-from app.backend.api.documents import router as documents_router
+from app.backend.api.documents import router as documents_router, ingestion_jobs
 from app.backend.api.summaries_store import router as summaries_store_router
+from app.backend.api.summary_jobs import router as summary_jobs_router, summary_jobs
 
 #import collections router
 from app.backend.api.collections import router as collections_router
@@ -33,6 +52,11 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Adds a Server-Timing header with the per-stage spans of each request (visible in browser devtools)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+# Largest number of conversations accepted by one /summaries/generate/batch request
+BATCH_MAX_CONVERSATIONS = int(os.getenv("BATCH_MAX_CONVERSATIONS", "500"))
+
 # --- API Key Setup ---
 API_KEY_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
@@ -49,8 +73,22 @@ async def get_api_key(request: Request, api_key: Optional[str] = Security(api_ke
         return api_key
     raise HTTPException(status_code=403, detail="Could not validate credentials - Invalid API Key")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Release the pooled TEI/TGI connections
+    await aclose_http_clients()
+    # Drop queued summary jobs; running ones still finish (their summaries are flushed at exit)
+    summary_jobs.shutdown(wait=False)
+    ingestion_jobs.shutdown(wait=False)
+    # Stop the document loader processes
+    await asyncio.to_thread(shutdown_loader_pool)
+    # Write out summaries still queued for the database
+    await asyncio.to_thread(summary_writer.close)
+
 # --- FastAPI App Definition ---
 app = FastAPI(
+    lifespan=lifespan,
     title="Clinical Summaries RAG API",
     description="API for RAG (Retrieval-Augmented Generation) on medical conversations and documents.",
     version="0.1.0",
@@ -71,9 +109,29 @@ app.add_middleware(
     allow_headers=["*"],    # Allow all headers, including your custom 'X-API-Key'
 )
 
+@app.exception_handler(BulkheadFull)
+async def bulkhead_full_handler(request: Request, exc: BulkheadFull):
+    # A dependency is at its concurrency limit: fail fast and tell the client when to retry
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+@app.middleware("http")
+async def server_timing_middleware(request: Request, call_next):
+    if not SERVER_TIMING:
+        return await call_next(request)
+    with record_spans() as spans:
+        response = await call_next(request)
+    if spans:
+        response.headers["Server-Timing"] = format_server_timing(spans)
+    return response
+
 
 app.include_router(documents_router, dependencies=[Depends(get_api_key)])
 app.include_router(summaries_store_router, dependencies=[Depends(get_api_key)])
+app.include_router(summary_jobs_router, dependencies=[Depends(get_api_key)])
 app.include_router(collections_router, dependencies=[Depends(get_api_key)])
 
 
@@ -84,10 +142,27 @@ async def read_root():
     """
     return {"message": "Medical Conversation RAG API is running. Visit /docs for API documentation."}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Per-stage latency histograms of the summary pipeline (including bulkhead wait times),
+    the load on each dependency's bulkhead, the depth of the summary write-behind queue and
+    the collection queries dropped from retrieval, in the Prometheus text format.
+    """
+    body = (
+        stage_metrics.render_prometheus()
+        + render_bulkheads_prometheus()
+        + summary_writer.render_prometheus()
+        + render_retrieval_prometheus()
+    )
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
 # --- Pydantic model for summarization request body ---
 class SummarizeRequest(BaseModel):
     text: str
     file_name: str | None = None
+    temperature: float | None = None  # None uses SUMMARY_TEMPERATURE; 0 makes results cacheable
+    bypass_cache: bool = False  # force a fresh summary, e.g. for "regenerate"
 
 @app.post("/summaries/generate/", summary="Generate a clinical summary from conversation")
 async def generate_clinical_summary(
@@ -97,6 +172,8 @@ async def generate_clinical_summary(
     """
     Generates a clinical summary based on a provided transcribed medical conversation.
     It uses RAG to retrieve relevant context from uploaded documents before summarization.
+    The returned `summary_id` can be used with /summaries/get/ right away, even if the
+    summary is still queued for the database.
     """
     transcribed_conversation = request.text
 
@@ -105,9 +182,12 @@ async def generate_clinical_summary(
 
     try:
         # --- Call the run_retrieval_and_generation_pipeline ---
-        summary_result = run_retrieval_and_generation_pipeline(
+        # Runs on the pipeline pool; awaiting it keeps the event loop free for other requests
+        summary_result, summary_id = await arun_retrieval_and_generation_pipeline_with_id(
             transcribed_conversation,
-            summary_title=(request.file_name or None)
+            summary_title=(request.file_name or None),
+            temperature=request.temperature,
+            bypass_cache=request.bypass_cache
         )
         
         if summary_result is None:
@@ -118,11 +198,131 @@ async def generate_clinical_summary(
 
         return JSONResponse(
             status_code=200,
-            content={"summary": summary_result}
+            content={"summary": summary_result, "summary_id": summary_id}
         )
+    except BulkheadFull:
+        raise
     except Exception as e:
         logger.error(f"Error during summary generation: {e}", exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate summary: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+class BatchConversation(BaseModel):
+    text: str
+    file_name: str | None = None
+
+class BatchSummarizeRequest(BaseModel):
+    conversations: List[BatchConversation]
+    temperature: float | None = None
+
+@app.post("/summaries/generate/batch", summary="Generate clinical summaries for many conversations")
+async def generate_clinical_summaries_batch(
+    request: BatchSummarizeRequest,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Batch variant of /summaries/generate/. Streams newline-delimited JSON, one line per
+    conversation as soon as its summary is ready (completion order, not request order):
+    {"index": i, "summary": ..., "summary_id": ...} or {"index": i, "error": ...}.
+    `index` is the conversation's position in the request.
+    """
+    if not request.conversations:
+        raise HTTPException(status_code=400, detail="At least one conversation is required.")
+    if len(request.conversations) > BATCH_MAX_CONVERSATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BATCH_MAX_CONVERSATIONS} conversations can be summarized per batch."
+        )
+    if any(not conversation.text.strip() for conversation in request.conversations):
+        raise HTTPException(status_code=400, detail="Transcribed conversations cannot be empty.")
+
+    results = run_batch_retrieval_and_generation_pipeline(
+        [{"text": c.text, "title": c.file_name or None} for c in request.conversations],
+        temperature=request.temperature
+    )
+    # Sync generator: Starlette iterates it in a worker thread, keeping the event loop free
+    return StreamingResponse(
+        (json.dumps(result) + "\n" for result in results),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/summaries/cache", summary="Summary cache and request coalescing statistics")
+async def get_summary_cache_stats(api_key: str = Depends(get_api_key)):
+    """
+    Hit/miss counters of the deterministic summary cache and how many identical
+    requests joined an in-flight computation.
+    """
+    return {"cache": summary_cache.stats(), "coalescing": summary_flight.stats()}
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class StreamSummarizeRequest(BaseModel):
+    text: str
+    file_name: str | None = None
+    temperature: float | None = None  # None uses SUMMARY_TEMPERATURE
+
+
+@app.post("/summaries/generate/stream", summary="Stream a clinical summary from conversation")
+async def stream_clinical_summary(
+    request: StreamSummarizeRequest,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Streaming variant of /summaries/generate/ as server-sent events.
+
+    Emits one `token` event per generated token ({"text": ...}), then a `done` event with
+    the full summary ({"summary": ..., "summary_id": ...}) once it has been queued for saving, or an `error` event if
+    generation fails part-way.
+    """
+    transcribed_conversation = request.text
+
+    if not transcribed_conversation.strip():
+        raise HTTPException(status_code=400, detail="Transcribed conversation cannot be empty.")
+
+    summary_id = str(uuid.uuid4())
+    try:
+        tokens = await run_in_pipeline_executor(
+            stream_retrieval_and_generation_pipeline,
+            transcribed_conversation,
+            summary_title=(request.file_name or None),
+            summary_id=summary_id,
+            temperature=request.temperature
+        )
+    except BulkheadFull:
+        raise
+    except Exception as e:
+        logger.error(f"Error during summary retrieval: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to generate summary: {str(e)}")
+
+    if tokens is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Could not generate summary (e.g., no relevant context found or TGI issue)."
+        )
+
+    def event_stream():
+        # Sync generator: Starlette iterates it in a worker thread, keeping the event loop free
+        parts = []
+        try:
+            for token in tokens:
+                parts.append(token)
+                yield _sse_event("token", {"text": token})
+        except Exception as e:
+            logger.error(f"Error during summary streaming: {e}", exc_info=True)
+            yield _sse_event("error", {"detail": f"Failed to generate summary: {str(e)}"})
+            return
+        yield _sse_event("done", {"summary": "".join(parts), "summary_id": summary_id})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
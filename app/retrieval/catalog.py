@@ -0,0 +1,94 @@
+import os
+import time
+import threading
+import chromadb
+from typing import List, Dict, Any
+
+# How long collection handles and metadata are reused before being re-listed from ChromaDB
+COLLECTION_CATALOG_TTL = float(os.getenv("COLLECTION_CATALOG_TTL", "300"))
+
+
+class CollectionCatalog:
+    """
+    Process-level cache of ChromaDB clients, collection handles and their metadata.
+
+    Listing collections and reading their metadata costs 2+N HTTP round trips, so the
+    retrieval hot path reads them from here instead. Entries expire after `ttl` seconds
+    and are dropped immediately by `invalidate()` whenever collections are created,
+    rebuilt or deleted.
+    """
+
+    def __init__(self, ttl: float = COLLECTION_CATALOG_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._clients: Dict[str, Any] = {}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        """Incremented on every invalidation; lets other caches detect collection changes."""
+        return self._version
+
+    def get_client(self, chroma_db_url: str):
+        """Returns a shared HttpClient for the given ChromaDB URL, creating it on first use."""
+        with self._lock:
+            return self._get_client_locked(chroma_db_url)
+
+    def _get_client_locked(self, chroma_db_url: str):
+        client = self._clients.get(chroma_db_url)
+        if client is None:
+            client = chromadb.HttpClient(
+                host=chroma_db_url.split('://')[1].split(':')[0],
+                port=int(chroma_db_url.split(':')[-1])
+            )
+            self._clients[chroma_db_url] = client
+        return client
+
+    def get_collections(self, chroma_db_url: str) -> List[Dict[str, Any]]:
+        """
+        Returns a list of {'name', 'collection', 'metric'} entries for every collection,
+        refreshing from ChromaDB only when the cached listing is missing or expired.
+        """
+        with self._lock:
+            cached = self._entries.get(chroma_db_url)
+            if cached and cached["expires_at"] > time.monotonic():
+                return cached["collections"]
+
+            client = self._get_client_locked(chroma_db_url)
+            collections = []
+            for col in client.list_collections():
+                collection = client.get_collection(name=col.name)
+
+                if collection.metadata:
+                    metric = collection.metadata.get("hnsw:space", "cosine")
+                else:
+                    metric = "cosine"  # fallback default
+
+                collections.append({"name": col.name, "collection": collection, "metric": metric})
+
+            self._entries[chroma_db_url] = {
+                "collections": collections,
+                "expires_at": time.monotonic() + self.ttl,
+            }
+            print(f"Refreshed collection catalog: {[c['name'] for c in collections]}")
+            return collections
+
+    def invalidate(self):
+        """Drops all cached clients and collection listings."""
+        with self._lock:
+            self._clients.clear()
+            self._entries.clear()
+            self._version += 1
+
+
+_catalog = CollectionCatalog()
+
+
+def get_collection_catalog() -> CollectionCatalog:
+    return _catalog
+
+
+def invalidate_collection_catalog():
+    """Call after creating, rebuilding or deleting a collection."""
+    _catalog.invalidate()
@@ -0,0 +1,326 @@
+import os
+import re
+import math
+import threading
+import numpy as np
+from array import array
+from pathlib import Path
+from typing import List, Dict, Tuple, Optional
+
+# Where the per-collection BM25 side indexes are persisted
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", "./data/lexical_index")
+MAX_QUERY_TERMS = 64  # long transcripts are reduced to their most selective terms
+
+# Drug names, doses and guideline codes ("NG136", "2.5mg", "co-amoxiclav") are kept whole,
+# and hyphen/dot/slash separated parts are indexed on their own as well.
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i if in is it its me my no not of on or "
+    "our she so that the their them then there they this to was we were what when which who will with "
+    "you your yes okay ok um uh".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases and splits text into BM25 terms, dropping common stopwords."""
+    terms = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        terms.append(token)
+        parts = re.split(r"[.\-/]", token)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part and part not in _STOPWORDS)
+    return terms
+
+
+class BM25Index:
+    """
+    Append-only inverted index with Okapi BM25 scoring (removed documents are tombstoned).
+
+    Postings are kept in compact `array` buffers (4-byte doc index + 2-byte term frequency
+    per posting) and scored with NumPy, so memory grows with the number of postings rather
+    than with Python objects per document. Only ids are stored; the chunk text stays in ChromaDB.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[str] = []
+        self._id_to_index: Dict[str, int] = {}
+        self._doc_lengths = array("I")
+        self._total_length = 0
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._length_norm: Optional[np.ndarray] = None  # cached per-document BM25 length term
+        self._live: Optional[np.ndarray] = None  # cached mask of documents that are not removed
+        self._removed = set()  # indexes of removed documents; their postings stay but never match
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.doc_ids) - len(self._removed)
+
+    def add(self, ids: List[str], texts: List[str]) -> int:
+        """Indexes new documents; ids that are already present are skipped. Returns the number added."""
+        added = 0
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                if doc_id in self._id_to_index:
+                    continue
+                doc_index = len(self.doc_ids)
+                self.doc_ids.append(doc_id)
+                self._id_to_index[doc_id] = doc_index
+
+                terms = tokenize(text or "")
+                self._doc_lengths.append(len(terms))
+                self._total_length += len(terms)
+
+                counts: Dict[str, int] = {}
+                for term in terms:
+                    counts[term] = counts.get(term, 0) + 1
+                for term, count in counts.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = (array("I"), array("H"))
+                        self._postings[term] = postings
+                    postings[0].append(doc_index)
+                    postings[1].append(min(count, 65535))
+                added += 1
+            if added:
+                self._length_norm = None
+                self._live = None
+        return added
+
+    def remove(self, ids: List[str]) -> int:
+        """Stops matching the given documents; they may be added again later. Returns the number removed."""
+        removed = 0
+        with self._lock:
+            for doc_id in ids:
+                doc_index = self._id_to_index.pop(doc_id, None)
+                if doc_index is not None:
+                    self._removed.add(doc_index)
+                    self._total_length -= self._doc_lengths[doc_index]
+                    removed += 1
+            if removed:
+                self._length_norm = None
+                self._live = None
+        return removed
+
+    def search(self, query: str, k: int = 10, max_query_terms: int = MAX_QUERY_TERMS) -> List[Tuple[str, float]]:
+        """Returns up to k (doc_id, score) pairs, best first."""
+        with self._lock:
+            n_docs = len(self.doc_ids)
+            # Removed documents don't count towards idf or the average document length
+            n_live = n_docs - len(self._removed)
+            if n_live == 0 or k <= 0:
+                return []
+
+            terms = [term for term in set(tokenize(query)) if term in self._postings]
+            if not terms:
+                return []
+            if len(terms) > max_query_terms:
+                # Rarest terms carry the most signal
+                terms = sorted(terms, key=lambda t: len(self._postings[t][0]))[:max_query_terms]
+
+            if self._length_norm is None:
+                doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32).astype(np.float32)
+                avg_length = self._total_length / n_live or 1.0
+                self._length_norm = self.k1 * (1.0 - self.b + self.b * doc_lengths / avg_length)
+            length_norm = self._length_norm
+            if self._removed and self._live is None:
+                self._live = np.ones(n_docs, dtype=bool)
+                self._live[np.fromiter(self._removed, dtype=np.int64)] = False
+            live = self._live if self._removed else None
+
+            scores = np.zeros(n_docs, dtype=np.float32)
+            for term in terms:
+                doc_array, tf_array = self._postings[term]
+                docs = np.frombuffer(doc_array, dtype=np.uint32)
+                tfs = np.frombuffer(tf_array, dtype=np.uint16).astype(np.float32)
+                df = len(docs) if live is None else int(np.count_nonzero(live[docs]))
+                if df == 0:
+                    continue
+                idf = math.log(1.0 + (n_live - df + 0.5) / (df + 0.5))
+                # Each doc appears once per term, so plain fancy-index addition is safe
+                scores[docs] += idf * tfs * (self.k1 + 1.0) / (tfs + length_norm[docs])
+                del docs, tfs
+            if live is not None:
+                scores[~live] = 0.0
+
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [(self.doc_ids[i], float(scores[i])) for i in ranked]
+
+    def save(self, path: str):
+        """Writes the index to a compressed .npz file (atomically)."""
+        with self._lock:
+            terms = list(self._postings.keys())
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            for i, term in enumerate(terms):
+                offsets[i + 1] = offsets[i] + len(self._postings[term][0])
+            postings_docs = np.empty(offsets[-1], dtype=np.uint32)
+            postings_tfs = np.empty(offsets[-1], dtype=np.uint16)
+            for i, term in enumerate(terms):
+                docs, tfs = self._postings[term]
+                postings_docs[offsets[i]:offsets[i + 1]] = np.frombuffer(docs, dtype=np.uint32)
+                postings_tfs[offsets[i]:offsets[i + 1]] = np.frombuffer(tfs, dtype=np.uint16)
+
+            target = Path(path)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = target.with_name(target.name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    params=np.array([self.k1, self.b], dtype=np.float64),
+                    doc_ids=np.frombuffer("\n".join(self.doc_ids).encode("utf-8"), dtype=np.uint8),
+                    doc_lengths=np.frombuffer(self._doc_lengths, dtype=np.uint32).copy(),
+                    terms=np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+                    offsets=offsets,
+                    postings_docs=postings_docs,
+                    postings_tfs=postings_tfs,
+                    removed=np.array(sorted(self._removed), dtype=np.uint32),
+                )
+            os.replace(tmp_path, target)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as data:
+            k1, b = data["params"].tolist()
+            index = cls(k1=k1, b=b)
+            doc_ids = data["doc_ids"].tobytes().decode("utf-8")
+            index.doc_ids = doc_ids.split("\n") if doc_ids else []
+            # Older files have no "removed" array
+            index._removed = set(data["removed"].tolist()) if "removed" in data.files else set()
+            index._id_to_index = {
+                doc_id: i for i, doc_id in enumerate(index.doc_ids) if i not in index._removed
+            }
+            index._doc_lengths = array("I", data["doc_lengths"].astype(np.uint32).tobytes())
+            index._total_length = int(data["doc_lengths"].sum()) - sum(index._doc_lengths[i] for i in index._removed)
+
+            terms = data["terms"].tobytes().decode("utf-8")
+            terms = terms.split("\n") if terms else []
+            offsets = data["offsets"]
+            postings_docs = data["postings_docs"]
+            postings_tfs = data["postings_tfs"]
+            for i, term in enumerate(terms):
+                start, end = offsets[i], offsets[i + 1]
+                index._postings[term] = (
+                    array("I", postings_docs[start:end].tobytes()),
+                    array("H", postings_tfs[start:end].tobytes()),
+                )
+        return index
+
+
+# collection name -> (mtime of the file the index was loaded from or saved to, index)
+_indexes: Dict[str, Tuple[Optional[float], BM25Index]] = {}
+_registry_lock = threading.Lock()
+
+
+def _index_path(collection_name: str, index_dir: Optional[str] = None) -> Path:
+    return Path(index_dir or LEXICAL_INDEX_DIR) / f"{collection_name}.npz"
+
+
+def _index_mtime(path: Path) -> Optional[float]:
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def get_lexical_index(collection_name: str, create: bool = True) -> Optional[BM25Index]:
+    """
+    Returns the BM25 index for a collection, loading it from disk on first use.
+    An index saved by another process is picked up via the file's mtime.
+    Returns None if no index exists and `create` is False.
+    """
+    path = _index_path(collection_name)
+    mtime = _index_mtime(path)
+    with _registry_lock:
+        cached = _indexes.get(collection_name)
+        if cached is not None:
+            if cached[0] == mtime:
+                return cached[1]
+            if mtime is None:
+                # Deleted by another process along with its collection
+                _indexes.pop(collection_name, None)
+
+        index = None
+        if mtime is not None:
+            try:
+                index = BM25Index.load(str(path))
+                print(f"Loaded lexical index for '{collection_name}' ({len(index)} documents).")
+            except Exception as e:
+                print(f"Error loading lexical index for '{collection_name}': {e}")
+                index = None
+                mtime = None
+        if index is None:
+            if not create:
+                return None
+            index = BM25Index()
+        _indexes[collection_name] = (mtime, index)
+        return index
+
+
+def index_chunks_lexically(collection_name: str, ids: List[str], texts: List[str], persist: bool = True) -> int:
+    """
+    Adds chunks to the collection's BM25 side index. Call alongside every ChromaDB write.
+    Set `persist` to False inside batch loops and call `save_lexical_index` at the end.
+    """
+    try:
+        index = get_lexical_index(collection_name)
+        added = index.add(ids, texts)
+        if persist:
+            save_lexical_index(collection_name)
+        return added
+    except Exception as e:
+        print(f"Error updating lexical index for '{collection_name}': {e}")
+        return 0
+
+
+def remove_chunks_lexically(collection_name: str, ids: List[str], persist: bool = True) -> int:
+    """Removes deleted chunks from the collection's BM25 side index. Call alongside ChromaDB deletes."""
+    try:
+        index = get_lexical_index(collection_name, create=False)
+        if index is None:
+            return 0
+        removed = index.remove(ids)
+        if persist and removed:
+            save_lexical_index(collection_name)
+        return removed
+    except Exception as e:
+        print(f"Error updating lexical index for '{collection_name}': {e}")
+        return 0
+
+
+def save_lexical_index(collection_name: str):
+    with _registry_lock:
+        cached = _indexes.get(collection_name)
+    if cached is None:
+        return
+    index = cached[1]
+    path = _index_path(collection_name)
+    try:
+        index.save(str(path))
+    except Exception as e:
+        print(f"Error saving lexical index for '{collection_name}': {e}")
+        return
+    # Our own write must not look like another process's to get_lexical_index
+    with _registry_lock:
+        if collection_name in _indexes and _indexes[collection_name][1] is index:
+            _indexes[collection_name] = (_index_mtime(path), index)
+
+
+def drop_lexical_index(collection_name: str):
+    """Forgets and deletes the BM25 index of a deleted collection."""
+    with _registry_lock:
+        _indexes.pop(collection_name, None)
+        path = _index_path(collection_name)
+        if path.exists():
+            path.unlink()
+
+
+def reset_lexical_indexes():
+    """Drops all in-memory indexes (they are re-loaded from disk on next use)."""
+    with _registry_lock:
+        _indexes.clear()
@@ -0,0 +1,88 @@
+import numpy as np
+from typing import List, Dict, Any, Sequence
+
+MMR_LAMBDA = 0.7  # 1.0 = pure relevance, 0.0 = pure diversity
+DUPLICATE_SIMILARITY_THRESHOLD = 0.95  # cosine similarity above which a chunk counts as a near-duplicate
+
+
+def maximal_marginal_relevance(
+    relevance: Sequence[float],
+    embeddings: Sequence[Sequence[float]],
+    k: int,
+    lambda_mult: float = MMR_LAMBDA,
+    duplicate_threshold: float = DUPLICATE_SIMILARITY_THRESHOLD
+) -> List[int]:
+    """
+    Greedy MMR selection over candidate embeddings, vectorized with NumPy.
+
+    Args:
+        relevance: One score per candidate, higher is more relevant.
+        embeddings: One vector per candidate.
+        k: Maximum number of candidates to select.
+        lambda_mult: Trade-off between relevance and novelty.
+        duplicate_threshold: Candidates at least this cosine-similar to an already selected
+                             one are dropped outright, so fewer than k may be returned.
+
+    Returns:
+        List[int]: Indices of the selected candidates, in selection order.
+    """
+    n = len(relevance)
+    if n == 0 or k <= 0:
+        return []
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1.0, norms)
+    similarity = vectors @ vectors.T
+
+    scores = np.asarray(relevance, dtype=np.float32)
+    spread = scores.max() - scores.min()
+    scores = (scores - scores.min()) / spread if spread > 0 else np.ones(n, dtype=np.float32)
+
+    available = np.ones(n, dtype=bool)
+    max_similarity = np.full(n, -1.0, dtype=np.float32)
+    selected: List[int] = []
+
+    while len(selected) < k and available.any():
+        mmr = lambda_mult * scores - (1.0 - lambda_mult) * np.maximum(max_similarity, 0.0)
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        selected.append(best)
+
+        max_similarity = np.maximum(max_similarity, similarity[:, best])
+        available[best] = False
+        available &= max_similarity < duplicate_threshold
+
+    return selected
+
+
+def diversify_chunks(
+    chunks: List[Dict[str, Any]],
+    relevance: Sequence[float],
+    k: int,
+    lambda_mult: float = MMR_LAMBDA,
+    duplicate_threshold: float = DUPLICATE_SIMILARITY_THRESHOLD
+) -> List[Dict[str, Any]]:
+    """
+    Applies MMR to retrieved chunks carrying an 'embedding' key and returns the selected
+    chunks without their embeddings. Chunks without an embedding are passed through
+    by relevance order, so this is a no-op if embeddings were not requested.
+    """
+    if not chunks:
+        return []
+    if any(chunk.get("embedding") is None for chunk in chunks):
+        return [_without_embedding(chunk) for chunk in chunks[:k]]
+
+    selected = maximal_marginal_relevance(
+        relevance,
+        [chunk["embedding"] for chunk in chunks],
+        k,
+        lambda_mult=lambda_mult,
+        duplicate_threshold=duplicate_threshold,
+    )
+    print(f"MMR kept {len(selected)} of {len(chunks)} candidate chunks.")
+    return [_without_embedding(chunks[i]) for i in selected]
+
+
+def _without_embedding(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in chunk.items() if key != "embedding"}
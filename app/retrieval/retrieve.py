@@ -1,63 +1,560 @@
-import chromadb
-from typing import List, Dict, Any
+import os
+import time
+import hashlib
+import threading
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.core.bulkhead import BulkheadFull, get_bulkhead
+from app.core.cache import TTLCache
+from app.core.metrics import stage_timer
+from app.embed_and_store.embed import embed_texts, MAX_TEI_BATCH_ITEMS
+from app.retrieval.catalog import get_collection_catalog
+from app.retrieval.lexical import get_lexical_index
+from app.retrieval.rerank import diversify_chunks
+from app.retrieval.snapshot import get_vector_snapshot
+
+# Upper bound on how long a single collection query may run before it is dropped from the
+# merged results. The clock starts when the query starts running; a query still waiting for
+# a pool thread after COLLECTION_QUERY_QUEUE_TIMEOUT seconds is dropped as well.
+COLLECTION_QUERY_TIMEOUT = float(os.getenv("COLLECTION_QUERY_TIMEOUT", "5"))
+COLLECTION_QUERY_QUEUE_TIMEOUT = float(os.getenv("COLLECTION_QUERY_QUEUE_TIMEOUT", str(COLLECTION_QUERY_TIMEOUT)))
+# Sized like the pipeline pool (PIPELINE_WORKERS) so concurrent pipelines don't queue
+# behind each other's collection queries
+MAX_QUERY_WORKERS = int(os.getenv("MAX_QUERY_WORKERS", os.getenv("PIPELINE_WORKERS", "32")))
+
+# "single" sends the whole query as one vector; "window" splits long transcripts into
+# overlapping windows and fuses the per-window results with reciprocal rank fusion.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "single")
+QUERY_WINDOW_WORDS = int(os.getenv("QUERY_WINDOW_WORDS", "256"))  # stays under bge-small's 512 tokens
+QUERY_WINDOW_OVERLAP_WORDS = int(os.getenv("QUERY_WINDOW_OVERLAP_WORDS", "64"))
+MAX_QUERY_WINDOWS = int(os.getenv("MAX_QUERY_WINDOWS", "16"))  # must fit in one TEI batch
+RRF_K = 60
+
+# Optional maximal marginal relevance pass that drops near-duplicate chunks
+# (e.g. overlapping neighbours from the same document) before prompting.
+RETRIEVAL_MMR = os.getenv("RETRIEVAL_MMR", "false").lower() == "true"
+
+# Also query the BM25 side index of each collection and fuse lexical hits with the vector hits
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "false").lower() == "true"
+
+# Repeated summaries of the same transcript (regenerations, redeliveries, retries)
+# reuse the previous retrieval until the collections change or the entry expires.
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "256"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "600"))
+retrieval_cache = TTLCache(max_size=RETRIEVAL_CACHE_SIZE, ttl=RETRIEVAL_CACHE_TTL)
+
+# Shared pool for the per-collection fan-out so requests don't pay thread start-up
+_query_executor = ThreadPoolExecutor(max_workers=MAX_QUERY_WORKERS, thread_name_prefix="chroma-query")
+
+# Collection queries left out of a merge, by collection and reason ("timeout" or "queued")
+_dropped_queries: Dict[Tuple[str, str], int] = {}
+_dropped_lock = threading.Lock()
+
+
+def _submit_timed(stage: str, fn, *args) -> Tuple[Future, List[Optional[float]]]:
+    """
+    Runs `fn` on the query pool under a stage timer, in a copy of the caller's context.
+    Returns the future and a one-item list that receives the time the call started running.
+    """
+    started: List[Optional[float]] = [None]
+
+    def _run():
+        started[0] = time.monotonic()
+        with stage_timer(stage):
+            return fn(*args)
+    return _query_executor.submit(contextvars.copy_context().run, _run), started
+
+
+def _wait_for_queries(
+    started: Dict[Future, List[Optional[float]]],
+    timeout: float,
+    queue_timeout: float
+) -> Dict[Future, str]:
+    """
+    Waits until every query has finished, has run for `timeout` seconds, or has waited
+    `queue_timeout` seconds without starting. Returns the unfinished ones, mapped to why
+    they were given up ("timeout" or "queued").
+    """
+    submitted = time.monotonic()
+    pending = set(started)
+    given_up: Dict[Future, str] = {}
+    while pending:
+        now = time.monotonic()
+        deadlines = {}
+        for future in pending:
+            start = started[future][0]
+            deadlines[future] = (start + timeout, "timeout") if start is not None else (submitted + queue_timeout, "queued")
+        for future, (deadline, reason) in deadlines.items():
+            if deadline <= now:
+                given_up[future] = reason
+                pending.discard(future)
+        if not pending:
+            break
+        # Re-check at least every 50ms: a queued query's deadline moves once it starts
+        next_deadline = min(deadline for future, (deadline, _) in deadlines.items() if future in pending)
+        done, _ = wait(pending, timeout=min(max(0.0, next_deadline - now), 0.05), return_when=FIRST_COMPLETED)
+        pending -= done
+    return given_up
+
+
+def _record_dropped_query(collection_name: str, reason: str):
+    with _dropped_lock:
+        key = (collection_name, reason)
+        _dropped_queries[key] = _dropped_queries.get(key, 0) + 1
+
+
+def render_retrieval_prometheus() -> str:
+    """Collection queries dropped from retrieval merges in the Prometheus text format."""
+    with _dropped_lock:
+        dropped = dict(_dropped_queries)
+    lines = ["# TYPE rag_retrieval_dropped_queries_total counter"]
+    for (collection_name, reason), count in sorted(dropped.items()):
+        lines.append(f'rag_retrieval_dropped_queries_total{{collection="{collection_name}",reason="{reason}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def _is_missing_collection_error(error: Exception) -> bool:
+    """True if a query failed because its collection no longer exists (not a transient TEI/Chroma error)."""
+    import chromadb.errors
+
+    if isinstance(error, chromadb.errors.NotFoundError):
+        return True
+    # Older Chroma clients raise a plain ValueError for a dropped collection
+    message = str(error).lower()
+    return "does not exist" in message or "not found" in message
+
+
+def split_query_into_windows(
+    text: str,
+    window_words: int = QUERY_WINDOW_WORDS,
+    overlap_words: int = QUERY_WINDOW_OVERLAP_WORDS,
+    max_windows: int = MAX_QUERY_WINDOWS
+) -> List[str]:
+    """
+    Splits a long query into overlapping word windows that each fit the embedding model.
+    If more than `max_windows` windows would be needed, evenly spaced windows are kept
+    so the whole transcript is still covered.
+    """
+    words = text.split()
+    if len(words) <= window_words:
+        return [text]
+
+    step = max(window_words - overlap_words, 1)
+    starts = list(range(0, len(words) - window_words + 1, step))
+    # Make sure the tail of the transcript gets its own full window
+    if starts[-1] + window_words < len(words):
+        starts.append(len(words) - window_words)
+
+    if len(starts) > max_windows:
+        if max_windows > 1:
+            last = len(starts) - 1
+            starts = [starts[round(i * last / (max_windows - 1))] for i in range(max_windows)]
+        else:
+            starts = starts[:1]
+
+    return [" ".join(words[start:start + window_words]) for start in starts]
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Dict[str, Any]]], k: int = RRF_K) -> List[Dict[str, Any]]:
+    """
+    Fuses several ranked chunk lists into one, scoring each chunk by sum(1 / (k + rank)).
+    Chunks are identified by collection and id; the best (lowest) distance seen is kept.
+    Lexical-only hits have no distance (None).
+    """
+    fused: Dict[Any, Dict[str, Any]] = {}
+    for ranked in ranked_lists:
+        for rank, chunk in enumerate(ranked, start=1):
+            key = (chunk["source_collection"], chunk.get("id") or chunk["page_content"])
+            entry = fused.get(key)
+            if entry is None:
+                entry = {**chunk, "rrf_score": 0.0}
+                fused[key] = entry
+            else:
+                for field, value in chunk.items():
+                    entry.setdefault(field, value)
+                if chunk["distance"] is not None:
+                    if entry["distance"] is None or chunk["distance"] < entry["distance"]:
+                        entry["distance"] = chunk["distance"]
+            entry["rrf_score"] += 1.0 / (k + rank)
+
+    def _sort_key(x):
+        return (-x["rrf_score"], x["distance"] if x["distance"] is not None else float("inf"))
+
+    return sorted(fused.values(), key=_sort_key)
+
+
+def _query_collection(
+    collection,
+    collection_name: str,
+    query_texts: List[str],
+    n_results: int,
+    query_embeddings: Optional[List[List[float]]] = None,
+    include_embeddings: bool = False
+) -> List[List[Dict[str, Any]]]:
+    """
+    Queries a single collection with one or more queries in a single round trip.
+    Returns one list per query of the chunks that pass the distance threshold.
+    When precomputed query embeddings are given they are sent as-is, so the collection's
+    own embedding function is never invoked.
+    With `include_embeddings`, each chunk also carries its stored vector under 'embedding'.
+    """
+    if query_embeddings is not None:
+        query_args = {"query_embeddings": query_embeddings}
+    else:
+        query_args = {"query_texts": query_texts}
+
+    include = ['documents', 'metadatas', 'distances']
+    if include_embeddings:
+        include.append('embeddings')
+
+    with get_bulkhead("chroma").limit():
+        results = collection.query(
+            **query_args,
+            n_results=n_results * 2,
+            include=include
+        )
+
+    per_query_chunks = []
+    if results and results['documents']:
+        ids = results.get('ids')
+        embeddings = results.get('embeddings') if include_embeddings else None
+        for q in range(len(results['documents'])):
+            chunks = []
+            for i in range(len(results['documents'][q])):
+                distance = results['distances'][q][i]
+                # Check if the distance is not None before appending
+                if distance is not None and distance <= 0.9:
+                    chunk = {
+                        "page_content": results['documents'][q][i],
+                        "metadata": results['metadatas'][q][i],
+                        "distance": distance,
+                        "source_collection": collection_name
+                    }
+                    if ids:
+                        chunk["id"] = ids[q][i]
+                    if embeddings is not None:
+                        chunk["embedding"] = embeddings[q][i]
+                    chunks.append(chunk)
+            per_query_chunks.append(chunks)
+    return per_query_chunks
+
+
+def _snapshot_query_collection(
+    snapshot,
+    collection_name: str,
+    query_embeddings: List[List[float]],
+    n_results: int,
+    include_embeddings: bool = False
+) -> List[List[Dict[str, Any]]]:
+    """
+    Same contract as `_query_collection`, but searched in-process over the collection's
+    memory-mapped snapshot (see app.retrieval.snapshot) instead of over HTTP.
+    """
+    per_query_chunks = []
+    for hits in snapshot.search(query_embeddings, k=n_results * 2):
+        chunks = []
+        for row, distance in hits:
+            if distance > 0.9:
+                break  # hits are sorted, the rest are further away
+            record = snapshot.get_row(row)
+            chunk = {
+                "page_content": record["document"],
+                "metadata": record["metadata"],
+                "distance": distance,
+                "source_collection": collection_name,
+                "id": record["id"]
+            }
+            if include_embeddings:
+                chunk["embedding"] = snapshot.get_vector(row)
+            chunks.append(chunk)
+        per_query_chunks.append(chunks)
+    return per_query_chunks
+
+
+def _lexical_query_collection(
+    collection,
+    collection_name: str,
+    query: str,
+    n_results: int,
+    include_embeddings: bool = False
+) -> List[List[Dict[str, Any]]]:
+    """
+    Looks the query up in the collection's BM25 side index and fetches the hit chunks
+    from ChromaDB in one `get`. Returns a single ranked list (or none if there is no index).
+    """
+    index = get_lexical_index(collection_name, create=False)
+    if index is None or len(index) == 0:
+        return []
+
+    hits = index.search(query, k=n_results * 2)
+    if not hits:
+        return []
+
+    include = ['documents', 'metadatas']
+    if include_embeddings:
+        include.append('embeddings')
+    with get_bulkhead("chroma").limit():
+        results = collection.get(ids=[doc_id for doc_id, _ in hits], include=include)
+
+    positions = {doc_id: i for i, doc_id in enumerate(results['ids'])}
+    embeddings = results.get('embeddings') if include_embeddings else None
+    chunks = []
+    for doc_id, score in hits:
+        i = positions.get(doc_id)
+        if i is None:  # indexed but no longer in the collection
+            continue
+        chunk = {
+            "page_content": results['documents'][i],
+            "metadata": results['metadatas'][i],
+            "distance": None,
+            "lexical_score": score,
+            "source_collection": collection_name,
+            "id": doc_id
+        }
+        if embeddings is not None:
+            chunk["embedding"] = embeddings[i]
+        chunks.append(chunk)
+    return [chunks]
+
+
+def embed_retrieval_queries(
+    queries: List[str],
+    tei_service_url: str,
+    mode: Optional[str] = None,
+    batch_size: int = MAX_TEI_BATCH_ITEMS
+) -> List[Optional[List[List[float]]]]:
+    """
+    Embeds the retrieval queries of many transcripts up front, in TEI batches of up to
+    `batch_size` inputs sent concurrently, instead of one TEI call per transcript.
+
+    Returns, per query, the embeddings `retrieve_relevant_chunks(query_embeddings=...)`
+    expects for it (one per query window in "window" mode), or None where its batch failed;
+    those queries are embedded again at retrieval time.
+    """
+    mode = mode or RETRIEVAL_MODE
+    per_query = [split_query_into_windows(query) if mode == "window" else [query] for query in queries]
+    texts = [text for query_texts in per_query for text in query_texts]
+
+    vectors: List[Optional[List[float]]] = [None] * len(texts)
+    futures = {
+        _submit_timed("retrieve.embed_query_batch", embed_texts, texts[start:start + batch_size], tei_service_url)[0]: start
+        for start in range(0, len(texts), batch_size)
+    }
+    for future, start in futures.items():
+        try:
+            batch = future.result()
+            vectors[start:start + len(batch)] = batch
+        except Exception as e:
+            print(f"Error embedding a batch of retrieval queries through TEI: {e}")
+
+    embeddings = []
+    position = 0
+    for query_texts in per_query:
+        group = vectors[position:position + len(query_texts)]
+        position += len(query_texts)
+        embeddings.append(group if all(vector is not None for vector in group) else None)
+    return embeddings
+
+
+def _retrieval_cache_key(
+    query: str,
+    chroma_db_url: str,
+    n_results: int,
+    mode: str,
+    use_tei: bool,
+    diversify: bool,
+    hybrid: bool
+) -> tuple:
+    """
+    Builds the cache key from a hash of the whitespace/case-normalized query, the request
+    parameters and the catalog version, which is bumped on every collection write.
+    """
+    normalized = " ".join(query.split()).lower()
+    query_hash = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return (query_hash, chroma_db_url, n_results, mode, use_tei, diversify, hybrid, get_collection_catalog().version)
+
 
 def retrieve_relevant_chunks(
     query: str,
     chroma_db_url: str,
-    n_results: int = 10
+    n_results: int = 10,
+    timeout: float = COLLECTION_QUERY_TIMEOUT,
+    tei_service_url: Optional[str] = None,
+    mode: Optional[str] = None,
+    use_cache: bool = True,
+    diversify: Optional[bool] = None,
+    hybrid: Optional[bool] = None,
+    query_embeddings: Optional[List[List[float]]] = None
 ) -> List[Dict[str, Any]]:
+    """
+    Retrieves and re-ranks the top N most relevant chunks, serving repeated queries from
+    `retrieval_cache`. Empty or partial results (a collection failed or timed out) are
+    never cached. See `_retrieve_relevant_chunks` for the retrieval itself.
+
+    `query_embeddings` are precomputed TEI embeddings of the query (see
+    `embed_retrieval_queries`); when given, the query is not embedded again.
+    """
+    mode = mode or RETRIEVAL_MODE
+    diversify = RETRIEVAL_MMR if diversify is None else diversify
+    hybrid = HYBRID_RETRIEVAL if hybrid is None else hybrid
+    if not use_cache:
+        chunks, _ = _retrieve_relevant_chunks(
+            query, chroma_db_url, n_results, timeout, tei_service_url, mode, diversify, hybrid, query_embeddings
+        )
+        return chunks
+
+    use_tei = bool(tei_service_url) or query_embeddings is not None
+    key = _retrieval_cache_key(query, chroma_db_url, n_results, mode, use_tei, diversify, hybrid)
+    cached = retrieval_cache.get(key)
+    if cached is not None:
+        print(f"Retrieval cache hit: reusing {len(cached)} chunks.")
+        return list(cached)
+
+    chunks, complete = _retrieve_relevant_chunks(
+        query, chroma_db_url, n_results, timeout, tei_service_url, mode, diversify, hybrid, query_embeddings
+    )
+    if chunks and complete:
+        retrieval_cache.set(key, list(chunks))
+    return chunks
+
+
+def _retrieve_relevant_chunks(
+    query: str,
+    chroma_db_url: str,
+    n_results: int,
+    timeout: float,
+    tei_service_url: Optional[str],
+    mode: str,
+    diversify: bool = False,
+    hybrid: bool = False,
+    query_embeddings: Optional[List[List[float]]] = None
+) -> Tuple[List[Dict[str, Any]], bool]:
     """
     Retrieves and re-ranks the top N most relevant chunks from all available ChromaDB collections.
+
+    Collections are queried concurrently. Any collection that fails or does not answer
+    within `timeout` seconds is left out of the merge instead of stalling the request.
+
+    If `tei_service_url` is set, the query is embedded once through TEI and the same vector
+    is reused for every collection. Otherwise (or if TEI fails) each collection embeds the
+    query text with its own embedding function. Precomputed `query_embeddings` skip that step.
+
+    In "window" mode (see RETRIEVAL_MODE) the query is split into overlapping windows that
+    are embedded in one batch and sent together in one query per collection; the per-window
+    results are merged with reciprocal rank fusion instead of a plain distance sort.
+
+    With `diversify`, all merged candidates (n_results * 2 per collection) go through
+    maximal marginal relevance over their stored embeddings, which drops near-duplicate
+    chunks and may return fewer than n_results.
+
+    With `hybrid`, each collection's BM25 side index is queried concurrently as well and
+    the lexical ranking is fused with the vector rankings by reciprocal rank fusion.
+
+    Read-only collections with an exported snapshot (see SNAPSHOT_COLLECTIONS) are searched
+    in-process over the memory-mapped matrix when a query embedding is available.
+
+    Returns the chunks and whether every collection answered.
     """
     all_retrieved_chunks = []
 
-    try:
-        # Connect to the ChromaDB client
-        client = chromadb.HttpClient(
-            host=chroma_db_url.split('://')[1].split(':')[0],
-            port=int(chroma_db_url.split(':')[-1])
-        )
+    query_texts = split_query_into_windows(query) if mode == "window" else [query]
+
+    if query_embeddings is None and tei_service_url:
+        try:
+            with stage_timer("retrieve.embed_query"):
+                query_embeddings = embed_texts(query_texts, tei_service_url)
+        except BulkheadFull:
+            raise
+        except Exception as e:
+            print(f"Error embedding query through TEI, falling back to collection embeddings: {e}")
 
-        collections = client.list_collections()
-        print(f"🔍 Found collections: {[col.name for col in collections]}")
+    try:
+        # Collection handles come from the process-level catalog, so the steady state
+        # only pays for the queries themselves
+        catalog = get_collection_catalog()
+        with stage_timer("retrieve.catalog"):
+            collections = catalog.get_collections(chroma_db_url)
+        print(f"🔍 Found collections: {[col['name'] for col in collections]}")
 
+        futures = {}
+        started = {}
         for col in collections:
-            collection = client.get_collection(name=col.name)
+            snapshot = get_vector_snapshot(col["name"]) if query_embeddings is not None else None
+            if snapshot is not None:
+                future, started[future] = _submit_timed(
+                    f"retrieve.snapshot_query.{col['name']}",
+                    _snapshot_query_collection, snapshot, col["name"], query_embeddings, n_results, diversify
+                )
+            else:
+                future, started[future] = _submit_timed(
+                    f"retrieve.query.{col['name']}",
+                    _query_collection,
+                    col["collection"], col["name"], query_texts, n_results, query_embeddings, diversify
+                )
+            futures[future] = col["name"]
+        if hybrid:
+            for col in collections:
+                future, started[future] = _submit_timed(
+                    f"retrieve.lexical_query.{col['name']}",
+                    _lexical_query_collection, col["collection"], col["name"], query, n_results, diversify
+                )
+                futures[future] = f"{col['name']} (lexical)"
+        not_done = _wait_for_queries(started, timeout, COLLECTION_QUERY_QUEUE_TIMEOUT)
+
+        ranked_lists = []
+        complete = True
+        # Walk futures in submission order so ties keep a stable collection order
+        for future, collection_name in futures.items():
+            if future in not_done:
+                future.cancel()
+                if not_done[future] == "queued":
+                    print(f"Collection '{collection_name}' query did not start within {COLLECTION_QUERY_QUEUE_TIMEOUT}s. Skipping it.")
+                else:
+                    print(f"Collection '{collection_name}' did not respond within {timeout}s. Skipping it.")
+                _record_dropped_query(collection_name, not_done[future])
+                complete = False
+                continue
+            try:
+                ranked_lists.extend(future.result())
+            except BulkheadFull:
+                raise
+            except Exception as e:
+                print(f"Error querying collection '{collection_name}': {e}. Skipping it.")
+                # The cached handle is stale if the collection was dropped elsewhere. Other errors
+                # leave the catalog (and so the retrieval cache keyed on its version) alone.
+                if _is_missing_collection_error(e):
+                    catalog.invalidate()
+                complete = False
+
+        fused = mode == "window" or hybrid
+        with stage_timer("retrieve.rank"):
+            if fused:
+                print(f"Fusing {len(ranked_lists)} ranked lists ({len(query_texts)} query windows, hybrid={hybrid}).")
+                all_retrieved_chunks = reciprocal_rank_fusion(ranked_lists)
+            else:
+                all_retrieved_chunks = [chunk for ranked in ranked_lists for chunk in ranked]
+                # Sort all chunks by their distance (relevance) score
+                # A smaller distance value means higher relevance
+                all_retrieved_chunks.sort(key=lambda x: x['distance'])
 
-            if collection.metadata:
-                metric = collection.metadata.get("hnsw:space", "cosine")
+            if diversify:
+                if fused:
+                    relevance = [chunk["rrf_score"] for chunk in all_retrieved_chunks]
+                else:
+                    relevance = [-chunk["distance"] for chunk in all_retrieved_chunks]
+                final_chunks = diversify_chunks(all_retrieved_chunks, relevance, n_results)
             else:
-                metric = "cosine"  # fallback default
-
-            results = collection.query(
-                query_texts=[query],
-                n_results=n_results * 2,
-                include=['documents', 'metadatas', 'distances']
-            )
-
-            if results and results['documents']:
-                for i in range(len(results['documents'][0])):
-                    distance = results['distances'][0][i]
-                    # Check if the distance is not None before appending
-                    if distance is not None and distance <= 0.9:
-                        all_retrieved_chunks.append({
-                            "page_content": results['documents'][0][i],
-                            "metadata": results['metadatas'][0][i],
-                            "distance": distance,
-                            "source_collection": col.name
-                        })
-
-        # Sort all chunks by their distance (relevance) score
-        # A smaller distance value means higher relevance
-        all_retrieved_chunks.sort(key=lambda x: x['distance'])
-        
-        # Return only the top n_results from the combined, sorted list
-        final_chunks = all_retrieved_chunks[:n_results]
+                # Return only the top n_results from the combined, sorted list
+                final_chunks = all_retrieved_chunks[:n_results]
 
         print(f"Found and re-ranked {len(final_chunks)} total chunks across collections.")
-        return final_chunks
+        return final_chunks, complete
 
+    except BulkheadFull:
+        # Overloaded rather than empty: the API answers 429
+        raise
     except Exception as e:
         print(f"Error retrieving from ChromaDB: {e}")
-        return []
-
+        return [], False
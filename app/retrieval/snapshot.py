@@ -0,0 +1,248 @@
+import os
+import json
+import mmap
+import shutil
+import threading
+import numpy as np
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+# Read-only knowledge collections are exported here and searched in-process instead of over HTTP
+VECTOR_SNAPSHOT_DIR = os.getenv("VECTOR_SNAPSHOT_DIR", "./data/vector_snapshots")
+SNAPSHOT_COLLECTIONS = [
+    name.strip()
+    for name in os.getenv("SNAPSHOT_COLLECTIONS", "miriad_knowledge,nice_knowledge").split(",")
+    if name.strip()
+]
+SNAPSHOT_DTYPE = os.getenv("SNAPSHOT_DTYPE", "float16")
+EXPORT_PAGE_SIZE = 1000
+SEARCH_BLOCK_ROWS = 65536  # rows converted to float32 at a time while scanning
+
+
+def export_collection_snapshot(
+    collection,
+    collection_name: str,
+    out_dir: Optional[str] = None,
+    dtype: str = SNAPSHOT_DTYPE,
+    page_size: int = EXPORT_PAGE_SIZE
+) -> int:
+    """
+    Snapshots a ChromaDB collection into a directory of memory-mappable files:
+
+        vectors.npy   (n, dim) float16/float32 embedding matrix
+        sq_norms.npy  (n,) float32 squared L2 norms, for exact l2/cosine distances
+        offsets.npy   (n + 1,) int64 byte offsets of each row in payload.bin
+        payload.bin   concatenated UTF-8 JSON rows: {"id", "document", "metadata"}
+        meta.json     row count, dimension, dtype, distance metric, export time
+
+    The snapshot is written next to the target and swapped in with a rename,
+    so readers never see a half-written snapshot. Returns the number of rows exported.
+    """
+    target = Path(out_dir or VECTOR_SNAPSHOT_DIR) / collection_name
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = target.with_name(f".{collection_name}.staging")
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir()
+
+    metric = (collection.metadata or {}).get("hnsw:space", "l2")
+    total = collection.count()
+    print(f"Exporting {total} rows from '{collection_name}' to {target} ({dtype}, metric={metric})...")
+
+    vectors = None
+    sq_norms = np.zeros(total, dtype=np.float32)
+    offsets = np.zeros(total + 1, dtype=np.int64)
+    row = 0
+    with open(staging / "payload.bin", "wb") as payload:
+        for start in range(0, total, page_size):
+            page = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=page_size,
+                offset=start
+            )
+            page_vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            if len(page_vectors) == 0:
+                break
+            if vectors is None:
+                vectors = np.lib.format.open_memmap(
+                    staging / "vectors.npy", mode="w+", dtype=dtype, shape=(total, page_vectors.shape[1])
+                )
+
+            end = row + len(page_vectors)
+            vectors[row:end] = page_vectors
+            sq_norms[row:end] = np.einsum("ij,ij->i", page_vectors, page_vectors)
+            for i, doc_id in enumerate(page["ids"]):
+                encoded = json.dumps({
+                    "id": doc_id,
+                    "document": page["documents"][i],
+                    "metadata": page["metadatas"][i],
+                }).encode("utf-8")
+                payload.write(encoded)
+                offsets[row + i + 1] = offsets[row + i] + len(encoded)
+            row = end
+
+    if vectors is None:
+        vectors = np.lib.format.open_memmap(staging / "vectors.npy", mode="w+", dtype=dtype, shape=(0, 0))
+    vectors.flush()
+    del vectors
+
+    np.save(staging / "sq_norms.npy", sq_norms[:row])
+    np.save(staging / "offsets.npy", offsets[:row + 1])
+    with open(staging / "meta.json", "w") as f:
+        json.dump({
+            "collection": collection_name,
+            "count": row,
+            "dtype": dtype,
+            "metric": metric,
+            "exported_at": datetime.utcnow().isoformat(),
+        }, f)
+
+    # Swap the new snapshot in; open mappings of the old files stay valid until released
+    if target.exists():
+        retired = target.with_name(f".{collection_name}.retired")
+        if retired.exists():
+            shutil.rmtree(retired)
+        os.replace(target, retired)
+        os.replace(staging, target)
+        shutil.rmtree(retired)
+    else:
+        os.replace(staging, target)
+
+    print(f"Exported {row} rows from '{collection_name}'.")
+    return row
+
+
+class VectorSnapshot:
+    """
+    Read-only, memory-mapped view of an exported collection with exact top-k search.
+
+    The matrix and payload are mapped rather than read, so the OS page cache holds a single
+    copy shared by every uvicorn worker on the host.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        with open(self.path / "meta.json") as f:
+            self.meta = json.load(f)
+        self.metric = self.meta.get("metric", "l2")
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        self.sq_norms = np.load(self.path / "sq_norms.npy")
+        self.offsets = np.load(self.path / "offsets.npy", mmap_mode="r")
+        self._payload_file = open(self.path / "payload.bin", "rb")
+        size = os.fstat(self._payload_file.fileno()).st_size
+        self._payload = mmap.mmap(self._payload_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return int(self.meta.get("count", 0))
+
+    def search(self, query_embeddings: List[List[float]], k: int) -> List[List[Tuple[int, float]]]:
+        """
+        Exact k-nearest-neighbour search for one or more query vectors.
+        Distances follow ChromaDB's conventions for the collection's metric
+        (squared L2, 1 - cosine similarity, or 1 - inner product), so existing
+        distance thresholds keep their meaning.
+
+        Returns one list of (row, distance) pairs per query, nearest first.
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        n = len(self)
+        if n == 0 or k <= 0:
+            return [[] for _ in range(len(queries))]
+        k = min(k, n)
+        query_sq_norms = np.einsum("ij,ij->i", queries, queries)
+
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_distances = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, n, SEARCH_BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            dots = queries @ block.T
+            block_norms = self.sq_norms[start:start + len(block)]
+            if self.metric == "cosine":
+                denominator = np.sqrt(np.outer(query_sq_norms, block_norms))
+                distances = 1.0 - dots / np.where(denominator == 0, 1.0, denominator)
+            elif self.metric == "ip":
+                distances = 1.0 - dots
+            else:
+                distances = query_sq_norms[:, None] + block_norms[None, :] - 2.0 * dots
+
+            # Keep a running top-k across blocks
+            rows = np.broadcast_to(np.arange(start, start + len(block)), distances.shape)
+            candidate_rows = np.concatenate([best_rows, rows], axis=1)
+            candidate_distances = np.concatenate([best_distances, distances], axis=1)
+            keep = min(k, candidate_distances.shape[1])
+            top = np.argpartition(candidate_distances, keep - 1, axis=1)[:, :keep]
+            best_rows = np.take_along_axis(candidate_rows, top, axis=1)
+            best_distances = np.take_along_axis(candidate_distances, top, axis=1)
+
+        order = np.argsort(best_distances, axis=1, kind="stable")
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        best_distances = np.take_along_axis(best_distances, order, axis=1)
+        return [
+            [(int(r), float(d)) for r, d in zip(best_rows[q], best_distances[q])]
+            for q in range(len(queries))
+        ]
+
+    def get_row(self, row: int) -> Dict[str, Any]:
+        """Decodes the id, document and metadata stored for a row."""
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self._payload[start:end].decode("utf-8"))
+
+    def get_vector(self, row: int) -> List[float]:
+        return np.asarray(self.vectors[row], dtype=np.float32).tolist()
+
+    def close(self):
+        if isinstance(self._payload, mmap.mmap):
+            self._payload.close()
+        self._payload_file.close()
+
+
+_snapshots: Dict[str, Tuple[float, VectorSnapshot]] = {}
+_registry_lock = threading.Lock()
+
+
+def _snapshot_path(collection_name: str) -> Path:
+    return Path(VECTOR_SNAPSHOT_DIR) / collection_name
+
+
+def get_vector_snapshot(collection_name: str) -> Optional[VectorSnapshot]:
+    """
+    Returns the mapped snapshot for a collection, or None if it was never exported.
+    A snapshot re-exported by another process is picked up via its meta.json mtime.
+    """
+    if collection_name not in SNAPSHOT_COLLECTIONS:
+        return None
+    meta_path = _snapshot_path(collection_name) / "meta.json"
+    try:
+        mtime = meta_path.stat().st_mtime
+    except FileNotFoundError:
+        with _registry_lock:
+            _snapshots.pop(collection_name, None)
+        return None
+
+    with _registry_lock:
+        cached = _snapshots.get(collection_name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            snapshot = VectorSnapshot(str(_snapshot_path(collection_name)))
+        except Exception as e:
+            print(f"Error loading vector snapshot for '{collection_name}': {e}")
+            return None
+        _snapshots[collection_name] = (mtime, snapshot)
+        print(f"Mapped vector snapshot for '{collection_name}' ({len(snapshot)} rows).")
+        return snapshot
+
+
+def drop_vector_snapshot(collection_name: str):
+    """Forgets and deletes the snapshot of a deleted collection."""
+    with _registry_lock:
+        _snapshots.pop(collection_name, None)
+        path = _snapshot_path(collection_name)
+        if path.exists():
+            shutil.rmtree(path)
+
+
+def reset_vector_snapshots():
+    with _registry_lock:
+        _snapshots.clear()
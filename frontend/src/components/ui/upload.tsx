@@ -8,6 +8,18 @@ import { cn } from "../../lib/utils";
 
 
 const API_KEY = import.meta.env.VITE_API_KEY; 
+const DOCUMENTS_API = "http://localhost:8006/documents";
+const JOB_POLL_INTERVAL_MS = 1000;
+// Share of the progress bar reached once each ingestion stage has started
+const STAGE_PROGRESS: Record<string, number> = { hash: 5, load: 10, split: 30, embed: 40, store: 80, delete: 90 };
+
+interface IngestionJob {
+  status: "queued" | "running" | "succeeded" | "failed";
+  stage?: string | null;
+  error?: string | null;
+}
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
 
 interface DocumentUploaderProps {
   onUploadSuccess: (fileInfo: { id: string; filename: string }) => void; 
@@ -44,6 +56,26 @@ export function DocumentUploader({
     maxSize: 1024 * 1024 * 5, // 5MB limit per file
   });
 
+  const waitForIngestionJob = async (jobId: string) => {
+    for (;;) {
+      const response = await fetch(`${DOCUMENTS_API}/jobs/${jobId}`, {
+        headers: { 'X-API-Key': API_KEY },
+      });
+      if (!response.ok) {
+        throw new Error("Could not get the upload's ingestion status.");
+      }
+      const job: IngestionJob = await response.json();
+      if (job.status === "succeeded") {
+        return;
+      }
+      if (job.status === "failed") {
+        throw new Error(job.error || "Ingestion failed.");
+      }
+      setUploadProgress(STAGE_PROGRESS[job.stage ?? ""] ?? 0);
+      await sleep(JOB_POLL_INTERVAL_MS);
+    }
+  };
+
   const handleUpload = async () => {
     if (files.length === 0) {
       toast.error("Please select file(s) first.");
@@ -60,7 +92,7 @@ export function DocumentUploader({
 
 
     try {
-      const response = await fetch("http://localhost:8006/documents/upload/", {
+      const response = await fetch(`${DOCUMENTS_API}/upload/`, {
         method: "POST",
         body: formData,
         headers: {
@@ -76,7 +108,14 @@ export function DocumentUploader({
       }
 
       const result = await response.json();
-      if (result.uploaded_files && Array.isArray(result.uploaded_files)) {
+      if (result.job_id) {
+        // Uploads are ingested in the background: wait for the job to finish
+        await waitForIngestionJob(result.job_id);
+        files.forEach(file => {
+            onUploadSuccess({ id: Date.now().toString() + file.name, filename: file.name });
+        });
+        toast.success(`${files.length} file(s) processed and added to ChromaDB!`);
+      } else if (result.uploaded_files && Array.isArray(result.uploaded_files)) {
           result.uploaded_files.forEach((fileDetail: { id: string; filename: string }) => {
               onUploadSuccess({ id: fileDetail.id, filename: fileDetail.filename });
           });
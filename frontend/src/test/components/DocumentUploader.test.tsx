@@ -166,6 +166,74 @@ describe('DocumentUploader', () => {
     })
   })
 
+  it('waits for a queued ingestion job before reporting success', async () => {
+    mockFetch
+      .mockResolvedValueOnce({
+        ok: true,
+        json: () => Promise.resolve({ job_id: 'job-1', status: 'queued' })
+      } as Response)
+      .mockResolvedValueOnce({
+        ok: true,
+        json: () => Promise.resolve({ status: 'succeeded' })
+      } as Response)
+
+    render(
+      <DocumentUploader
+        onUploadSuccess={mockOnUploadSuccess}
+        onUploadError={mockOnUploadError}
+      />
+    )
+
+    const fileInput = document.querySelector('input[type="file"]')
+    const file = new File(['test content'], 'test.pdf', { type: 'application/pdf' })
+    await userEvent.upload(fileInput!, file)
+    await userEvent.click(await screen.findByText('Upload Document'))
+
+    await waitFor(() => {
+      expect(mockFetch).toHaveBeenCalledWith(
+        'http://localhost:8006/documents/jobs/job-1',
+        expect.objectContaining({
+          headers: {
+            'X-API-Key': expect.any(String)
+          }
+        })
+      )
+      expect(mockOnUploadSuccess).toHaveBeenCalledWith(
+        expect.objectContaining({ filename: 'test.pdf' })
+      )
+    })
+    expect(mockOnUploadError).not.toHaveBeenCalled()
+  })
+
+  it('reports a failed ingestion job as an upload error', async () => {
+    mockFetch
+      .mockResolvedValueOnce({
+        ok: true,
+        json: () => Promise.resolve({ job_id: 'job-2', status: 'queued' })
+      } as Response)
+      .mockResolvedValueOnce({
+        ok: true,
+        json: () => Promise.resolve({ status: 'failed', error: 'Failed to process documents into chunks.' })
+      } as Response)
+
+    render(
+      <DocumentUploader
+        onUploadSuccess={mockOnUploadSuccess}
+        onUploadError={mockOnUploadError}
+      />
+    )
+
+    const fileInput = document.querySelector('input[type="file"]')
+    const file = new File(['test content'], 'test.pdf', { type: 'application/pdf' })
+    await userEvent.upload(fileInput!, file)
+    await userEvent.click(await screen.findByText('Upload Document'))
+
+    await waitFor(() => {
+      expect(mockOnUploadError).toHaveBeenCalledWith('Failed to process documents into chunks.')
+    })
+    expect(mockOnUploadSuccess).not.toHaveBeenCalled()
+  })
+
   it('shows clear button when files are selected', async () => {
     render(
       <DocumentUploader
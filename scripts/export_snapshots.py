@@ -0,0 +1,32 @@
+import os
+import sys
+import chromadb
+
+from app.retrieval.snapshot import SNAPSHOT_COLLECTIONS, export_collection_snapshot
+
+CHROMA_HOST = os.getenv("CHROMA_HOST", "chromadb_service")
+CHROMA_PORT = os.getenv("CHROMA_PORT", "8000")
+
+
+def export_snapshots(collection_names):
+    """
+    Exports read-only ChromaDB collections to memory-mapped snapshots under VECTOR_SNAPSHOT_DIR.
+
+    Args:
+        collection_names (List[str]): The collections to export.
+    """
+    chroma_client = chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
+    print(f"Connected to ChromaDB at http://{CHROMA_HOST}:{CHROMA_PORT}")
+
+    for collection_name in collection_names:
+        try:
+            collection = chroma_client.get_collection(name=collection_name)
+        except chromadb.errors.NotFoundError:
+            print(f"Error: Collection '{collection_name}' not found. Skipping it.")
+            continue
+        export_collection_snapshot(collection, collection_name)
+
+
+if __name__ == "__main__":
+    # Defaults to SNAPSHOT_COLLECTIONS (miriad_knowledge, nice_knowledge)
+    export_snapshots(sys.argv[1:] or SNAPSHOT_COLLECTIONS)
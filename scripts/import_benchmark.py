@@ -0,0 +1,65 @@
+import os
+import re
+import sys
+import subprocess
+from typing import Dict, List, Tuple
+
+# Entry points whose cold start we track
+DEFAULT_MODULES = ["app.main", "app.consumers.rabbitmq_consumer"]
+TOP_N = 15
+
+_IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure_import(module: str) -> List[Tuple[str, int, int, int]]:
+    """
+    Imports `module` in a fresh interpreter with `-X importtime`.
+    Returns (module, self_us, cumulative_us, depth) for every module it imported, in import order.
+    """
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            timings.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return timings
+
+
+def report(module: str, top_n: int = TOP_N) -> Dict[str, float]:
+    """Prints the total cold import time of `module` and its slowest direct and transitive imports."""
+    timings = measure_import(module)
+    total = next((cumulative for name, _, cumulative, _ in timings if name == module), 0)
+    print(f"\n{module}: {total / 1e6:.2f}s cold import, {len(timings)} modules")
+
+    print("  Slowest first-party modules (cumulative):")
+    first_party: Dict[str, int] = {}
+    for name, _, cumulative, _ in timings:
+        if name.split(".")[0] in ("app", "scripts") and name != module:
+            first_party[name] = max(first_party.get(name, 0), cumulative)
+    for name, cumulative in sorted(first_party.items(), key=lambda item: item[1], reverse=True)[:top_n]:
+        print(f"    {cumulative / 1e6:7.3f}s  {name}")
+
+    print("  Slowest third-party packages (cumulative, top-level imports only):")
+    packages: Dict[str, int] = {}
+    for name, _, cumulative, _ in timings:
+        package = name.split(".")[0]
+        if package not in ("app", "scripts") and name == package:
+            packages[package] = max(packages.get(package, 0), cumulative)
+    for package, cumulative in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top_n]:
+        print(f"    {cumulative / 1e6:7.3f}s  {package}")
+
+    return {"module": module, "seconds": total / 1e6}
+
+
+if __name__ == "__main__":
+    # Usage: python scripts/import_benchmark.py [module ...]   (run from the repo root)
+    for module in sys.argv[1:] or DEFAULT_MODULES:
+        report(module)
@@ -7,6 +7,10 @@ from datasets import load_dataset
 from chromadb.utils import embedding_functions
 from typing import List
 
+from app.core import http_client
+from app.core.bulkhead import wait_for_capacity
+from app.retrieval.lexical import index_chunks_lexically, save_lexical_index
+
 # --- Configuration ---
 CHROMA_HOST = os.getenv("CHROMA_HOST", "chromadb_service")
 CHROMA_PORT = os.getenv("CHROMA_PORT", "8000")
@@ -27,10 +31,12 @@ try:
 
     def tei_embedding_function(texts):
         tei_url = f"http://{TEI_HOST}:{TEI_PORT}/embed"
-        response = requests.post(
-            tei_url,
-            json={"inputs": texts}
-        )
+        with wait_for_capacity():
+            response = http_client.post(
+                "tei",
+                tei_url,
+                json={"inputs": texts}
+            )
         response.raise_for_status()
         return response.json()
 
@@ -109,6 +115,7 @@ def index_miriad_dataset():
                         embeddings=embeddings,
                         ids=current_batch_ids
                     )
+                    index_chunks_lexically(collection_name, current_batch_ids, current_batch_docs, persist=False)
                     print(f"Ingested {document_counter} chunks from Miriad dataset.")
                 except requests.exceptions.HTTPError as e:
                     print(f"Error getting embeddings from TEI: {e}")
@@ -127,11 +134,13 @@ def index_miriad_dataset():
                 embeddings=embeddings,
                 ids=current_batch_ids
             )
+            index_chunks_lexically(collection_name, current_batch_ids, current_batch_docs, persist=False)
             print(f"Ingested final {len(current_batch_docs)} chunks from Miriad dataset.")
         except requests.exceptions.HTTPError as e:
             print(f"Error getting embeddings from TEI (final batch): {e}")
             raise e
 
+    save_lexical_index(collection_name)
     print(f"\nIndexing complete! Total chunks added: {document_counter}.")
 
 if __name__ == "__main__":
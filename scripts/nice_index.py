@@ -8,6 +8,8 @@ import hashlib
 from chromadb.utils import embedding_functions
 import tiktoken
 
+from app.retrieval.lexical import index_chunks_lexically, save_lexical_index
+
 # --- Configuration ---
 CHROMA_HOST = os.getenv("CHROMA_HOST", "chromadb_service")
 CHROMA_PORT = os.getenv("CHROMA_PORT", "8000")
@@ -334,6 +336,7 @@ def index_nice_knowledge():
                     ids=current_batch_ids,
                     metadatas=current_batch_metadata
                 )
+                index_chunks_lexically(collection_name, current_batch_ids, current_batch_docs, persist=False)
                 total_ingested += len(current_batch_docs)
                 print(f"Ingested {total_ingested} / {len(all_chunks_to_add)} chunks.")
                 
@@ -351,11 +354,13 @@ def index_nice_knowledge():
                 ids=current_batch_ids,
                 metadatas=current_batch_metadata
             )
+            index_chunks_lexically(collection_name, current_batch_ids, current_batch_docs, persist=False)
             total_ingested += len(current_batch_docs)
             print(f"Ingested final batch. Total: {total_ingested} chunks.")
         except Exception as e:
             print(f"Error ingesting final batch: {e}")
             
+    save_lexical_index(collection_name)
     print("\nIndexing complete! The 'nice_knowledge' collection is ready to use.")
 
 def fetch_nice_guidance_index():
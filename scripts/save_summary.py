@@ -1,4 +1,6 @@
 import os
+import threading
+from typing import List
 from sqlalchemy import create_engine, Column, String, Text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
@@ -8,10 +10,6 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set.")
 
-# Set up the database connection
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
 # Define a base for your model classes
 Base = declarative_base()
 
@@ -22,11 +20,33 @@ class Summary(Base):
     title = Column(String)
     content = Column(Text)
 
-# Create the table in the database
-Base.metadata.create_all(bind=engine)
+# The database is connected to (and the table created) on first use rather than at import,
+# so the API and the consumer start even while the database is unreachable
+engine = None
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
+_engine_lock = threading.Lock()
 
-def save_summary_to_db(summary_data: dict):
-    """Saves a summary to the database."""
+
+def get_engine():
+    """Returns the engine, creating it and the summaries table on first call."""
+    global engine
+    with _engine_lock:
+        if engine is None:
+            new_engine = create_engine(DATABASE_URL)
+            # Create the table in the database
+            Base.metadata.create_all(bind=new_engine)
+            _session_factory.configure(bind=new_engine)
+            engine = new_engine
+    return engine
+
+
+def SessionLocal():
+    """Opens a database session (connecting on first use)."""
+    get_engine()
+    return _session_factory()
+
+def _insert_summary(summary_data: dict):
+    """Saves one summary in its own transaction; raises if it cannot be saved."""
     db = SessionLocal()
     try:
         new_summary = Summary(
@@ -36,10 +56,51 @@ def save_summary_to_db(summary_data: dict):
         )
         db.add(new_summary)
         db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def save_summary_to_db(summary_data: dict):
+    """Saves a summary to the database."""
+    try:
+        _insert_summary(summary_data)
         print("Summary saved successfully!")
     except Exception as e:
-        db.rollback()
         print(f"Failed to save summary: {e}")
+
+
+def save_summaries_batch_to_db(summaries: List[dict]) -> List[dict]:
+    """
+    Saves several summaries in a single transaction. If the batch fails (e.g. one duplicate id),
+    the summaries are retried one by one so a single bad row cannot lose the others.
+    Returns the summaries that could not be saved ([] if all were).
+    """
+    if not summaries:
+        return []
+    db = SessionLocal()
+    try:
+        db.add_all([
+            Summary(id=data['id'], title=data['title'], content=data['content'])
+            for data in summaries
+        ])
+        db.commit()
+        print(f"Saved {len(summaries)} summaries in one batch.")
+        return []
+    except Exception as e:
+        db.rollback()
+        print(f"Failed to save batch of {len(summaries)} summaries, retrying individually: {e}")
     finally:
         db.close()
 
+    failed = []
+    for summary_data in summaries:
+        try:
+            _insert_summary(summary_data)
+        except Exception as e:
+            print(f"Failed to save summary {summary_data['id']}: {e}")
+            failed.append(summary_data)
+    return failed
+
@@ -33,6 +33,32 @@ def event_loop():
     yield loop
     loop.close()
 
+@pytest.fixture(autouse=True)
+def reset_retrieval_caches(tmp_path, monkeypatch):
+    """Start every test with an empty collection catalog, retrieval and summary caches, lexical indexes, snapshots and ingestion manifests."""
+    from app.retrieval.catalog import invalidate_collection_catalog
+    from app.retrieval.retrieve import retrieval_cache
+    from app.retrieval.lexical import reset_lexical_indexes
+    from app.retrieval.snapshot import reset_vector_snapshots
+    from app.core.pipeline import summary_cache
+    from app.data_ingestion.manifest import reset_ingestion_manifests
+    monkeypatch.setattr("app.retrieval.lexical.LEXICAL_INDEX_DIR", str(tmp_path / "lexical_index"))
+    monkeypatch.setattr("app.retrieval.snapshot.VECTOR_SNAPSHOT_DIR", str(tmp_path / "vector_snapshots"))
+    monkeypatch.setattr("app.data_ingestion.manifest.INGESTION_MANIFEST_DIR", str(tmp_path / "ingestion_manifest"))
+    invalidate_collection_catalog()
+    retrieval_cache.clear()
+    retrieval_cache.reset_stats()
+    reset_lexical_indexes()
+    reset_vector_snapshots()
+    reset_ingestion_manifests()
+    summary_cache.clear()
+    yield
+    invalidate_collection_catalog()
+    retrieval_cache.clear()
+    reset_lexical_indexes()
+    reset_vector_snapshots()
+    reset_ingestion_manifests()
+
 @pytest.fixture
 def mock_env_vars():
     """Mock environment variables for testing."""
@@ -44,7 +44,7 @@ def test_e2e_upload_to_summary_flow():
     try:
         # 1) Upload small file
         files = [("files", ("it.txt", io.BytesIO(b"hello world"), "text/plain"))]
-        r = client.post("/documents/upload/", headers=headers, files=files)
+        r = client.post("/documents/upload/?wait=true", headers=headers, files=files)
         assert r.status_code == 200
 
         # 2) List collections
@@ -156,3 +156,9 @@ def test_get_collections_metadata_endpoint():
         assert data["documents"]["last_updated"] is None  # No metadata set
 
 
+def test_get_retrieval_cache_stats_endpoint():
+    app = build_app_with_collections_router()
+    client = TestClient(app)
+    response = client.get("/collections/retrieval_cache")
+    assert response.status_code == 200
+    assert {"hits", "misses", "size", "hit_rate"}.issubset(response.json().keys())
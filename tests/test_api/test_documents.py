@@ -99,6 +99,28 @@ def test_delete_user_collection(test_client: TestClient, api_headers, mock_chrom
         assert "deleted" in response.json()["message"]
 
 
+def test_delete_user_collection_invalidates_catalog(test_client: TestClient, api_headers, mock_chroma_client):
+    from app.retrieval.catalog import get_collection_catalog
+    version = get_collection_catalog().version
+    with patch("app.backend.api.documents.get_client", return_value=mock_chroma_client):
+        response = test_client.delete("/documents/collections/user", headers=api_headers)
+        assert response.status_code == 200
+    assert get_collection_catalog().version == version + 1
+
+
+def test_delete_user_collection_forgets_what_ingestion_recorded(test_client: TestClient, api_headers, mock_chroma_client):
+    from app.core.pipeline import USER_UPLOAD_COLLECTION
+    from app.data_ingestion.manifest import get_ingestion_manifest
+
+    # Ingestion and the delete endpoint must agree on the manifest's collection name
+    manifest = get_ingestion_manifest(USER_UPLOAD_COLLECTION)
+    manifest.record_file("file1.pdf", "abc", {})
+    manifest.save()
+    with patch("app.backend.api.documents.get_client", return_value=mock_chroma_client):
+        response = test_client.delete("/documents/collections/user", headers=api_headers)
+        assert response.status_code == 200
+    assert not get_ingestion_manifest(USER_UPLOAD_COLLECTION).is_unchanged("file1.pdf", "abc")
+
 def test_document_metadata_stores_clean_filenames():
     """Test that document metadata stores clean filenames, not full paths."""
     from app.data_ingestion.split_and_chunk import split_documents_into_chunks
@@ -152,25 +174,119 @@ def test_upload_no_files_returns_400(test_client: TestClient, api_headers):
 
 
 def test_upload_documents_happy_path(test_client: TestClient, api_headers, mock_chroma_client):
-    # Patch chroma client and ingestion/storage pipelines
-    from unittest.mock import MagicMock
-    
-    # Create proper mock Document objects that our code expects
-    mock_doc = MagicMock()
-    mock_doc.metadata = {"source": "test.txt"}
-    mock_doc.page_content = "test content"
+    # Patch chroma client and the ingestion pipeline
+    result = {"files": 2, "skipped_files": 0, "chunks": 1, "embedded": 1, "deleted": 0}
     
     with (
         patch("app.backend.api.documents.get_client", return_value=mock_chroma_client),
-        patch("app.backend.api.documents.run_ingestion_pipeline", return_value=[mock_doc]),
-        patch("app.backend.api.documents.run_embedding_and_storage_pipeline", return_value=None),
+        patch("app.backend.api.documents.run_incremental_ingestion_pipeline", return_value=result),
     ):
         files = [
             ("files", ("a.txt", io.BytesIO(b"hello"), "text/plain")),
             ("files", ("b.txt", io.BytesIO(b"world"), "text/plain")),
         ]
-        response = test_client.post("/documents/upload/", headers=api_headers, files=files)
+        response = test_client.post("/documents/upload/?wait=true", headers=api_headers, files=files)
         assert response.status_code == 200
         assert "Successfully processed" in response.json()["message"]
 
 
+
+
+def test_upload_ingests_only_its_own_files_in_private_dir(test_client: TestClient, api_headers):
+    import os
+
+    seen = []
+
+    def fake_ingestion(directory, progress=None):
+        seen.append((directory, sorted(os.listdir(directory))))
+        return {"files": 1, "skipped_files": 0, "chunks": 1, "embedded": 1, "deleted": 0}
+
+    with patch("app.backend.api.documents.run_incremental_ingestion_pipeline", side_effect=fake_ingestion):
+        first = test_client.post("/documents/upload/?wait=true", headers=api_headers,
+                                 files=[("files", ("../../etc/a.txt", io.BytesIO(b"a" * 3_000_000), "text/plain"))])
+        second = test_client.post("/documents/upload/?wait=true", headers=api_headers,
+                                  files=[("files", ("b.txt", io.BytesIO(b"b"), "text/plain"))])
+
+    assert first.status_code == 200 and second.status_code == 200
+    (dir_a, files_a), (dir_b, files_b) = seen
+    assert dir_a != dir_b
+    assert files_a == ["a.txt"]
+    assert files_b == ["b.txt"]
+    # Scratch directories are removed once the request is done
+    assert not os.path.exists(dir_a) and not os.path.exists(dir_b)
+
+
+def _poll_ingestion(test_client, api_headers, job_id, timeout=2.0):
+    import time
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = test_client.get(f"/documents/jobs/{job_id}", headers=api_headers).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_upload_queues_ingestion_job_with_stage_counts(test_client: TestClient, api_headers):
+    def fake_embed(chunks, tei_url, progress=None):
+        return [{"text": c.page_content, "metadata": c.metadata, "embedding": [0.1]} for c in chunks]
+
+    with (
+        patch("app.core.pipeline.create_embeddings", side_effect=fake_embed) as mock_embed,
+        patch("app.core.pipeline.store_chunks_in_chroma", return_value=1) as mock_store,
+    ):
+        response = test_client.post(
+            "/documents/upload/", headers=api_headers,
+            files=[("files", ("a.txt", io.BytesIO(b"hello world"), "text/plain"))],
+        )
+        assert response.status_code == 202
+        job = _poll_ingestion(test_client, api_headers, response.json()["job_id"])
+
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"files": 1, "skipped_files": 0, "chunks": 1, "embedded": 1, "deleted": 0}
+    stages = {stage["name"]: stage for stage in job["stages"]}
+    assert list(stages) == ["hash", "load", "split", "embed", "store"]
+    assert stages["load"]["counts"] == {"files": 1, "pages": 1}
+    assert stages["split"]["counts"] == {"chunks": 1}
+    assert set(stages["load"]["throughput"]) == {"files", "pages"}
+    assert mock_embed.call_args.kwargs["progress"] is not None
+    assert mock_store.call_args.kwargs["progress"] is not None
+
+
+def test_ingestion_job_failure_and_unknown_ids(test_client: TestClient, api_headers):
+    with patch("app.core.pipeline.run_ingestion_pipeline", return_value=[]):
+        response = test_client.post(
+            "/documents/upload/", headers=api_headers,
+            files=[("files", ("a.txt", io.BytesIO(b"x"), "text/plain"))],
+        )
+        job = _poll_ingestion(test_client, api_headers, response.json()["job_id"])
+    assert job["status"] == "failed"
+    assert "Failed to process documents" in job["error"]
+    assert test_client.get("/documents/jobs/missing", headers=api_headers).status_code == 404
+
+
+def test_upload_queue_full_returns_503(test_client: TestClient, api_headers):
+    with patch("app.backend.api.documents.ingestion_jobs.max_pending", 0):
+        response = test_client.post(
+            "/documents/upload/", headers=api_headers,
+            files=[("files", ("a.txt", io.BytesIO(b"x"), "text/plain"))],
+        )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "30"
+
+
+def test_reupload_of_unchanged_file_is_skipped(test_client: TestClient, api_headers):
+    def fake_embed(chunks, tei_url, progress=None):
+        return [{"text": c.page_content, "metadata": c.metadata, "embedding": [0.1]} for c in chunks]
+
+    files = [("files", ("a.txt", io.BytesIO(b"hello world"), "text/plain"))]
+    with (
+        patch("app.core.pipeline.create_embeddings", side_effect=fake_embed) as mock_embed,
+        patch("app.core.pipeline.store_chunks_in_chroma", return_value=1),
+    ):
+        first = test_client.post("/documents/upload/?wait=true", headers=api_headers, files=files)
+        files = [("files", ("a.txt", io.BytesIO(b"hello world"), "text/plain"))]
+        second = test_client.post("/documents/upload/?wait=true", headers=api_headers, files=files)
+
+    assert first.status_code == 200 and second.status_code == 200
+    assert mock_embed.call_count == 1
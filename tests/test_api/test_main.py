@@ -5,17 +5,20 @@ import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 
+
 def test_read_root(test_client: TestClient):
     """Test the root endpoint."""
     response = test_client.get("/")
     assert response.status_code == 200
     assert response.json()["message"] == "Medical Conversation RAG API is running. Visit /docs for API documentation."
 
+
 def test_generate_summary_without_api_key(test_client: TestClient):
     """Test that summary generation requires API key."""
     response = test_client.post("/summaries/generate/", json={"text": "Test conversation"})
     assert response.status_code == 403
 
+
 def test_generate_summary_with_valid_api_key(test_client: TestClient, api_headers):
     """Test summary generation with valid API key."""
     response = test_client.post(
@@ -26,6 +29,7 @@ def test_generate_summary_with_valid_api_key(test_client: TestClient, api_header
     # This might fail if the RAG pipeline isn't mocked, but we're testing the endpoint structure
     assert response.status_code in [200, 500]  # 500 if RAG pipeline fails, 200 if it works
 
+
 def test_generate_summary_empty_text(test_client: TestClient, api_headers):
     """Test summary generation with empty text."""
     response = test_client.post(
@@ -36,7 +40,162 @@ def test_generate_summary_empty_text(test_client: TestClient, api_headers):
     # Should handle empty text appropriately
     assert response.status_code in [200, 400, 422]
 
+
 def test_api_docs_available(test_client: TestClient):
     """Test that API documentation is available."""
     response = test_client.get("/docs")
-    assert response.status_code == 200 
\ No newline at end of file
+    assert response.status_code == 200
+
+
+def test_metrics_endpoint_exposes_stage_histograms(test_client: TestClient):
+    """Test that /metrics renders the per-stage histograms in Prometheus format."""
+    from app.core.metrics import stage_metrics
+    stage_metrics.observe("generate.tgi", 0.2)
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'rag_stage_duration_seconds_count{stage="generate.tgi"}' in response.text
+
+
+def test_generate_summary_returns_server_timing_header(test_client: TestClient, api_headers):
+    """Test that the Server-Timing header carries the pipeline spans when enabled."""
+    from unittest.mock import patch
+    from app.core.metrics import stage_timer
+
+    def fake_pipeline(*args, **kwargs):
+        with stage_timer("pipeline.generate"):
+            return "summary", "summary-id"
+
+    with (
+        patch("app.main.SERVER_TIMING", True),
+        patch("app.core.pipeline.run_retrieval_and_generation_pipeline_with_id", side_effect=fake_pipeline),
+    ):
+        response = test_client.post("/summaries/generate/", json={"text": "hello"}, headers=api_headers)
+    assert response.status_code == 200
+    assert response.headers["Server-Timing"].startswith("pipeline.generate;dur=")
+
+
+def test_stream_summary_emits_token_and_done_events(test_client: TestClient, api_headers):
+    """Test that the streaming endpoint proxies tokens as server-sent events."""
+    from unittest.mock import patch
+
+    with patch("app.main.stream_retrieval_and_generation_pipeline", return_value=iter(["Hello", " world"])):
+        response = test_client.post("/summaries/generate/stream", json={"text": "hello"}, headers=api_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert 'event: token\ndata: {"text": "Hello"}' in response.text
+    assert 'event: done\ndata: {"summary": "Hello world", "summary_id": "' in response.text
+
+
+def test_stream_summary_passes_temperature_through(test_client: TestClient, api_headers):
+    """Test that the streaming endpoint honours the requested temperature."""
+    from unittest.mock import patch
+
+    with patch("app.main.stream_retrieval_and_generation_pipeline", return_value=iter(["Hi"])) as mock_stream:
+        response = test_client.post("/summaries/generate/stream", json={"text": "hello", "temperature": 0}, headers=api_headers)
+    assert response.status_code == 200
+    assert mock_stream.call_args.kwargs["temperature"] == 0
+
+
+def test_stream_summary_returns_429_when_tgi_is_saturated(test_client: TestClient, api_headers):
+    """Test that a full TGI bulkhead rejects a stream with 429 before the response starts."""
+    import threading
+    from unittest.mock import patch
+    from app.core import bulkhead
+
+    tgi = bulkhead.Bulkhead("tgi", max_concurrent=1, max_queued=0, max_wait=1, retry_after=7)
+    entered, release = threading.Event(), threading.Event()
+
+    def hold():
+        with tgi.limit():
+            entered.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    with (
+        patch.dict(bulkhead.bulkheads, {"tgi": tgi}),
+        patch("app.core.pipeline._retrieve_summary_context", return_value=[{"page_content": "c", "metadata": {}}]),
+        patch("app.core.pipeline.summary_prompt_fits", return_value=True),
+    ):
+        holder.start()
+        entered.wait()
+        try:
+            response = test_client.post("/summaries/generate/stream", json={"text": "hello"}, headers=api_headers)
+        finally:
+            release.set()
+            holder.join()
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+
+def test_stream_summary_without_context_returns_404(test_client: TestClient, api_headers):
+    """Test that the streaming endpoint reports missing context before streaming."""
+    from unittest.mock import patch
+
+    with patch("app.main.stream_retrieval_and_generation_pipeline", return_value=None):
+        response = test_client.post("/summaries/generate/stream", json={"text": "hello"}, headers=api_headers)
+    assert response.status_code == 404
+
+
+def test_get_summary_returns_summary_still_queued_for_writing(test_client: TestClient, api_headers):
+    """Test that a summary id returned by generation resolves before its row is written."""
+    from unittest.mock import patch
+
+    pending = {"id": "queued-id", "title": "t", "content": "c"}
+    with patch("app.backend.api.summaries_store.summary_writer.get_pending", return_value=pending):
+        response = test_client.get("/summaries/get/queued-id", headers=api_headers)
+    assert response.status_code == 200
+    assert response.json() == pending
+
+
+def test_batch_summaries_stream_ndjson(test_client: TestClient, api_headers):
+    """Test that the batch endpoint streams one JSON line per conversation."""
+    import json
+    from unittest.mock import patch
+
+    results = [{"index": 1, "summary": "b", "summary_id": "id-b"}, {"index": 0, "error": "failed"}]
+    with patch("app.main.run_batch_retrieval_and_generation_pipeline", return_value=iter(results)) as mock_batch:
+        response = test_client.post(
+            "/summaries/generate/batch",
+            json={"conversations": [{"text": "a"}, {"text": "b", "file_name": "f"}]},
+            headers=api_headers,
+        )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == results
+    assert mock_batch.call_args.args[0] == [{"text": "a", "title": None}, {"text": "b", "title": "f"}]
+
+
+def test_batch_summaries_rejects_empty_conversations(test_client: TestClient, api_headers):
+    """Test that the batch endpoint validates its input before starting."""
+    response = test_client.post("/summaries/generate/batch", json={"conversations": []}, headers=api_headers)
+    assert response.status_code == 400
+    response = test_client.post("/summaries/generate/batch", json={"conversations": [{"text": " "}]}, headers=api_headers)
+    assert response.status_code == 400
+
+
+def test_generate_summary_returns_429_when_a_dependency_is_saturated(test_client: TestClient, api_headers):
+    """Test that bulkhead rejections surface as 429 with Retry-After instead of 500."""
+    from unittest.mock import patch
+    from app.core.bulkhead import BulkheadFull
+
+    with patch("app.core.pipeline.run_retrieval_and_generation_pipeline_with_id", side_effect=BulkheadFull("tgi", 10)):
+        response = test_client.post("/summaries/generate/", json={"text": "hello"}, headers=api_headers)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "10"
+
+
+def test_importing_app_defers_heavy_dependencies():
+    """Startup must not pull in dataset/tokenizer/indexing modules or open a database engine."""
+    import os
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, app.main, scripts.save_summary as db, app.backend.api.collections as c; "
+        "heavy = ['datasets', 'tiktoken', 'scripts.index_miriad', 'scripts.nice_index', 'PyPDF2']; "
+        "print([m for m in heavy if m in sys.modules], db.engine is None, c.chroma_client is None)"
+    )
+    env = {**os.environ, "DATABASE_URL": "sqlite:////tmp/rag_import_test.db", "API_KEY": "test-api-key"}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[] True True"
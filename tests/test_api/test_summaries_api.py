@@ -24,7 +24,7 @@ def test_summaries_router_returns_400_on_empty_text():
 def test_summaries_router_returns_200_on_success():
     app = build_app_with_summaries_router()
     client = TestClient(app)
-    with patch("app.backend.api.summaries.run_retrieval_and_generation_pipeline", return_value="ok"):
+    with patch("app.core.pipeline.run_retrieval_and_generation_pipeline", return_value="ok"):
         response = client.post("/summaries/generate/", params={"transcribed_conversation": "hello"})
         assert response.status_code == 200
         assert response.json().get("summary") == "ok"
@@ -33,7 +33,7 @@ def test_summaries_router_returns_200_on_success():
 def test_summaries_router_returns_500_on_failure():
     app = build_app_with_summaries_router()
     client = TestClient(app)
-    with patch("app.backend.api.summaries.run_retrieval_and_generation_pipeline", return_value=None):
+    with patch("app.core.pipeline.run_retrieval_and_generation_pipeline", return_value=None):
         response = client.post("/summaries/generate/", params={"transcribed_conversation": "hello"})
         assert response.status_code == 500
 
@@ -0,0 +1,53 @@
+"""
+Tests for the summary jobs API
+"""
+import time
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+
+def _poll(test_client, api_headers, job_id, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = test_client.get(f"/summaries/jobs/{job_id}", headers=api_headers).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_summary_job_runs_pipeline_and_reports_result(test_client: TestClient, api_headers):
+    def fake_pipeline(text, progress=None, **kwargs):
+        progress("retrieve")
+        progress("generate")
+        return "summary", "summary-id"
+
+    with patch("app.backend.api.summary_jobs.run_retrieval_and_generation_pipeline_with_id", side_effect=fake_pipeline):
+        response = test_client.post("/summaries/jobs/", json={"text": "hello"}, headers=api_headers)
+        assert response.status_code == 202
+        job = _poll(test_client, api_headers, response.json()["job_id"])
+
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"summary": "summary", "summary_id": "summary-id"}
+    assert [stage["name"] for stage in job["stages"]] == ["retrieve", "generate"]
+
+
+def test_summary_job_without_summary_fails(test_client: TestClient, api_headers):
+    with patch("app.backend.api.summary_jobs.run_retrieval_and_generation_pipeline_with_id", return_value=(None, None)):
+        response = test_client.post("/summaries/jobs/", json={"text": "hello"}, headers=api_headers)
+        job = _poll(test_client, api_headers, response.json()["job_id"])
+    assert job["status"] == "failed"
+    assert "Could not generate summary" in job["error"]
+
+
+def test_summary_job_rejects_empty_text_and_unknown_ids(test_client: TestClient, api_headers):
+    assert test_client.post("/summaries/jobs/", json={"text": " "}, headers=api_headers).status_code == 400
+    assert test_client.get("/summaries/jobs/missing", headers=api_headers).status_code == 404
+    assert test_client.get("/summaries/jobs/missing").status_code == 403
+
+
+def test_summary_job_queue_full_returns_503(test_client: TestClient, api_headers):
+    with patch("app.backend.api.summary_jobs.summary_jobs.max_pending", 0):
+        response = test_client.post("/summaries/jobs/", json={"text": "hello"}, headers=api_headers)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "30"
@@ -0,0 +1,71 @@
+"""
+Tests for core.bulkhead (per-dependency concurrency limits)
+"""
+import threading
+import pytest
+
+from app.core.bulkhead import Bulkhead, BulkheadFull, wait_for_capacity, render_bulkheads_prometheus
+
+
+def _hold(bulkhead, entered, release):
+    with bulkhead.limit():
+        entered.set()
+        release.wait(2)
+
+
+def test_rejects_when_slots_and_queue_are_full():
+    bulkhead = Bulkhead("dep", max_concurrent=1, max_queued=0, max_wait=1, retry_after=3)
+    entered, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=_hold, args=(bulkhead, entered, release))
+    holder.start()
+    entered.wait(2)
+
+    with pytest.raises(BulkheadFull) as excinfo:
+        with bulkhead.limit():
+            pass
+    assert excinfo.value.retry_after == 3
+    assert bulkhead.stats()["active"] == 1
+    assert bulkhead.stats()["rejected"] == 1
+
+    release.set()
+    holder.join(2)
+    with bulkhead.limit():  # the slot is free again
+        assert bulkhead.stats()["active"] == 1
+    assert bulkhead.stats()["admitted"] == 2
+
+
+def test_queued_call_times_out():
+    bulkhead = Bulkhead("dep", max_concurrent=1, max_queued=5, max_wait=0.05)
+    entered, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=_hold, args=(bulkhead, entered, release))
+    holder.start()
+    entered.wait(2)
+
+    with pytest.raises(BulkheadFull):
+        with bulkhead.limit():
+            pass
+    assert bulkhead.stats()["queued"] == 0
+    release.set()
+    holder.join(2)
+
+
+def test_wait_for_capacity_queues_past_the_limits():
+    bulkhead = Bulkhead("dep", max_concurrent=1, max_queued=0, max_wait=0.01)
+    entered, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=_hold, args=(bulkhead, entered, release))
+    holder.start()
+    entered.wait(2)
+
+    threading.Timer(0.1, release.set).start()
+    with wait_for_capacity():
+        with bulkhead.limit():
+            pass
+    holder.join(2)
+    assert bulkhead.stats()["rejected"] == 0
+    assert bulkhead.stats()["admitted"] == 2
+
+
+def test_render_prometheus_lists_every_dependency():
+    text = render_bulkheads_prometheus()
+    for name in ("tgi", "tei", "chroma", "postgres"):
+        assert f'rag_bulkhead_queued{{dependency="{name}"}}' in text
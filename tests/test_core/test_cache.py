@@ -0,0 +1,30 @@
+"""
+Tests for core.cache.TTLCache
+"""
+from unittest.mock import patch
+
+from app.core.cache import TTLCache
+
+
+def test_ttl_cache_lru_eviction_and_counters():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" becomes most recently used
+    cache.set("c", 3)           # evicts "b"
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+    assert stats["size"] == 2
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(max_size=10, ttl=5)
+    with patch("app.core.cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+    with patch("app.core.cache.time.monotonic", return_value=106.0):
+        assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
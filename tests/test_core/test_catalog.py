@@ -0,0 +1,53 @@
+"""
+Tests for retrieval.catalog.CollectionCatalog
+"""
+from unittest.mock import patch
+
+from app.retrieval.catalog import CollectionCatalog
+
+
+class MockCollection:
+    def __init__(self, name, metadata=None):
+        self.name = name
+        self.metadata = metadata
+
+
+class CountingClient:
+    def __init__(self):
+        self.list_calls = 0
+        self.get_calls = 0
+    def list_collections(self):
+        self.list_calls += 1
+        return [MockCollection("documents"), MockCollection("nice_knowledge")]
+    def get_collection(self, name):
+        self.get_calls += 1
+        metadata = {"hnsw:space": "l2"} if name == "nice_knowledge" else None
+        return MockCollection(name, metadata)
+
+
+def test_catalog_reuses_listing_until_invalidated():
+    client = CountingClient()
+    catalog = CollectionCatalog(ttl=60)
+    with patch("chromadb.HttpClient", return_value=client) as mock_http:
+        first = catalog.get_collections("http://chromadb:8000")
+        second = catalog.get_collections("http://chromadb:8000")
+        assert first is second
+        assert [c["metric"] for c in first] == ["cosine", "l2"]
+        assert client.list_calls == 1 and client.get_calls == 2
+        assert mock_http.call_count == 1
+
+        version = catalog.version
+        catalog.invalidate()
+        assert catalog.version == version + 1
+        catalog.get_collections("http://chromadb:8000")
+        assert client.list_calls == 2
+
+
+def test_catalog_refreshes_after_ttl():
+    client = CountingClient()
+    catalog = CollectionCatalog(ttl=0)
+    with patch("chromadb.HttpClient", return_value=client):
+        catalog.get_collections("http://chromadb:8000")
+        catalog.get_collections("http://chromadb:8000")
+        assert client.list_calls == 2
+
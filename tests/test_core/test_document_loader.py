@@ -2,7 +2,6 @@
 Tests for document_loader.load_documents
 """
 from pathlib import Path
-import io
 import os
 import pytest
 
@@ -29,3 +28,54 @@ def test_load_documents_loads_txt_and_injects_metadata(tmp_path: Path):
     assert "upload_date" in doc.metadata
 
 
+def test_parallel_load_matches_serial_order_and_metadata(tmp_path: Path):
+    d = tmp_path / "docs"
+    (d / "sub").mkdir(parents=True)
+    (d / "b.txt").write_text("second")
+    (d / "a.txt").write_text("first")
+    (d / "sub" / "c.txt").write_text("third")
+
+    serial = load_documents(str(d), workers=1)
+    parallel = load_documents(str(d), workers=2)
+
+    assert [doc.page_content for doc in serial] == ["first", "second", "third"]
+    assert [doc.page_content for doc in parallel] == ["first", "second", "third"]
+    assert [doc.metadata["source"] for doc in parallel] == ["a.txt", "b.txt", "c.txt"]
+    # One upload date per load
+    assert len({doc.metadata["upload_date"] for doc in parallel}) == 1
+
+
+def test_parallel_loads_share_one_process_pool(tmp_path: Path):
+    from app.data_ingestion import document_loader
+
+    d = tmp_path / "docs"
+    d.mkdir()
+    (d / "a.txt").write_text("first")
+    try:
+        load_documents(str(d), workers=2)
+        pool = document_loader._loader_pool
+        assert pool is not None
+        assert [doc.page_content for doc in load_documents(str(d), workers=2)] == ["first"]
+        assert document_loader._loader_pool is pool
+    finally:
+        document_loader.shutdown_loader_pool()
+    assert document_loader._loader_pool is None
+
+
+def test_large_pdfs_are_split_into_page_ranges(tmp_path: Path):
+    from pypdf import PdfWriter
+    from app.data_ingestion.document_loader import _plan_tasks, _load_pdf_pages
+
+    pdf = tmp_path / "guide.pdf"
+    writer = PdfWriter()
+    for _ in range(5):
+        writer.add_blank_page(width=72, height=72)
+    with open(pdf, "wb") as f:
+        writer.write(f)
+
+    tasks = _plan_tasks([pdf], pages_per_task=2)
+    assert [args[1:] for _, _, args in tasks] == [(0, 2), (2, 4), (4, 5)]
+
+    docs = _load_pdf_pages(str(pdf), 2, 4)
+    assert [doc.metadata["page"] for doc in docs] == [2, 3]
+    assert all(doc.metadata["total_pages"] == 5 for doc in docs)
@@ -8,7 +8,7 @@ from langchain.schema import Document
 
 import pytest
 
-from app.embed_and_store.embed import batch_chunks_by_payload_size_and_count, create_embeddings
+from app.embed_and_store.embed import batch_chunks_by_payload_size_and_count, create_embeddings, embed_texts
 from app.embed_and_store.store import store_chunks_in_chroma
 
 
@@ -27,7 +27,7 @@ def test_batching_respects_item_count_and_payload():
 def test_create_embeddings_happy_path():
     docs = make_docs(3, size=5)
     fake_vectors = [[0.1, 0.2], [0.2, 0.3], [0.3, 0.4]]
-    with patch("requests.post") as mock_post:
+    with patch("requests.Session.post") as mock_post:
         class MockResp:
             def raise_for_status(self):
                 return None
@@ -47,7 +47,7 @@ def test_store_chunks_in_chroma_basic_flow():
     ]
 
     class MockCollection:
-        def add(self, documents=None, metadatas=None, embeddings=None, ids=None):
+        def upsert(self, documents=None, metadatas=None, embeddings=None, ids=None):
             assert len(documents) == 2
             assert len(metadatas) == 2
             assert len(embeddings) == 2
@@ -59,6 +59,37 @@ def test_store_chunks_in_chroma_basic_flow():
 
     with patch("chromadb.HttpClient", return_value=MockClient()):
         # Should not raise
-        store_chunks_in_chroma(chunks, chroma_service_url="http://chromadb:8000", collection_name="test")
+        assert store_chunks_in_chroma(chunks, chroma_service_url="http://chromadb:8000", collection_name="test") == 2
 
 
+def test_find_legacy_chunk_ids_keeps_only_positional_ids():
+    from app.embed_and_store.store import find_legacy_chunk_ids
+
+    class MockCollection:
+        def get(self, where=None, include=None):
+            assert where == {"source": "a.pdf"}
+            return {"ids": ["a.pdf_chunk_0", "a.pdf_chunk_12", "a.pdf_0123456789abcdef0123456789abcdef"]}
+
+    class MockClient:
+        def get_or_create_collection(self, name: str):
+            return MockCollection()
+
+    with patch("chromadb.HttpClient", return_value=MockClient()):
+        assert find_legacy_chunk_ids("a.pdf", "http://chromadb:8000") == ["a.pdf_chunk_0", "a.pdf_chunk_12"]
+
+
+
+
+def test_embed_texts_single_request_with_truncation():
+    with patch("requests.Session.post") as mock_post:
+        class MockResp:
+            def raise_for_status(self):
+                return None
+            def json(self):
+                return [[0.1, 0.2], [0.3, 0.4]]
+        mock_post.return_value = MockResp()
+
+        vectors = embed_texts(["a", "b"], tei_service_url="http://tei")
+        assert vectors == [[0.1, 0.2], [0.3, 0.4]]
+        mock_post.assert_called_once()
+        assert json.loads(mock_post.call_args.kwargs["data"]) == {"inputs": ["a", "b"], "truncate": True}
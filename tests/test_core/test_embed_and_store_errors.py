@@ -11,7 +11,7 @@ from app.embed_and_store.store import store_chunks_in_chroma
 
 def test_create_embeddings_handles_request_exceptions():
     docs = [Document(page_content="x", metadata={})]
-    with patch("requests.post") as mock_post:
+    with patch("requests.Session.post") as mock_post:
         class MockResp:
             def raise_for_status(self):
                 raise Exception("boom")
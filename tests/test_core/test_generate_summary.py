@@ -3,7 +3,7 @@ Tests for generation.generate_summary
 """
 from unittest.mock import patch
 
-from app.generation.generate_summary import generate_summary
+from app.generation.generate_summary import generate_summary, build_summary_prompt, stream_summary
 
 
 def test_generate_summary_empty_conversation_returns_message():
@@ -20,12 +20,26 @@ def test_generate_summary_success_saves_and_returns_text():
             return {"generated_text": "SUMMARY"}
 
     with (
-        patch("requests.post", return_value=MockResp()),
-        patch("app.generation.generate_summary.save_summary_to_db") as mock_save,
+        patch("requests.Session.post", return_value=MockResp()),
+        patch("app.generation.generate_summary.summary_writer") as mock_writer,
     ):
         result = generate_summary("hello", [{"page_content": "ctx"}], tgi_service_url="http://tgi")
         assert result == "SUMMARY"
-        mock_save.assert_called_once()
+        mock_writer.submit.assert_called_once()
+
+
+def test_generate_summary_propagates_bulkhead_rejections():
+    import pytest
+    from app.core.bulkhead import BulkheadFull
+
+    with (
+        patch("app.core.http_client.get_bulkhead") as mock_get_bulkhead,
+        patch("requests.Session.post") as mock_post,
+    ):
+        mock_get_bulkhead.return_value.limit.side_effect = BulkheadFull("tgi", 10)
+        with pytest.raises(BulkheadFull):
+            generate_summary("hello", [{"page_content": "ctx"}], tgi_service_url="http://tgi")
+        mock_post.assert_not_called()
 
 
 def test_generate_summary_unexpected_json_returns_empty():
@@ -36,7 +50,7 @@ def test_generate_summary_unexpected_json_returns_empty():
         def json(self):
             return {"not_generated_text": True}
 
-    with patch("requests.post", return_value=MockResp()):
+    with patch("requests.Session.post", return_value=MockResp()):
         result = generate_summary("hello", [], tgi_service_url="http://tgi")
         assert result == ""
 
@@ -46,8 +60,79 @@ def test_generate_summary_http_error_returns_empty():
         status_code = 500
         def raise_for_status(self):
             raise Exception("bad")
-    with patch("requests.post", return_value=MockResp()):
+    with patch("requests.Session.post", return_value=MockResp()):
         result = generate_summary("hello", [], tgi_service_url="http://tgi")
         assert result == ""
 
 
+
+def test_build_summary_prompt_includes_context_and_notes():
+    prompt = build_summary_prompt("hello", [{"page_content": " ctx "}], additional_content="note")
+    assert "hello" in prompt
+    assert "---Relevant Clinical Guidelines/Knowledge---\nctx" in prompt
+    assert "**Additional User Notes:**\nnote" in prompt
+
+
+class MockStreamResp:
+    def __init__(self, lines):
+        self.lines = lines
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        return False
+    def raise_for_status(self):
+        return None
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+
+
+def test_stream_summary_yields_tokens_and_saves_final_text():
+    lines = [
+        'data:{"token": {"text": "**Presenting", "special": false}, "generated_text": null}',
+        "",
+        'data:{"token": {"text": " Complaint:**", "special": false}, "generated_text": null}',
+        'data:{"token": {"text": "</s>", "special": true}, "generated_text": "**Presenting Complaint:**"}',
+    ]
+    with (
+        patch("requests.Session.post", return_value=MockStreamResp(lines)) as mock_post,
+        patch("app.generation.generate_summary.summary_writer") as mock_writer,
+    ):
+        tokens = list(stream_summary("hello", [], tgi_service_url="http://tgi", summary_title="t"))
+        assert tokens == ["**Presenting", " Complaint:**"]
+        assert mock_post.call_args.args[0] == "http://tgi/generate_stream"
+        assert mock_post.call_args.kwargs["stream"] is True
+        saved = mock_writer.submit.call_args.args[0]
+        assert saved["content"] == "**Presenting Complaint:**"
+        assert saved["title"] == "t"
+
+
+def test_stream_summary_raises_on_stream_error_without_saving():
+    lines = ['data:{"error": "overloaded", "error_type": "overloaded"}']
+    with (
+        patch("requests.Session.post", return_value=MockStreamResp(lines)),
+        patch("app.generation.generate_summary.summary_writer") as mock_writer,
+    ):
+        try:
+            list(stream_summary("hello", [], tgi_service_url="http://tgi"))
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+        mock_writer.submit.assert_not_called()
+
+
+def test_build_summary_prompt_drops_chunks_beyond_budget():
+    from app.generation.generate_summary import build_summary_prompt_with_usage
+    from app.generation.prompt_builder import input_token_budget
+
+    chunks = [{"page_content": f"guideline {i} " + "blood pressure target " * 300} for i in range(20)]
+    prompt, usage = build_summary_prompt_with_usage("hello", chunks, max_new_tokens=2000)
+    assert usage["chunks_dropped"] > 0
+    assert usage["total"] <= input_token_budget(2000) + 16
+    assert "guideline 0 " in prompt
+
+
+def test_generate_summary_too_long_transcript_skips_tgi():
+    with patch("requests.Session.post") as mock_post:
+        result = generate_summary("word " * 40000, [], tgi_service_url="http://tgi")
+    assert result == ""
+    mock_post.assert_not_called()
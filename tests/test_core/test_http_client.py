@@ -0,0 +1,68 @@
+"""
+Tests for core.http_client (pooled TEI/TGI clients)
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from app.core import http_client
+
+
+def test_sessions_are_shared_per_downstream_and_sized():
+    http_client.close_http_clients()
+    tei = http_client.get_session("tei")
+    assert http_client.get_session("tei") is tei
+    assert http_client.get_session("tgi") is not tei
+    adapter = tei.get_adapter("http://tei_service/embed")
+    assert adapter._pool_maxsize == http_client.DOWNSTREAMS["tei"]["pool_size"]
+    assert adapter.max_retries.read == 0
+    http_client.close_http_clients()
+
+
+def test_post_always_sets_connect_and_read_deadlines():
+    with patch("requests.Session.post") as mock_post:
+        http_client.post("tgi", "http://tgi/generate", json={})
+        assert mock_post.call_args.kwargs["timeout"] == (
+            http_client.HTTP_CONNECT_TIMEOUT, http_client.DOWNSTREAMS["tgi"]["read_timeout"]
+        )
+        http_client.post("tei", "http://tei/embed", timeout=5)
+        assert mock_post.call_args.kwargs["timeout"] == (http_client.HTTP_CONNECT_TIMEOUT, 5)
+
+
+def test_unknown_downstream_is_rejected():
+    with pytest.raises(ValueError):
+        http_client.post("chroma", "http://chroma")
+
+
+def test_async_client_is_reused_within_a_loop():
+    async def run():
+        client = http_client.get_async_client("tei")
+        assert http_client.get_async_client("tei") is client
+        with patch("httpx.AsyncClient.post") as mock_post:
+            await http_client.apost("tei", "http://tei/embed", json={"inputs": ["a"]})
+            timeout = mock_post.call_args.kwargs["timeout"]
+            assert timeout.connect == http_client.HTTP_CONNECT_TIMEOUT
+            assert timeout.read == http_client.DOWNSTREAMS["tei"]["read_timeout"]
+        await http_client.aclose_http_clients()
+        assert client.is_closed
+
+    asyncio.run(run())
+
+
+def test_async_post_goes_through_the_bulkhead():
+    from app.core.bulkhead import Bulkhead, BulkheadFull
+
+    tei = Bulkhead("tei", max_concurrent=1, max_queued=0, max_wait=1)
+
+    async def run():
+        with patch.dict("app.core.bulkhead.bulkheads", {"tei": tei}), patch("httpx.AsyncClient.post") as mock_post:
+            with tei.limit():
+                with pytest.raises(BulkheadFull):
+                    await http_client.apost("tei", "http://tei/embed", json={})
+            assert mock_post.call_count == 0
+            await http_client.apost("tei", "http://tei/embed", json={})
+            assert mock_post.call_count == 1
+        assert tei.stats()["active"] == 0
+        await http_client.aclose_http_clients()
+
+    asyncio.run(run())
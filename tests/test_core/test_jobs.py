@@ -0,0 +1,100 @@
+"""
+Tests for core.jobs (background job manager and store)
+"""
+import threading
+import time
+import pytest
+
+from app.core.jobs import JobManager, InMemoryJobStore, JobQueueFull
+
+
+def _wait_for(manager, job_id, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_job_records_stages_and_result():
+    manager = JobManager(InMemoryJobStore(), max_workers=1)
+
+    def work(value, progress):
+        progress("first")
+        progress("second")
+        return value * 2
+
+    job = _wait_for(manager, manager.submit(work, 21))
+    assert job["status"] == "succeeded"
+    assert job["result"] == 42
+    assert [stage["name"] for stage in job["stages"]] == ["first", "second"]
+    assert all(stage["seconds"] is not None for stage in job["stages"])
+    assert job["stage"] is None
+    manager.shutdown()
+
+
+def test_failed_job_records_error():
+    manager = JobManager(InMemoryJobStore(), max_workers=1)
+
+    def work(progress):
+        raise RuntimeError("boom")
+
+    job = _wait_for(manager, manager.submit(work))
+    assert job["status"] == "failed"
+    assert job["error"] == "boom"
+    assert manager.stats()["failed"] == 1
+    manager.shutdown()
+
+
+def test_submit_rejects_when_pending_limit_reached():
+    manager = JobManager(InMemoryJobStore(), max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    def work(progress):
+        release.wait(2)
+
+    job_id = manager.submit(work)
+    with pytest.raises(JobQueueFull):
+        manager.submit(work)
+    release.set()
+    _wait_for(manager, job_id)
+    assert manager.stats()["rejected"] == 1
+    manager.submit(work)  # room again once the first job finished
+    manager.shutdown()
+
+
+def test_store_evicts_expired_finished_jobs():
+    store = InMemoryJobStore(ttl=0)
+    store.create({"id": "old", "status": "succeeded", "stages": [], "finished_at": time.time() - 1})
+    store.create({"id": "new", "status": "queued", "stages": [], "finished_at": None})
+    assert store.get("old") is None
+    assert store.get("new")["status"] == "queued"
+
+
+def test_progress_counts_update_current_stage():
+    manager = JobManager(InMemoryJobStore(), max_workers=1)
+
+    def work(progress):
+        progress("embed", batches=1, chunks=32)
+        progress("embed", batches=2, chunks=64)
+        progress("store", chunks=64)
+
+    job = _wait_for(manager, manager.submit(work))
+    embed, store = job["stages"]
+    assert embed["counts"] == {"batches": 2, "chunks": 64}
+    assert store["counts"] == {"chunks": 64}
+    assert set(embed["throughput"]) == {"batches", "chunks"}
+    manager.shutdown()
+
+
+def test_incomplete_store_cannot_be_created():
+    from app.core.jobs import JobStore
+
+    class CreateOnlyStore(JobStore):
+        def create(self, job):
+            pass
+
+    with pytest.raises(TypeError):
+        CreateOnlyStore()
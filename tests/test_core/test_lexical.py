@@ -0,0 +1,106 @@
+"""
+Tests for retrieval.lexical (BM25 side index)
+"""
+from app.retrieval.lexical import (
+    BM25Index,
+    tokenize,
+    get_lexical_index,
+    index_chunks_lexically,
+    drop_lexical_index,
+    reset_lexical_indexes,
+)
+
+
+def test_tokenize_keeps_codes_and_doses():
+    terms = tokenize("Start co-amoxiclav 2.5mg as per NG136.")
+    assert "ng136" in terms
+    assert "2.5mg" in terms
+    assert "co-amoxiclav" in terms and "amoxiclav" in terms
+    assert "as" not in terms
+
+
+def test_bm25_ranks_exact_terms_and_skips_duplicate_ids():
+    index = BM25Index()
+    added = index.add(
+        ["a", "b", "c"],
+        [
+            "hypertension in adults: diagnosis and management NG136",
+            "asthma diagnosis and monitoring",
+            "management of type 2 diabetes in adults",
+        ],
+    )
+    assert added == 3
+    assert index.add(["a"], ["something else"]) == 0
+
+    hits = index.search("patient on ramipril, see NG136 for hypertension", k=2)
+    assert hits[0][0] == "a"
+    assert index.search("unrelated words zzz", k=5) == []
+
+
+def test_bm25_save_and_load_round_trip(tmp_path):
+    index = BM25Index()
+    index.add(["x", "y"], ["metformin dose review", "amlodipine 5mg daily"])
+    path = tmp_path / "idx.npz"
+    index.save(str(path))
+
+    loaded = BM25Index.load(str(path))
+    assert len(loaded) == 2
+    assert loaded.search("amlodipine", k=1) == index.search("amlodipine", k=1)
+    # Still appendable after loading
+    loaded.add(["z"], ["amlodipine review"])
+    assert {doc_id for doc_id, _ in loaded.search("amlodipine", k=5)} == {"y", "z"}
+
+
+def test_bm25_removed_documents_stop_matching_and_can_return(tmp_path):
+    index = BM25Index()
+    index.add(["x", "y"], ["metformin dose review", "metformin 500mg"])
+    assert index.remove(["x", "missing"]) == 1
+    assert [doc_id for doc_id, _ in index.search("metformin", k=5)] == ["y"]
+
+    path = tmp_path / "idx.npz"
+    index.save(str(path))
+    loaded = BM25Index.load(str(path))
+    assert len(loaded) == 1
+    assert [doc_id for doc_id, _ in loaded.search("metformin", k=5)] == ["y"]
+    # A removed id can be indexed again with new text
+    assert loaded.add(["x"], ["metformin stopped"]) == 1
+    assert {doc_id for doc_id, _ in loaded.search("metformin", k=5)} == {"x", "y"}
+
+
+def test_registry_persists_and_drops_indexes():
+    index_chunks_lexically("documents", ["d1"], ["sertraline 50mg"])
+    reset_lexical_indexes()
+    reloaded = get_lexical_index("documents", create=False)
+    assert reloaded is not None and len(reloaded) == 1
+
+    drop_lexical_index("documents")
+    reset_lexical_indexes()
+    assert get_lexical_index("documents", create=False) is None
+
+
+def test_removed_documents_do_not_count_towards_idf():
+    index = BM25Index()
+    index.add(["a", "b"], ["sertraline review", "sertraline dose"])
+    fresh = BM25Index()
+    fresh.add(["b"], ["sertraline dose"])
+    index.remove(["a"])
+    assert index.search("sertraline", k=1) == fresh.search("sertraline", k=1)
+
+
+def test_index_saved_by_another_process_is_reloaded(tmp_path):
+    import os
+    from app.retrieval import lexical
+
+    index_chunks_lexically("documents", ["d1"], ["sertraline 50mg"])
+    first = get_lexical_index("documents")
+    assert get_lexical_index("documents") is first
+
+    # Another worker rewrites the file
+    other = BM25Index()
+    other.add(["d1", "d2"], ["sertraline 50mg", "citalopram 20mg"])
+    path = lexical._index_path("documents")
+    other.save(str(path))
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 1))
+
+    reloaded = get_lexical_index("documents")
+    assert reloaded is not first and len(reloaded) == 2
@@ -0,0 +1,158 @@
+"""
+Tests for data_ingestion.manifest and incremental ingestion
+"""
+from unittest.mock import patch
+
+from app.core.pipeline import run_incremental_ingestion_pipeline
+from app.data_ingestion.manifest import (
+    IngestionManifest, get_ingestion_manifest, drop_ingestion_manifest, chunk_sha256, content_chunk_id, file_sha256
+)
+
+
+def test_manifest_plans_new_and_stale_chunks_and_round_trips(tmp_path):
+    manifest = IngestionManifest(str(tmp_path / "m.json"))
+    old = {chunk_sha256("a"): "id-a", chunk_sha256("b"): "id-b"}
+    manifest.record_file("f.txt", "sha-1", old)
+    manifest.save()
+
+    reloaded = IngestionManifest(str(tmp_path / "m.json"))
+    assert reloaded.is_unchanged("f.txt", "sha-1")
+    assert not reloaded.is_unchanged("f.txt", "sha-2")
+    new_hashes, stale_ids = reloaded.plan("f.txt", [chunk_sha256("a"), chunk_sha256("c"), chunk_sha256("c")])
+    assert new_hashes == [chunk_sha256("c")]
+    assert stale_ids == ["id-b"]
+
+
+def test_file_hash_and_chunk_ids_are_content_derived(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_bytes(b"same bytes")
+    assert file_sha256(str(path)) == file_sha256(str(path))
+    assert content_chunk_id("a.txt", chunk_sha256("x")) == content_chunk_id("a.txt", chunk_sha256("x"))
+    assert content_chunk_id("a.txt", chunk_sha256("x")) != content_chunk_id("b.txt", chunk_sha256("x"))
+
+
+def _fake_embed(chunks, tei_url, progress=None):
+    return [{"text": c.page_content, "metadata": c.metadata, "embedding": [0.1]} for c in chunks]
+
+
+def _run(directory, legacy_ids=None):
+    with (
+        patch("app.core.pipeline.create_embeddings", side_effect=_fake_embed) as mock_embed,
+        patch("app.core.pipeline.store_chunks_in_chroma", return_value=1),
+        patch("app.core.pipeline.delete_chunks_from_chroma", side_effect=lambda ids, *a, **k: len(ids)) as mock_delete,
+        patch("app.core.pipeline.find_legacy_chunk_ids", side_effect=legacy_ids or (lambda source, *a: [])),
+        patch("app.core.pipeline.split_documents_into_chunks", side_effect=lambda docs: [
+            type(doc)(page_content=line, metadata=dict(doc.metadata))
+            for doc in docs for line in doc.page_content.splitlines() if line
+        ]),
+    ):
+        stats = run_incremental_ingestion_pipeline(str(directory))
+    embedded = [c.page_content for call in mock_embed.call_args_list for c in call.args[0]]
+    deleted = [i for call in mock_delete.call_args_list for i in call.args[0]]
+    return stats, embedded, deleted
+
+
+def test_incremental_ingestion_skips_unchanged_files_and_embeds_only_new_chunks(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.txt").write_text("alpha\nbeta")
+    (docs / "b.txt").write_text("gamma")
+
+    stats, embedded, deleted = _run(docs)
+    assert stats["files"] == 2 and stats["skipped_files"] == 0
+    assert sorted(embedded) == ["alpha", "beta", "gamma"]
+
+    # Unchanged corpus: nothing is parsed or embedded
+    stats, embedded, deleted = _run(docs)
+    assert stats == {"files": 0, "skipped_files": 2, "chunks": 0, "embedded": 0, "deleted": 0}
+    assert embedded == []
+
+    # a.txt changes one chunk: only that chunk is embedded and the replaced one deleted
+    (docs / "a.txt").write_text("alpha\ndelta")
+    stats, embedded, deleted = _run(docs)
+    assert stats["files"] == 1 and stats["skipped_files"] == 1
+    assert embedded == ["delta"]
+    assert deleted == [content_chunk_id("a.txt", chunk_sha256("beta"))]
+
+
+def test_failed_store_leaves_file_to_be_retried(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.txt").write_text("alpha")
+
+    with (
+        patch("app.core.pipeline.create_embeddings", side_effect=_fake_embed),
+        patch("app.core.pipeline.store_chunks_in_chroma", return_value=0),
+    ):
+        run_incremental_ingestion_pipeline(str(docs))
+    manifest = get_ingestion_manifest("rag_documents")
+    assert not manifest.is_unchanged("a.txt", file_sha256(str(docs / "a.txt")))
+
+    drop_ingestion_manifest("rag_documents")
+    assert len(get_ingestion_manifest("rag_documents")) == 0
+
+
+def test_incremental_ingestion_writes_the_lexical_index_once(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.txt").write_text("alpha")
+    with (
+        patch("app.core.pipeline.create_embeddings", side_effect=_fake_embed),
+        patch("app.core.pipeline.store_chunks_in_chroma", return_value=1) as mock_store,
+        patch("app.core.pipeline.save_lexical_index") as mock_save,
+    ):
+        run_incremental_ingestion_pipeline(str(docs))
+    assert mock_store.call_args.kwargs["persist_lexical"] is False
+    mock_save.assert_called_once()
+
+
+def test_first_incremental_ingestion_deletes_positional_chunk_ids(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.txt").write_text("alpha")
+    legacy = lambda source, *a: [f"{source}_chunk_0"]
+
+    stats, embedded, deleted = _run(docs, legacy_ids=legacy)
+    assert embedded == ["alpha"]
+    assert deleted == ["a.txt_chunk_0"]
+
+    # Once the file is in the manifest its positional ids are not looked for again
+    (docs / "a.txt").write_text("alpha\nbeta")
+    stats, embedded, deleted = _run(docs, legacy_ids=legacy)
+    assert deleted == []
+
+
+def test_concurrent_ingestion_runs_into_a_collection_are_serialised(tmp_path):
+    import threading
+    import time
+
+    dirs = []
+    for i in range(2):
+        d = tmp_path / f"upload{i}"
+        d.mkdir()
+        (d / "a.txt").write_text(f"version {i}")
+        dirs.append(d)
+
+    active, overlaps = [0], []
+
+    def slow_embed(chunks, tei_url, progress=None):
+        active[0] += 1
+        overlaps.append(active[0])
+        time.sleep(0.05)
+        active[0] -= 1
+        return _fake_embed(chunks, tei_url)
+
+    with (
+        patch("app.core.pipeline.create_embeddings", side_effect=slow_embed),
+        patch("app.core.pipeline.store_chunks_in_chroma", return_value=1),
+        patch("app.core.pipeline.delete_chunks_from_chroma", side_effect=lambda ids, *a, **k: len(ids)) as mock_delete,
+        patch("app.core.pipeline.find_legacy_chunk_ids", return_value=[]),
+    ):
+        threads = [threading.Thread(target=run_incremental_ingestion_pipeline, args=(str(d),)) for d in dirs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert max(overlaps) == 1
+    # The second run saw the first one's chunk and deleted it
+    assert len(mock_delete.call_args_list) == 1
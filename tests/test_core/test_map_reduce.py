@@ -0,0 +1,63 @@
+"""
+Tests for generation.map_reduce (long-transcript summarization)
+"""
+import json
+import threading
+from unittest.mock import patch
+
+from app.generation.map_reduce import split_transcript_into_segments, map_reduce_summary
+from app.generation.prompt_builder import count_tokens
+
+
+def test_split_transcript_keeps_turns_whole_and_under_limit():
+    lines = [f"Doctor: question {i} about the cough and fever" for i in range(200)]
+    segments = split_transcript_into_segments("\n".join(lines), max_tokens=100)
+    assert len(segments) > 1
+    assert all(count_tokens(segment) <= 100 for segment in segments)
+    assert "\n".join(segments).split("\n") == lines
+
+
+def test_split_transcript_cuts_a_single_overlong_line():
+    line = "word " * 2000
+    segments = split_transcript_into_segments(line, max_tokens=100)
+    assert len(segments) > 1
+    assert all(count_tokens(segment) <= 100 for segment in segments)
+
+
+class MockResp:
+    def __init__(self, text):
+        self.text = text
+        self.status_code = 200
+    def raise_for_status(self):
+        return None
+    def json(self):
+        return {"generated_text": self.text}
+
+
+def test_map_reduce_extracts_segments_concurrently_then_summarizes_facts():
+    barrier = threading.Barrier(3, timeout=5)  # all three segment calls must be in flight at once
+    final_prompts = []
+
+    def fake_post(url, headers=None, data=None, timeout=None):
+        prompt = json.loads(data)["inputs"]
+        if "part " in prompt and "**Clinical facts:**" in prompt:
+            barrier.wait()
+            part = prompt.split("(part ")[1].split(" of")[0]
+            return MockResp(f"- fact from part {part}")
+        final_prompts.append(prompt)
+        return MockResp("**Presenting Complaint:** cough")
+
+    transcript = "\n".join(["Patient: I have had a cough " * 20] * 3)
+    with (
+        patch("app.generation.map_reduce.split_transcript_into_segments",
+              side_effect=lambda text: split_transcript_into_segments(text, max_tokens=150)),
+        patch("requests.Session.post", side_effect=fake_post),
+        patch("app.generation.generate_summary.summary_writer") as mock_writer,
+    ):
+        summary = map_reduce_summary(transcript, [{"page_content": "ctx"}], tgi_service_url="http://tgi")
+
+    assert summary == "**Presenting Complaint:** cough"
+    assert len(final_prompts) == 1
+    prompt = final_prompts[0]
+    assert prompt.index("fact from part 1") < prompt.index("fact from part 2") < prompt.index("fact from part 3")
+    mock_writer.submit.assert_called_once()
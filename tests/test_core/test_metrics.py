@@ -0,0 +1,55 @@
+"""
+Tests for core.metrics (per-stage latency histograms and spans)
+"""
+from unittest.mock import patch
+
+from app.core.metrics import StageMetrics, Histogram, stage_metrics, stage_timer, record_spans, format_server_timing
+from app.retrieval.retrieve import retrieve_relevant_chunks
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram(buckets=(0.1, 1.0, 10.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 0]
+    assert histogram.count == 4
+    assert 0.1 <= histogram.quantile(0.5) <= 1.0
+    assert histogram.quantile(0.99) <= 10.0
+
+
+def test_render_prometheus_is_cumulative():
+    metrics = StageMetrics(buckets=(0.1, 1.0))
+    metrics.observe("generate.tgi", 0.5)
+    metrics.observe("generate.tgi", 2.0)
+    text = metrics.render_prometheus()
+    assert 'rag_stage_duration_seconds_bucket{stage="generate.tgi",le="0.1"} 0' in text
+    assert 'rag_stage_duration_seconds_bucket{stage="generate.tgi",le="1.0"} 1' in text
+    assert 'rag_stage_duration_seconds_bucket{stage="generate.tgi",le="+Inf"} 2' in text
+    assert 'rag_stage_duration_seconds_count{stage="generate.tgi"} 2' in text
+
+
+def test_spans_include_fan_out_threads_and_format_as_server_timing():
+    class MockCollection:
+        def __init__(self, name):
+            self.name = name
+            self.metadata = {}
+        def query(self, n_results, include, query_texts=None, query_embeddings=None):
+            return {"documents": [["doc"]], "metadatas": [[{}]], "distances": [[0.3]]}
+
+    class MockClient:
+        def list_collections(self):
+            return [MockCollection("c1"), MockCollection("c2")]
+        def get_collection(self, name):
+            return MockCollection(name)
+
+    stage_metrics.reset()
+    with patch("chromadb.HttpClient", return_value=MockClient()), record_spans() as spans:
+        with stage_timer("pipeline.retrieve"):
+            retrieve_relevant_chunks("hello", chroma_db_url="http://chromadb:8000")
+
+    stages = [stage for stage, _ in spans]
+    assert {"retrieve.catalog", "retrieve.query.c1", "retrieve.query.c2", "retrieve.rank", "pipeline.retrieve"} <= set(stages)
+    assert stage_metrics.summary()["retrieve.query.c1"]["count"] == 1
+
+    header = format_server_timing([("generate.tgi", 1.5), ("retrieve.rank", 0.001), ("generate.tgi", 0.5)])
+    assert header == "generate.tgi;dur=2000.0, retrieve.rank;dur=1.0"
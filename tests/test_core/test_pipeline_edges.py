@@ -17,7 +17,7 @@ def test_run_ingestion_pipeline_no_documents(tmp_path):
 def test_run_embedding_and_storage_pipeline_no_chunks():
     # Should early return without errors
     with patch("app.core.pipeline.create_embeddings", return_value=[]):
-        assert run_embedding_and_storage_pipeline([]) is None
+        assert run_embedding_and_storage_pipeline([]) == []
 
 
 def test_run_retrieval_and_generation_pipeline_no_relevant_chunks():
@@ -34,3 +34,148 @@ def test_run_retrieval_and_generation_pipeline_success():
         assert result == "summary"
 
 
+
+
+def test_run_retrieval_and_generation_pipeline_uses_map_reduce_for_long_transcripts():
+    with (
+        patch("app.core.pipeline.retrieve_relevant_chunks", return_value=["c1"]),
+        patch("app.core.pipeline.generate_summary") as mock_generate,
+        patch("app.core.pipeline.map_reduce_summary", return_value="long summary") as mock_map_reduce,
+    ):
+        result = run_retrieval_and_generation_pipeline("the patient reports chest pain\n" * 5000)
+        assert result == "long summary"
+        mock_map_reduce.assert_called_once()
+        mock_generate.assert_not_called()
+
+
+def test_run_retrieval_and_generation_pipeline_caches_deterministic_summaries():
+    with (
+        patch("app.core.pipeline.retrieve_relevant_chunks", return_value=["c1"]),
+        patch("app.core.pipeline.generate_summary", return_value="summary") as mock_generate,
+    ):
+        assert run_retrieval_and_generation_pipeline("hello", temperature=0) == "summary"
+        assert run_retrieval_and_generation_pipeline("hello", temperature=0) == "summary"
+        assert mock_generate.call_count == 1
+        assert mock_generate.call_args.kwargs["temperature"] == 0
+
+        # Sampled summaries are never cached, and bypass_cache forces a fresh one
+        run_retrieval_and_generation_pipeline("hello", temperature=0.2)
+        run_retrieval_and_generation_pipeline("hello", temperature=0, bypass_cache=True)
+        assert mock_generate.call_count == 3
+
+
+def test_async_pipeline_runs_concurrent_requests_off_the_event_loop():
+    import asyncio
+    import threading
+    import time
+    from app.core.pipeline import arun_retrieval_and_generation_pipeline_with_id
+
+    loop_thread = threading.get_ident()
+    threads = []
+
+    def slow_pipeline(text, **kwargs):
+        threads.append(threading.get_ident())
+        time.sleep(0.3)
+        return text.upper(), "id"
+
+    async def run():
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            arun_retrieval_and_generation_pipeline_with_id(text, bypass_cache=True) for text in ("a", "b", "c")
+        ))
+        return results, time.perf_counter() - start
+
+    with patch("app.core.pipeline.run_retrieval_and_generation_pipeline_with_id", side_effect=slow_pipeline):
+        results, elapsed = asyncio.run(run())
+
+    assert results == [("A", "id"), ("B", "id"), ("C", "id")]
+    assert loop_thread not in threads
+    assert elapsed < 0.8  # overlapped, not serialized (3 x 0.3s)
+
+
+def test_batch_pipeline_yields_a_result_per_conversation(monkeypatch):
+    import threading
+    import time
+    from app.core import pipeline
+    from app.core.pipeline import run_batch_retrieval_and_generation_pipeline
+
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+
+    def fake_generate(text, chunks, *args, **kwargs):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+        return f"summary of {text}"
+
+    def fake_retrieve(text, *args, **kwargs):
+        return [] if text == "nothing" else ["chunk"]
+
+    conversations = [{"text": f"t{i}"} for i in range(10)] + [{"text": "nothing"}]
+    monkeypatch.setenv("TEI_SERVICE_URL", "http://tei")
+    with (
+        patch("app.core.pipeline.retrieve_relevant_chunks", side_effect=fake_retrieve),
+        patch("app.core.pipeline.generate_summary", side_effect=fake_generate),
+        patch("app.core.pipeline.embed_retrieval_queries", return_value=[[[0.1]]] * 11) as mock_embed,
+    ):
+        results = list(run_batch_retrieval_and_generation_pipeline(conversations))
+
+    # All queries are embedded in one up-front call
+    mock_embed.assert_called_once_with([c["text"] for c in conversations], "http://tei")
+    by_index = {result["index"]: result for result in results}
+    assert len(results) == 11
+    assert by_index[3]["summary"] == "summary of t3"
+    assert by_index[3]["summary_id"]
+    assert "no relevant context" in by_index[10]["error"]
+    assert peak[0] <= pipeline.BATCH_GENERATION_IN_FLIGHT
+
+
+def test_closing_a_batch_cancels_its_outstanding_conversations(monkeypatch):
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from app.core import pipeline
+    from app.core.pipeline import run_batch_retrieval_and_generation_pipeline
+
+    generated = []
+
+    def fake_generate(text, chunks, *args, **kwargs):
+        generated.append(text)
+        time.sleep(0.05)
+        return f"summary of {text}"
+
+    monkeypatch.delenv("TEI_SERVICE_URL", raising=False)
+    conversations = [{"text": f"t{i}"} for i in range(20)]
+    with (
+        patch.object(pipeline, "_batch_retrieval_executor", ThreadPoolExecutor(max_workers=1)),
+        patch.object(pipeline, "_batch_generation_executor", ThreadPoolExecutor(max_workers=1)),
+        patch("app.core.pipeline.retrieve_relevant_chunks", return_value=["chunk"]),
+        patch("app.core.pipeline.generate_summary", side_effect=fake_generate),
+    ):
+        results = run_batch_retrieval_and_generation_pipeline(conversations)
+        next(results)
+        results.close()
+        time.sleep(0.5)  # uncancelled, ~10 more would be generated by now
+    assert len(generated) < 5
+
+
+def test_batch_reports_conversations_without_a_result_after_the_timeout(monkeypatch):
+    from concurrent.futures import Future
+    from unittest.mock import MagicMock
+    from app.core import pipeline
+    from app.core.pipeline import run_batch_retrieval_and_generation_pipeline
+
+    # Generation tasks that never run, as if the pool had lost them
+    stuck = MagicMock()
+    stuck.submit.side_effect = lambda *args, **kwargs: Future()
+    monkeypatch.delenv("TEI_SERVICE_URL", raising=False)
+    with (
+        patch.object(pipeline, "_batch_generation_executor", stuck),
+        patch.object(pipeline, "BATCH_RESULT_TIMEOUT", 0.2),
+        patch("app.core.pipeline.retrieve_relevant_chunks", return_value=["chunk"]),
+    ):
+        results = list(run_batch_retrieval_and_generation_pipeline([{"text": "a"}, {"text": "b"}]))
+    assert sorted(result["index"] for result in results) == [0, 1]
+    assert all("Timed out" in result["error"] for result in results)
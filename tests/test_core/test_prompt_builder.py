@@ -0,0 +1,43 @@
+"""
+Tests for generation.prompt_builder (token budget)
+"""
+from app.generation.prompt_builder import (
+    count_tokens,
+    truncate_to_tokens,
+    input_token_budget,
+    fit_chunks_to_budget,
+    MAX_INPUT_TOKENS,
+    MAX_TOTAL_TOKENS,
+    PROMPT_SAFETY_MARGIN_TOKENS,
+)
+
+
+def test_input_budget_reserves_output_tokens():
+    assert input_token_budget(2000) == min(MAX_INPUT_TOKENS, MAX_TOTAL_TOKENS - 2000) - PROMPT_SAFETY_MARGIN_TOKENS
+    assert input_token_budget(4000) < input_token_budget(1000)
+
+
+def test_truncate_to_tokens_respects_limit():
+    text = "hypertension management in adults " * 50
+    truncated = truncate_to_tokens(text, 20)
+    assert count_tokens(truncated) <= 20
+    assert text.startswith(truncated)
+    assert truncate_to_tokens("short", 100) == "short"
+
+
+def test_fit_chunks_keeps_rank_order_trims_then_drops():
+    chunk = "asthma inhaler review " * 40
+    size = count_tokens(chunk) + 1
+    kept, stats = fit_chunks_to_budget(["first " + chunk, chunk, chunk, chunk], budget_tokens=size * 2 + 100)
+    assert len(kept) == 3
+    assert kept[0].startswith("first")
+    assert kept[2] != chunk and chunk.startswith(kept[2])
+    assert stats == {"chunks_used": 3, "chunks_trimmed": 1, "chunks_dropped": 1, "tokens": stats["tokens"]}
+    assert stats["tokens"] <= size * 2 + 100
+
+
+def test_fit_chunks_drops_instead_of_tiny_trim():
+    chunk = "asthma inhaler review " * 40
+    kept, stats = fit_chunks_to_budget([chunk, chunk], budget_tokens=count_tokens(chunk) + 10)
+    assert kept == [chunk]
+    assert stats["chunks_trimmed"] == 0 and stats["chunks_dropped"] == 1
@@ -0,0 +1,31 @@
+"""
+Tests for retrieval.rerank (MMR / near-duplicate suppression)
+"""
+from app.retrieval.rerank import maximal_marginal_relevance, diversify_chunks
+
+
+def test_mmr_prefers_diverse_candidates():
+    embeddings = [[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]]
+    relevance = [1.0, 0.95, 0.6]
+    selected = maximal_marginal_relevance(relevance, embeddings, k=2, lambda_mult=0.5, duplicate_threshold=1.1)
+    assert selected == [0, 2]
+
+
+def test_mmr_drops_near_duplicates_even_with_room_left():
+    embeddings = [[1.0, 0.0], [1.0, 0.001], [0.0, 1.0]]
+    selected = maximal_marginal_relevance([1.0, 0.99, 0.1], embeddings, k=3, duplicate_threshold=0.95)
+    assert selected == [0, 2]
+
+
+def test_diversify_chunks_strips_embeddings_and_passes_through_without_them():
+    chunks = [
+        {"page_content": "a", "embedding": [1.0, 0.0]},
+        {"page_content": "a'", "embedding": [1.0, 0.0]},
+        {"page_content": "b", "embedding": [0.0, 1.0]},
+    ]
+    result = diversify_chunks(chunks, [3, 2, 1], k=3)
+    assert [c["page_content"] for c in result] == ["a", "b"]
+    assert all("embedding" not in c for c in result)
+
+    plain = [{"page_content": "x"}, {"page_content": "y"}]
+    assert diversify_chunks(plain, [2, 1], k=1) == [{"page_content": "x"}]
@@ -3,7 +3,7 @@ Tests for retrieval.retrieve_relevant_chunks
 """
 from unittest.mock import patch
 
-from app.retrieval.retrieve import retrieve_relevant_chunks
+from app.retrieval.retrieve import retrieve_relevant_chunks, split_query_into_windows, reciprocal_rank_fusion
 
 
 def test_retrieve_relevant_chunks_happy_path():
@@ -40,3 +40,402 @@ def test_retrieve_relevant_chunks_handles_exception():
         assert chunks == []
 
 
+def test_retrieve_relevant_chunks_drops_slow_and_failing_collections():
+    import time
+
+    class MockCollection:
+        def __init__(self, name):
+            self.name = name
+            self.metadata = None
+        def query(self, query_texts, n_results, include):
+            if self.name == "slow":
+                time.sleep(0.5)
+            if self.name == "broken":
+                raise RuntimeError("boom")
+            return {
+                "documents": [[f"{self.name}-doc"]],
+                "metadatas": [[{"source": self.name}]],
+                "distances": [[0.2 if self.name == "fast" else 0.1]],
+            }
+
+    class MockClient:
+        def list_collections(self):
+            return [MockCollection("fast"), MockCollection("slow"), MockCollection("broken")]
+        def get_collection(self, name):
+            return MockCollection(name)
+
+    with patch("chromadb.HttpClient", return_value=MockClient()):
+        chunks = retrieve_relevant_chunks("hello", chroma_db_url="http://chromadb:8000", n_results=5, timeout=0.1)
+        assert [c["source_collection"] for c in chunks] == ["fast"]
+
+
+def test_only_missing_collections_invalidate_the_catalog():
+    from app.retrieval.catalog import get_collection_catalog
+
+    errors = {"flaky": RuntimeError("TEI timed out"), "gone": ValueError("Collection gone does not exist.")}
+
+    class MockCollection:
+        def __init__(self, name):
+            self.name = name
+            self.metadata = None
+        def query(self, query_texts, n_results, include):
+            raise errors[self.name]
+
+    class MockClient:
+        def __init__(self, names):
+            self.names = names
+        def list_collections(self):
+            return [MockCollection(name) for name in self.names]
+        def get_collection(self, name):
+            return MockCollection(name)
+
+    catalog = get_collection_catalog()
+    with patch("chromadb.HttpClient", return_value=MockClient(["flaky"])):
+        version = catalog.version
+        assert retrieve_relevant_chunks("hello", chroma_db_url="http://chromadb:8000") == []
+        assert catalog.version == version
+    with patch("chromadb.HttpClient", return_value=MockClient(["gone"])):
+        catalog.invalidate()
+        version = catalog.version
+        assert retrieve_relevant_chunks("hello", chroma_db_url="http://chromadb:8000") == []
+        assert catalog.version == version + 1
+
+
+def test_collection_query_deadline_starts_when_the_query_runs():
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from app.retrieval import retrieve
+
+    class MockCollection:
+        def __init__(self, name):
+            self.name = name
+            self.metadata = None
+        def query(self, query_texts, n_results, include):
+            time.sleep(0.15)
+            return {"documents": [[f"{self.name}-doc"]], "metadatas": [[{}]], "distances": [[0.2]]}
+
+    class MockClient:
+        def list_collections(self):
+            return [MockCollection("first"), MockCollection("queued")]
+        def get_collection(self, name):
+            return MockCollection(name)
+
+    # One query thread: "queued" waits ~0.15s for it, then runs within its own 0.25s budget
+    with (
+        patch("chromadb.HttpClient", return_value=MockClient()),
+        patch.object(retrieve, "_query_executor", ThreadPoolExecutor(max_workers=1)),
+        patch.object(retrieve, "COLLECTION_QUERY_QUEUE_TIMEOUT", 1.0),
+    ):
+        chunks = retrieve_relevant_chunks("hello", chroma_db_url="http://chromadb:8000", n_results=5, timeout=0.25)
+    assert sorted(c["source_collection"] for c in chunks) == ["first", "queued"]
+
+
+def test_dropped_collection_queries_are_counted():
+    import time
+    from app.retrieval import retrieve
+
+    class MockCollection:
+        def __init__(self, name):
+            self.name = name
+            self.metadata = None
+        def query(self, query_texts, n_results, include):
+            time.sleep(0.3)
+            return {"documents": [["doc"]], "metadatas": [[{}]], "distances": [[0.2]]}
+
+    class MockClient:
+        def list_collections(self):
+            return [MockCollection("sleepy")]
+        def get_collection(self, name):
+            return MockCollection(name)
+
+    with patch("chromadb.HttpClient", return_value=MockClient()):
+        assert retrieve_relevant_chunks("hello", chroma_db_url="http://chromadb:8000", timeout=0.05) == []
+    assert 'rag_retrieval_dropped_queries_total{collection="sleepy",reason="timeout"} 1' in retrieve.render_retrieval_prometheus()
+
+
+def test_retrieve_relevant_chunks_embeds_query_once_through_tei():
+    seen_queries = []
+
+    class MockCollection:
+        def __init__(self, name):
+            self.name = name
+            self.metadata = {}
+        def query(self, n_results, include, query_texts=None, query_embeddings=None):
+            seen_queries.append((query_texts, query_embeddings))
+            return {"documents": [["doc"]], "metadatas": [[{}]], "distances": [[0.3]]}
+
+    class MockClient:
+        def list_collections(self):
+            return [MockCollection("c1"), MockCollection("c2"), MockCollection("c3")]
+        def get_collection(self, name):
+            return MockCollection(name)
+
+    with (
+        patch("chromadb.HttpClient", return_value=MockClient()),
+        patch("app.retrieval.retrieve.embed_texts", return_value=[[0.1, 0.2]]) as mock_embed,
+    ):
+        chunks = retrieve_relevant_chunks("hello", chroma_db_url="http://chromadb:8000", tei_service_url="http://tei")
+        assert len(chunks) == 3
+        mock_embed.assert_called_once_with(["hello"], "http://tei")
+        assert seen_queries == [(None, [[0.1, 0.2]])] * 3
+
+
+def test_retrieve_relevant_chunks_uses_precomputed_query_embeddings():
+    seen_queries = []
+
+    class MockCollection:
+        def __init__(self, name):
+            self.name = name
+            self.metadata = {}
+        def query(self, n_results, include, query_texts=None, query_embeddings=None):
+            seen_queries.append((query_texts, query_embeddings))
+            return {"documents": [["doc"]], "metadatas": [[{}]], "distances": [[0.3]]}
+
+    class MockClient:
+        def list_collections(self):
+            return [MockCollection("c1")]
+        def get_collection(self, name):
+            return MockCollection(name)
+
+    with (
+        patch("chromadb.HttpClient", return_value=MockClient()),
+        patch("app.retrieval.retrieve.embed_texts") as mock_embed,
+    ):
+        chunks = retrieve_relevant_chunks(
+            "hello", chroma_db_url="http://chromadb:8000", tei_service_url="http://tei", query_embeddings=[[0.5, 0.5]]
+        )
+        assert len(chunks) == 1
+        mock_embed.assert_not_called()
+        assert seen_queries == [(None, [[0.5, 0.5]])]
+
+
+def test_embed_retrieval_queries_batches_and_regroups_windows():
+    from app.retrieval.retrieve import embed_retrieval_queries
+
+    def fake_embed(texts, url):
+        if "bad" in texts:
+            raise RuntimeError("tei down")
+        return [[float(len(text))] for text in texts]
+
+    with patch("app.retrieval.retrieve.embed_texts", side_effect=fake_embed) as mock_embed:
+        embeddings = embed_retrieval_queries(["a", "bb", "ccc", "bad", "eeeee"], "http://tei", batch_size=2)
+
+    assert mock_embed.call_count == 3
+    assert embeddings == [[[1.0]], [[2.0]], None, None, [[5.0]]]
+
+    long_query = " ".join(f"w{i}" for i in range(600))
+    with patch("app.retrieval.retrieve.embed_texts", side_effect=fake_embed):
+        embeddings = embed_retrieval_queries(["short", long_query], "http://tei", mode="window")
+    assert len(embeddings[0]) == 1
+    assert len(embeddings[1]) == len(split_query_into_windows(long_query))
+
+
+def test_retrieve_relevant_chunks_falls_back_to_query_texts_when_tei_fails():
+    seen_queries = []
+
+    class MockCollection:
+        def __init__(self, name):
+            self.name = name
+            self.metadata = {}
+        def query(self, n_results, include, query_texts=None, query_embeddings=None):
+            seen_queries.append((query_texts, query_embeddings))
+            return {"documents": [["doc"]], "metadatas": [[{}]], "distances": [[0.3]]}
+
+    class MockClient:
+        def list_collections(self):
+            return [MockCollection("c1")]
+        def get_collection(self, name):
+            return MockCollection(name)
+
+    with (
+        patch("chromadb.HttpClient", return_value=MockClient()),
+        patch("app.retrieval.retrieve.embed_texts", side_effect=Exception("tei down")),
+    ):
+        chunks = retrieve_relevant_chunks("hello", chroma_db_url="http://chromadb:8000", tei_service_url="http://tei")
+        assert len(chunks) == 1
+        assert seen_queries == [(["hello"], None)]
+
+
+def test_split_query_into_windows_covers_long_text():
+    words = [f"w{i}" for i in range(1000)]
+    windows = split_query_into_windows(" ".join(words), window_words=100, overlap_words=20, max_windows=5)
+    assert len(windows) == 5
+    assert windows[0].split()[0] == "w0"
+    assert windows[-1].split()[-1] == "w999"
+    assert all(len(w.split()) == 100 for w in windows)
+    assert split_query_into_windows("short query", window_words=100) == ["short query"]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    a = {"id": "a", "page_content": "A", "distance": 0.5, "source_collection": "c"}
+    b = {"id": "b", "page_content": "B", "distance": 0.2, "source_collection": "c"}
+    fused = reciprocal_rank_fusion([[b, a], [a], [a, b]])
+    assert [c["id"] for c in fused] == ["a", "b"]
+    assert fused[1]["distance"] == 0.2
+
+
+def test_retrieve_window_mode_sends_all_windows_in_one_query_per_collection():
+    calls = []
+
+    class MockCollection:
+        def __init__(self, name):
+            self.name = name
+            self.metadata = {}
+        def query(self, n_results, include, query_texts=None, query_embeddings=None):
+            calls.append(query_embeddings)
+            return {
+                "ids": [["x", "y"], ["y"]],
+                "documents": [["X", "Y"], ["Y"]],
+                "metadatas": [[{}, {}], [{}]],
+                "distances": [[0.1, 0.4], [0.3]],
+            }
+
+    class MockClient:
+        def list_collections(self):
+            return [MockCollection("c1")]
+        def get_collection(self, name):
+            return MockCollection(name)
+
+    transcript = " ".join(f"w{i}" for i in range(400))
+    with (
+        patch("chromadb.HttpClient", return_value=MockClient()),
+        patch("app.retrieval.retrieve.split_query_into_windows", return_value=["first", "second"]),
+        patch("app.retrieval.retrieve.embed_texts", return_value=[[0.1], [0.2]]) as mock_embed,
+    ):
+        chunks = retrieve_relevant_chunks(
+            transcript, chroma_db_url="http://chromadb:8000", tei_service_url="http://tei", mode="window"
+        )
+        mock_embed.assert_called_once_with(["first", "second"], "http://tei")
+        assert calls == [[[0.1], [0.2]]]
+        # "y" is found by both windows so it outranks "x"
+        assert [c["id"] for c in chunks] == ["y", "x"]
+        assert chunks[0]["distance"] == 0.3
+
+
+def _counting_client(calls):
+    class MockCollection:
+        def __init__(self, name):
+            self.name = name
+            self.metadata = {}
+        def query(self, n_results, include, query_texts=None, query_embeddings=None):
+            calls.append(query_texts)
+            return {"documents": [["doc"]], "metadatas": [[{}]], "distances": [[0.3]]}
+
+    class MockClient:
+        def list_collections(self):
+            return [MockCollection("c1")]
+        def get_collection(self, name):
+            return MockCollection(name)
+
+    return MockClient()
+
+
+def test_retrieve_relevant_chunks_serves_normalized_repeats_from_cache():
+    from app.retrieval.retrieve import retrieval_cache
+
+    calls = []
+    with patch("chromadb.HttpClient", return_value=_counting_client(calls)):
+        first = retrieve_relevant_chunks("Chest pain  since\nTuesday", chroma_db_url="http://chromadb:8000")
+        second = retrieve_relevant_chunks("chest pain since tuesday ", chroma_db_url="http://chromadb:8000")
+        assert first == second
+        assert len(calls) == 1
+        assert retrieval_cache.stats()["hits"] == 1
+
+        # A different n_results is a different key
+        retrieve_relevant_chunks("chest pain since tuesday", chroma_db_url="http://chromadb:8000", n_results=3)
+        assert len(calls) == 2
+
+
+def test_retrieval_cache_is_invalidated_by_collection_writes():
+    from app.embed_and_store.store import store_chunks_in_chroma
+
+    calls = []
+    client = _counting_client(calls)
+    client.get_or_create_collection = lambda name: type("C", (), {"upsert": lambda self, **kw: None})()
+    with patch("chromadb.HttpClient", return_value=client):
+        retrieve_relevant_chunks("hello", chroma_db_url="http://chromadb:8000")
+        store_chunks_in_chroma(
+            [{"text": "t", "metadata": {"source": "s"}, "embedding": [0.1]}],
+            chroma_service_url="http://chromadb:8000",
+            collection_name="documents",
+        )
+        retrieve_relevant_chunks("hello", chroma_db_url="http://chromadb:8000")
+        assert len(calls) == 2
+
+
+def test_retrieval_cache_is_invalidated_by_chunk_deletes():
+    from app.embed_and_store.store import delete_chunks_from_chroma
+
+    calls = []
+    client = _counting_client(calls)
+    client.get_or_create_collection = lambda name: type("C", (), {"delete": lambda self, **kw: None})()
+    with patch("chromadb.HttpClient", return_value=client):
+        retrieve_relevant_chunks("hello", chroma_db_url="http://chromadb:8000")
+        assert delete_chunks_from_chroma(["s_abc"], "http://chromadb:8000", "documents") == 1
+        retrieve_relevant_chunks("hello", chroma_db_url="http://chromadb:8000")
+        assert len(calls) == 2
+
+
+def test_retrieve_with_diversify_requests_embeddings_and_drops_duplicates():
+    includes = []
+
+    class MockCollection:
+        def __init__(self, name):
+            self.name = name
+            self.metadata = {}
+        def query(self, n_results, include, query_texts=None, query_embeddings=None):
+            includes.append(include)
+            return {
+                "ids": [["a", "a2", "b"]],
+                "documents": [["overlap text", "overlap text.", "other"]],
+                "metadatas": [[{}, {}, {}]],
+                "distances": [[0.1, 0.12, 0.5]],
+                "embeddings": [[[1.0, 0.0], [1.0, 0.01], [0.0, 1.0]]],
+            }
+
+    class MockClient:
+        def list_collections(self):
+            return [MockCollection("c1")]
+        def get_collection(self, name):
+            return MockCollection(name)
+
+    with patch("chromadb.HttpClient", return_value=MockClient()):
+        chunks = retrieve_relevant_chunks("q", chroma_db_url="http://chromadb:8000", n_results=3, diversify=True)
+        assert "embeddings" in includes[0]
+        assert [c["id"] for c in chunks] == ["a", "b"]
+        assert all("embedding" not in c for c in chunks)
+
+
+def test_retrieve_hybrid_fuses_lexical_hits():
+    from app.retrieval.lexical import index_chunks_lexically
+
+    index_chunks_lexically("nice_knowledge", ["ng136_1", "ng28_1"], ["NG136 hypertension", "NG28 diabetes"])
+
+    class MockCollection:
+        def __init__(self, name):
+            self.name = name
+            self.metadata = {}
+        def query(self, n_results, include, query_texts=None, query_embeddings=None):
+            return {
+                "ids": [["ng28_1"]],
+                "documents": [["NG28 diabetes"]],
+                "metadatas": [[{}]],
+                "distances": [[0.4]],
+            }
+        def get(self, ids, include):
+            docs = {"ng136_1": "NG136 hypertension", "ng28_1": "NG28 diabetes"}
+            return {"ids": ids, "documents": [docs[i] for i in ids], "metadatas": [{} for _ in ids]}
+
+    class MockClient:
+        def list_collections(self):
+            return [MockCollection("nice_knowledge")]
+        def get_collection(self, name):
+            return MockCollection(name)
+
+    with patch("chromadb.HttpClient", return_value=MockClient()):
+        chunks = retrieve_relevant_chunks("follow NG136", chroma_db_url="http://chromadb:8000", hybrid=True)
+        ids = [c["id"] for c in chunks]
+        assert set(ids) == {"ng136_1", "ng28_1"}
+        lexical_only = next(c for c in chunks if c["id"] == "ng136_1")
+        assert lexical_only["distance"] is None
+        assert lexical_only["page_content"] == "NG136 hypertension"
@@ -0,0 +1,75 @@
+"""
+Tests for generation.section_parallel (section-parallel H&P generation)
+"""
+import json
+import threading
+from unittest.mock import patch
+
+from app.generation.generate_summary import HP_SECTIONS
+from app.generation.section_parallel import (
+    SECTION_GROUPS,
+    parse_sections,
+    stitch_sections,
+    section_parallel_summary,
+)
+
+
+def test_section_groups_cover_the_template_in_order():
+    assert [section for group in SECTION_GROUPS for section in group] == HP_SECTIONS
+
+
+def test_parse_and_stitch_sections():
+    text = "**Presenting Complaint:** Cough.\n**history of presenting complaint:**\n- 3 days\n- dry"
+    parsed = parse_sections(text)
+    assert parsed == {"Presenting Complaint": "Cough.", "History of Presenting Complaint": "- 3 days\n- dry"}
+
+    stitched = stitch_sections(parsed)
+    assert stitched.startswith("**Presenting Complaint:** Cough.\n\n**History of Presenting Complaint:** - 3 days")
+    assert "**Plan of Action:** Information not provided." in stitched
+    assert stitched.count("**") == len(HP_SECTIONS) * 2
+
+
+class MockResp:
+    def __init__(self, text):
+        self.status_code = 200
+        self.text = text
+    def raise_for_status(self):
+        return None
+    def json(self):
+        return {"generated_text": self.text}
+
+
+def test_section_groups_run_concurrently_with_a_shared_prefix():
+    barrier = threading.Barrier(len(SECTION_GROUPS), timeout=5)
+    prompts = []
+
+    def fake_post(url, headers=None, data=None, timeout=None):
+        prompt = json.loads(data)["inputs"]
+        prompts.append(prompt)
+        barrier.wait()
+        group = next(g for g in SECTION_GROUPS if all(f"**{s}:**" in prompt.split("output ONLY")[1] for s in g))
+        # Leave out the last section of every group
+        return MockResp("\n".join(f"**{s}:** text for {s}" for s in group[:-1]))
+
+    with (
+        patch("requests.Session.post", side_effect=fake_post),
+        patch("app.generation.generate_summary.summary_writer") as mock_writer,
+    ):
+        summary = section_parallel_summary("Patient has a cough", [{"page_content": "ctx"}], tgi_service_url="http://tgi")
+
+    prefix = prompts[0].split("For this response, output ONLY")[0]
+    assert all(prompt.startswith(prefix) for prompt in prompts)
+    assert "**Presenting Complaint:** text for Presenting Complaint" in summary
+    assert "**Review of Systems:** Information not provided." in summary
+    assert summary.index("**Drug History:**") < summary.index("**Family History:**")
+    assert mock_writer.submit.call_args.args[0]["content"] == summary
+
+
+def test_section_parallel_falls_back_to_single_pass_on_group_failure():
+    with (
+        patch("app.generation.section_parallel._generate_group", side_effect=Exception("tgi down")),
+        patch("app.generation.section_parallel.generate_summary", return_value="single pass") as mock_single,
+    ):
+        summary = section_parallel_summary("Patient has a cough", [], tgi_service_url="http://tgi")
+    assert summary == "single pass"
+    mock_single.assert_called_once()
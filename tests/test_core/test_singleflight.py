@@ -0,0 +1,48 @@
+"""
+Tests for core.singleflight (request coalescing)
+"""
+import threading
+import time
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def slow(value):
+        calls.append(value)
+        started.set()
+        time.sleep(0.2)
+        return value * 2
+
+    results = []
+    def worker():
+        results.append(flight.do("k", slow, 21))
+
+    leader = threading.Thread(target=worker)
+    leader.start()
+    started.wait(2)
+    followers = [threading.Thread(target=worker) for _ in range(3)]
+    for t in followers:
+        t.start()
+    for t in [leader, *followers]:
+        t.join(2)
+
+    assert calls == [21]
+    assert sorted(results) == [(42, False), (42, True), (42, True), (42, True)]
+    assert flight.stats() == {"in_flight": 0, "executed": 1, "coalesced": 3}
+
+
+def test_errors_propagate_and_are_not_remembered():
+    flight = SingleFlight()
+
+    def boom():
+        raise RuntimeError("tgi down")
+
+    with pytest.raises(RuntimeError):
+        flight.do("k", boom)
+    assert flight.do("k", lambda: "ok") == ("ok", False)
@@ -0,0 +1,114 @@
+"""
+Tests for retrieval.snapshot (memory-mapped vector snapshots)
+"""
+import numpy as np
+from unittest.mock import patch
+
+from app.retrieval.snapshot import (
+    VectorSnapshot,
+    export_collection_snapshot,
+    get_vector_snapshot,
+    drop_vector_snapshot,
+)
+from app.retrieval.retrieve import retrieve_relevant_chunks
+
+
+class FakeCollection:
+    def __init__(self, vectors, metric="l2"):
+        self.metadata = {"hnsw:space": metric}
+        self.vectors = vectors
+        self.ids = [f"doc_{i}" for i in range(len(vectors))]
+
+    def count(self):
+        return len(self.vectors)
+
+    def get(self, include, limit, offset):
+        rows = range(offset, min(offset + limit, len(self.vectors)))
+        return {
+            "ids": [self.ids[i] for i in rows],
+            "embeddings": [self.vectors[i] for i in rows],
+            "documents": [f"document {i}" for i in rows],
+            "metadatas": [{"row": i} for i in rows],
+        }
+
+    def query(self, **kwargs):
+        raise AssertionError("snapshot collections must not be queried over HTTP")
+
+
+def test_export_and_search_match_brute_force(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 8)).astype(np.float32)
+    queries = rng.normal(size=(2, 8)).astype(np.float32)
+
+    for metric in ("l2", "cosine", "ip"):
+        out_dir = tmp_path / metric
+        count = export_collection_snapshot(
+            FakeCollection(vectors.tolist(), metric), "miriad_knowledge", out_dir=str(out_dir),
+            dtype="float32", page_size=7
+        )
+        assert count == 50
+
+        snapshot = VectorSnapshot(str(out_dir / "miriad_knowledge"))
+        results = snapshot.search(queries.tolist(), k=5)
+
+        if metric == "l2":
+            expected = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+        elif metric == "cosine":
+            normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+            expected = 1 - (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normalized.T
+        else:
+            expected = 1 - queries @ vectors.T
+
+        for q, hits in enumerate(results):
+            assert [row for row, _ in hits] == np.argsort(expected[q])[:5].tolist()
+            assert np.allclose([d for _, d in hits], np.sort(expected[q])[:5], atol=1e-4)
+
+        row = results[0][0][0]
+        assert snapshot.get_row(row) == {"id": f"doc_{row}", "document": f"document {row}", "metadata": {"row": row}}
+        snapshot.close()
+
+
+def test_snapshot_registry_reloads_and_drops(tmp_path):
+    collection = FakeCollection([[1.0, 0.0], [0.0, 1.0]])
+    assert get_vector_snapshot("nice_knowledge") is None
+
+    export_collection_snapshot(collection, "nice_knowledge")
+    snapshot = get_vector_snapshot("nice_knowledge")
+    assert len(snapshot) == 2
+    assert get_vector_snapshot("nice_knowledge") is snapshot
+    # Only the configured read-only collections are ever served from a snapshot
+    export_collection_snapshot(collection, "documents")
+    assert get_vector_snapshot("documents") is None
+
+    drop_vector_snapshot("nice_knowledge")
+    assert get_vector_snapshot("nice_knowledge") is None
+
+
+def test_retrieve_searches_snapshot_collections_in_process():
+    export_collection_snapshot(FakeCollection([[1.0, 0.0], [0.0, 1.0], [5.0, 5.0]]), "miriad_knowledge")
+
+    class MockCollection:
+        def __init__(self, name):
+            self.name = name
+            self.metadata = {}
+        def query(self, n_results, include, query_texts=None, query_embeddings=None):
+            return {"ids": [["u1"]], "documents": [["upload"]], "metadatas": [[{}]], "distances": [[0.5]]}
+
+    class MockClient:
+        def list_collections(self):
+            return [MockCollection("documents"), MockCollection("miriad_knowledge")]
+        def get_collection(self, name):
+            return FakeCollection([]) if name == "miriad_knowledge" else MockCollection(name)
+
+    with (
+        patch("chromadb.HttpClient", return_value=MockClient()),
+        patch("app.retrieval.retrieve.embed_texts", return_value=[[0.9, 0.0]]),
+    ):
+        chunks = retrieve_relevant_chunks("hello", chroma_db_url="http://chromadb:8000", tei_service_url="http://tei")
+
+    assert [(c["source_collection"], c["id"]) for c in chunks] == [
+        ("miriad_knowledge", "doc_0"),
+        ("documents", "u1"),
+    ]
+    assert chunks[0]["page_content"] == "document 0"
+    assert abs(chunks[0]["distance"] - 0.01) < 1e-3
@@ -0,0 +1,106 @@
+"""
+Tests for core.write_behind (batched background persistence)
+"""
+import threading
+
+from app.core.write_behind import WriteBehindQueue
+
+
+def test_submitted_items_are_written_in_one_batch():
+    batches = []
+    entered, gate = threading.Event(), threading.Event()
+
+    def write_batch(items):
+        entered.set()
+        gate.wait(2)
+        batches.append([item["id"] for item in items])
+
+    writer = WriteBehindQueue(write_batch, batch_size=10, key="id")
+    writer.submit({"id": "first"})
+    entered.wait(2)
+    # The writer is now blocked on "first"; these queue up behind it
+    for i in range(5):
+        writer.submit({"id": i})
+    assert writer.get_pending(3) == {"id": 3}
+    gate.set()
+
+    assert writer.flush(timeout=2)
+    assert batches[0] == ["first"]
+    assert batches[1] == [0, 1, 2, 3, 4]
+    assert writer.get_pending(3) is None
+    assert writer.stats()["written"] == 6
+    assert writer.stats()["queue_depth"] == 0
+    writer.close()
+
+
+def test_full_queue_writes_inline():
+    written = []
+    entered, gate = threading.Event(), threading.Event()
+
+    def write_batch(items):
+        if items[0]["id"] == "a":
+            entered.set()
+            gate.wait(2)
+        written.extend(item["id"] for item in items)
+
+    writer = WriteBehindQueue(write_batch, max_size=1, submit_timeout=0.01, key="id")
+    writer.submit({"id": "a"})  # taken by the background thread, which then blocks
+    entered.wait(2)
+    writer.submit({"id": "b"})  # fills the queue
+    writer.submit({"id": "c"})  # queue full: written by the caller
+    assert written == ["c"]
+    gate.set()
+
+    assert writer.flush(timeout=2)
+    assert sorted(written) == ["a", "b", "c"]
+    assert writer.stats()["inline_writes"] == 1
+    writer.close()
+
+
+def test_failed_batches_are_counted_and_kept():
+    def write_batch(items):
+        raise RuntimeError("db down")
+
+    writer = WriteBehindQueue(write_batch, key="id", name="test_writer")
+    writer.submit({"id": "x"})
+    assert writer.flush(timeout=2)
+    assert writer.stats()["failed"] == 1
+    # The id may already be with a client: it keeps resolving
+    assert writer.get_pending("x") == {"id": "x"}
+    assert 'rag_write_queue_failed_total{queue="test_writer"} 1' in writer.render_prometheus()
+    writer.close()
+
+
+def test_rows_the_writer_reports_as_failed_are_counted():
+    writer = WriteBehindQueue(lambda items: [item for item in items if item["id"] == "bad"], batch_size=10, key="id")
+    writer.submit({"id": "good"})
+    writer.submit({"id": "bad"})
+    assert writer.flush(timeout=2)
+    stats = writer.stats()
+    assert stats["written"] + stats["failed"] == 2 and stats["failed"] == 1
+    assert writer.get_pending("good") is None
+    assert writer.get_pending("bad") == {"id": "bad"}
+    writer.close()
+
+
+def test_restarted_writer_registers_its_exit_flush_once():
+    from unittest.mock import patch
+
+    writer = WriteBehindQueue(lambda items: None)
+    with patch("atexit.register") as mock_register:
+        writer.submit({"id": 1})
+        writer.close()
+        writer.submit({"id": 2})
+        writer.close()
+    assert mock_register.call_count == 1
+
+
+def test_batch_save_falls_back_per_row_and_returns_failed_rows():
+    import uuid
+    from scripts.save_summary import save_summaries_batch_to_db
+
+    good = {"id": str(uuid.uuid4()), "title": "t", "content": "c"}
+    duplicate = {"id": str(uuid.uuid4()), "title": "t", "content": "c"}
+    assert save_summaries_batch_to_db([duplicate]) == []
+    # The duplicate fails the batch; the per-row retry saves the other row
+    assert save_summaries_batch_to_db([good, duplicate]) == [duplicate]